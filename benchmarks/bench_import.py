@@ -0,0 +1,159 @@
+"""Measure and guard the cold-start latency of the command-line interface.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 20] [--max-overhead-ms 150]
+
+Runs "python -m install_party MODE -h" for every mode and compares its duration with
+the duration of starting a bare interpreter, so the reported overhead is what Install
+Party adds on top of Python's own startup. Also checks, using "python -X importtime",
+that none of the heavy dependencies (providers' SDKs, HTTP and table libraries) is
+imported just to print a mode's help.
+
+Exits with a non-zero code if a mode's overhead exceeds the threshold or if a heavy
+dependency is imported.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tabulate import tabulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ("create", "list", "delete")
+
+# Modules which must not be imported when printing a mode's help.
+HEAVY_MODULES = ("requests", "tabulate", "novaclient", "ovh", "keystoneauth1")
+
+CONFIG = """
+general:
+  namespace: bench
+  riot_version: v1.4.2
+  connectivity_check_timeout: 60
+instances:
+  user: bench
+  password: bench
+  provider: memory
+  args: {}
+dns:
+  zone: bench.example.com
+  provider: memory
+  args: {}
+"""
+
+
+def time_command(command, env, runs):
+    """Run a command several times and measure how long it takes.
+
+    Args:
+        command (list): The command to run.
+        env (dict): The environment to run it in.
+        runs (int): How many times to run it.
+
+    Returns:
+        The median duration of the command, in milliseconds.
+    """
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def imported_heavy_modules(mode, env):
+    """Figure out which heavy modules are imported when printing a mode's help.
+
+    Args:
+        mode (str): The mode to check.
+        env (dict): The environment to run the mode in.
+
+    Returns:
+        The list of heavy modules that were imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "install_party", mode, "-h"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        module = line.rsplit("|", 1)[-1].strip()
+        if module.split(".")[0] in HEAVY_MODULES:
+            imported.add(module.split(".")[0])
+
+    return sorted(imported)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure and guard the cold-start latency of the command-line"
+                    " interface.",
+    )
+    parser.add_argument(
+        "-r", "--runs",
+        type=int,
+        default=20,
+        help="Number of runs to take the median duration of. Defaults to 20.",
+    )
+    parser.add_argument(
+        "-m", "--max-overhead-ms",
+        type=float,
+        default=150,
+        help="Maximum time (in milliseconds) Install Party can add on top of the"
+             " interpreter's startup. Defaults to 150.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml") as config_file:
+        config_file.write(CONFIG)
+        config_file.flush()
+
+        env = dict(os.environ)
+        env["INSTALL_PARTY_CONFIG"] = config_file.name
+        env["PYTHONPATH"] = os.pathsep.join(
+            [ROOT] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+        )
+
+        baseline = time_command([sys.executable, "-c", "pass"], env, args.runs)
+
+        rows = []
+        failures = 0
+        for mode in MODES:
+            duration = time_command(
+                [sys.executable, "-m", "install_party", mode, "-h"], env, args.runs,
+            )
+            overhead = duration - baseline
+            heavy = imported_heavy_modules(mode, env)
+
+            failed = overhead > args.max_overhead_ms or bool(heavy)
+            failures += failed
+
+            rows.append([
+                mode, duration, overhead, ", ".join(heavy) or "-",
+                "FAIL" if failed else "OK",
+            ])
+
+    print("Bare interpreter startup: %.1f ms" % baseline)
+    print(tabulate(
+        rows,
+        headers=["Mode", "Median (ms)", "Overhead (ms)", "Heavy imports", ""],
+        tablefmt="psql",
+        floatfmt=".1f",
+    ))
+
+    if failures:
+        sys.exit(1)
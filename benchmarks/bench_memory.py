@@ -0,0 +1,148 @@
+"""Measure how much memory and time it takes to hold and process a large inventory.
+
+Usage:
+    python benchmarks/bench_memory.py [--sizes 1000,10000,100000]
+        [--max-bytes-per-entry 320]
+
+For each size, builds an inventory of that many servers (each with an instance and a
+DNS record, as list.get_list would) from simulated provider responses, and reports the
+memory it takes (measured with tracemalloc) along with the time it takes to build it
+and to sort its entries for display.
+
+Exits with a non-zero code if an entry takes more memory than the threshold.
+"""
+import argparse
+import gc
+import ipaddress
+import os
+import sys
+import time
+import tracemalloc
+
+from tabulate import tabulate
+
+# Make the benchmark runnable from a checkout without installing the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from install_party.dns.dns_provider_client import DNSRecord  # noqa: E402
+from install_party.instances.instances_provider_client import Instance  # noqa: E402
+from install_party.lister.list import (  # noqa: E402
+    add_instances,
+    add_records,
+    sort_entries,
+)
+
+FIRST_ADDRESS = ipaddress.IPv4Address("10.0.0.1")
+
+
+def build_responses(size):
+    """Generate the raw data the providers would respond with for an inventory.
+
+    Args:
+        size (int): The number of servers in the inventory.
+
+    Returns:
+        The instances and records, as lists of tuples of strings.
+    """
+    instances = []
+    records = []
+    for i in range(size):
+        name = "s%07d" % i
+        address = str(FIRST_ADDRESS + i)
+        instances.append(("id-%d" % i, "bench-%s" % name, address, "ACTIVE"))
+        records.append(("%d" % i, "%s.bench" % name, address, "example.com"))
+    return instances, records
+
+
+def build_inventory(instances, records):
+    """Build the inventory from the raw data, the same way list.get_list does.
+
+    Args:
+        instances (list): The raw data for the instances.
+        records (list): The raw data for the records.
+
+    Returns:
+        The entries, associated with their ID.
+    """
+    entries_dict = {}
+    add_instances(
+        entries_dict, [Instance(*instance) for instance in instances], "bench",
+    )
+    add_records(entries_dict, [DNSRecord(*record) for record in records], "bench")
+    return entries_dict
+
+
+def measure(size):
+    """Measure the memory and time it takes to build and sort an inventory.
+
+    Args:
+        size (int): The number of servers in the inventory.
+
+    Returns:
+        The memory taken by the inventory (in bytes), and the time it took to build
+        and sort it (in seconds).
+    """
+    instances, records = build_responses(size)
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    entries_dict = build_inventory(instances, records)
+    build_time = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    sort_entries(entries_dict)
+    sort_time = time.perf_counter() - start
+
+    return memory, build_time, sort_time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure how much memory and time it takes to hold and process a"
+                    " large inventory.",
+    )
+    parser.add_argument(
+        "-s", "--sizes",
+        default="1000,10000,100000",
+        help="Comma-separated list of inventory sizes to benchmark. Defaults to"
+             " 1000,10000,100000.",
+    )
+    parser.add_argument(
+        "-m", "--max-bytes-per-entry",
+        type=float,
+        default=320,
+        help="Maximum memory (in bytes) a server can take in the inventory. Defaults to"
+             " 320.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    rows = []
+    failures = 0
+    for size in [int(size) for size in args.sizes.split(",")]:
+        memory, build_time, sort_time = measure(size)
+        per_entry = memory / size
+
+        failed = per_entry > args.max_bytes_per_entry
+        failures += failed
+
+        rows.append([
+            size, memory / 1024 / 1024, per_entry, build_time * 1000, sort_time * 1000,
+            "FAIL" if failed else "OK",
+        ])
+
+    print(tabulate(
+        rows,
+        headers=["Size", "Memory (MiB)", "Bytes/entry", "Build (ms)", "Sort (ms)", ""],
+        tablefmt="psql",
+        floatfmt=".1f",
+    ))
+
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,348 @@
+"""Benchmark the create, list and delete modes against the in-memory providers.
+
+Usage:
+    python benchmarks/bench_modes.py run [--sizes 10,100,1000] [--output PATH]
+    python benchmarks/bench_modes.py compare BASELINE.json CANDIDATE.json
+
+Each size is benchmarked in its own process so that the peak RSS reported for it isn't
+polluted by other sizes. Within a process, the modes run in order (create, list,
+delete), so the peak RSS of a mode is the peak of the process at the end of that mode.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from tabulate import tabulate
+
+# Make the benchmark runnable from a checkout without installing the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from install_party.util import metrics, simulation  # noqa: E402
+
+MODES = ("create", "list", "delete")
+
+
+def build_config(args):
+    """Build a configuration using the in-memory providers.
+
+    Args:
+        args (Namespace): The parsed command-line arguments.
+
+    Returns:
+        The configuration, as a dict.
+    """
+    provider_args = {
+        "latency": args.latency,
+        "boot_time": args.boot_time,
+        "poll_interval": 0.01,
+        "seed": args.seed,
+    }
+
+    return {
+        "general": {
+            "namespace": "bench",
+            "riot_version": "v1.4.2",
+            "connectivity_check_timeout": 60,
+            "connectivity_check": "memory",
+            "connectivity_check_interval": 0,
+        },
+        "instances": {
+            "user": "bench",
+            "password": "bench",
+            "provider": "memory",
+            "args": dict(provider_args),
+        },
+        "dns": {
+            "zone": "bench.example.com",
+            "provider": "memory",
+            "args": dict(provider_args),
+        },
+    }
+
+
+def get_peak_rss() -> int:
+    """Returns: The peak resident set size of the process so far, in kilobytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports the peak RSS in bytes rather than kilobytes.
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+def run_mode(mode, argv, config, size):
+    """Run a mode with the provided command-line arguments and measure it.
+
+    Args:
+        mode (str): The mode to run.
+        argv (list): The command-line arguments to give the mode.
+        config (dict): The configuration to use.
+        size (int): The number of servers in the namespace.
+
+    Returns:
+        A dict containing the measurements.
+    """
+    # Import the modes lazily so that importing them is part of the measurements of the
+    # first mode to run rather than happening before the benchmark.
+    from install_party.creator.create import create
+    from install_party.eraser.delete import delete
+    from install_party.lister.list import get_and_print_list
+
+    functions = {
+        "create": create,
+        "list": get_and_print_list,
+        "delete": delete,
+    }
+
+    metrics.reset()
+    sys.argv = ["install_party %s" % mode] + argv
+
+    start = time.perf_counter()
+    # Silence the tables and summaries printed by the modes.
+    with contextlib.redirect_stdout(io.StringIO()):
+        functions[mode](config)
+    wall_time = time.perf_counter() - start
+
+    calls = metrics.get_calls()
+    total_calls = sum(calls.values())
+
+    return {
+        "wall_time": wall_time,
+        "calls": calls,
+        "total_calls": total_calls,
+        "calls_per_entry": total_calls / size,
+        "peak_rss_kb": get_peak_rss(),
+    }
+
+
+def run_size(size, args):
+    """Benchmark all modes for a given number of servers, in the current process.
+
+    Args:
+        size (int): The number of servers to create, list and delete.
+        args (Namespace): The parsed command-line arguments.
+
+    Returns:
+        A dict associating each mode with its measurements.
+    """
+    random.seed(args.seed)
+    simulation.reset_clouds()
+    config = build_config(args)
+
+    results = {
+        "create": run_mode("create", ["-N", str(size)], config, size),
+        "list": run_mode("list", [], config, size),
+        "delete": run_mode("delete", ["--all"], config, size),
+    }
+
+    # Sanity check: everything we created must have been deleted.
+    cloud = simulation.get_cloud()
+    if cloud.instances or cloud.records:
+        raise RuntimeError(
+            "%d instances and %d records left after deletion"
+            % (len(cloud.instances), len(cloud.records))
+        )
+
+    return results
+
+
+def run(args):
+    """Benchmark every size, each in its own process, and write the results to a JSON
+    file.
+
+    Args:
+        args (Namespace): The parsed command-line arguments.
+    """
+    results = {}
+    for size in [int(size) for size in args.sizes.split(",")]:
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), "run-size", str(size),
+            "--latency", str(args.latency),
+            "--boot-time", str(args.boot_time),
+            "--seed", str(args.seed),
+        ])
+        results[str(size)] = json.loads(output)
+
+        print_results(size, results[str(size)])
+
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "settings": {
+            "latency": args.latency,
+            "boot_time": args.boot_time,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print("\nResults written to %s" % args.output)
+
+
+def print_results(size, results):
+    """Print the measurements for a given size.
+
+    Args:
+        size (int): The number of servers.
+        results (dict): The measurements, as returned by run_size.
+    """
+    print("\n%d SERVERS" % size)
+    print(tabulate(
+        [
+            [
+                mode,
+                results[mode]["wall_time"],
+                results[mode]["total_calls"],
+                results[mode]["calls_per_entry"],
+                results[mode]["peak_rss_kb"] / 1024,
+            ]
+            for mode in MODES
+        ],
+        headers=["Mode", "Wall time (s)", "API calls", "Calls/entry", "Peak RSS (MiB)"],
+        tablefmt="psql",
+        floatfmt=".3f",
+    ))
+
+
+def compare(args):
+    """Compare two result files and exit with a non-zero code if the candidate
+    regressed compared to the baseline.
+
+    API call counts are deterministic, so any increase is considered a regression.
+    Wall times and peak RSS are only considered as regressed if they increased by more
+    than the configured threshold.
+
+    Args:
+        args (Namespace): The parsed command-line arguments.
+    """
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.candidate) as f:
+        candidate = json.load(f)["results"]
+
+    rows = []
+    regressions = []
+    for size in sorted(set(baseline) & set(candidate), key=int):
+        for mode in MODES:
+            before = baseline[size][mode]
+            after = candidate[size][mode]
+
+            for key, threshold in (
+                ("total_calls", 0),
+                ("wall_time", args.threshold),
+                ("peak_rss_kb", args.threshold),
+            ):
+                change = (after[key] - before[key]) / before[key] * 100 if before[key] else 0
+                regressed = change > threshold
+                rows.append([
+                    size, mode, key, before[key], after[key], "%+.1f%%" % change,
+                    "REGRESSION" if regressed else "",
+                ])
+                if regressed:
+                    regressions.append((size, mode, key))
+
+            # Point out the endpoints which number of calls changed, which makes it
+            # easier to spot new N+1 patterns.
+            for endpoint in sorted(set(before["calls"]) | set(after["calls"])):
+                calls_before = before["calls"].get(endpoint, 0)
+                calls_after = after["calls"].get(endpoint, 0)
+                if calls_before != calls_after:
+                    rows.append([
+                        size, mode, endpoint, calls_before, calls_after, "", "",
+                    ])
+
+    print(tabulate(
+        rows,
+        headers=["Size", "Mode", "Metric", "Baseline", "Candidate", "Change", ""],
+        tablefmt="psql",
+        floatfmt=".3f",
+    ))
+
+    if regressions:
+        print("\n%d regression(s) found." % len(regressions))
+        sys.exit(1)
+
+    print("\nNo regression found.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the create, list and delete modes against the in-memory"
+                    " providers.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument(
+        "--sizes",
+        default="10,100,1000",
+        help="Comma-separated list of numbers of servers to benchmark with. Defaults to"
+             " 10,100,1000.",
+    )
+    run_parser.add_argument(
+        "-o", "--output",
+        default="bench_results.json",
+        help="Path of the file to write the results to. Defaults to"
+             " bench_results.json.",
+    )
+
+    size_parser = subparsers.add_parser("run-size", help=argparse.SUPPRESS)
+    size_parser.add_argument("size", type=int)
+
+    for subparser in (run_parser, size_parser):
+        subparser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="Latency of each call to the simulated APIs, in seconds. Defaults to"
+                 " 0.",
+        )
+        subparser.add_argument(
+            "--boot-time",
+            type=float,
+            default=0,
+            help="Time a simulated instance takes to boot, in seconds. Defaults to 0.",
+        )
+        subparser.add_argument(
+            "--seed",
+            type=int,
+            default=42,
+            help="Seed for the random number generators. Defaults to 42.",
+        )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare two result files.",
+    )
+    compare_parser.add_argument("baseline", help="Path to the baseline results.")
+    compare_parser.add_argument("candidate", help="Path to the results to check.")
+    compare_parser.add_argument(
+        "-t", "--threshold",
+        type=float,
+        default=20,
+        help="Increase (in percent) of the wall time or peak RSS above which it is"
+             " considered a regression. Defaults to 20.",
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "run":
+        run(args)
+    elif args.command == "run-size":
+        print(json.dumps(run_size(args.size, args)))
+    elif args.command == "compare":
+        compare(args)
@@ -1,17 +1,67 @@
+import contextlib
+import importlib
 import sys
 import os
 import yaml
 import logging
 
-from install_party.creator.create import create
-from install_party.eraser.delete import delete
-from install_party.lister.list import get_and_print_list
-from install_party.util import errors
+from install_party.util import errors, tracing, transport
+
+# The available modes, associated with the module implementing them and the function
+# to call to run them. Modules are only imported when the mode is selected, so that
+# running a mode doesn't require importing the dependencies of every other mode.
+MODES = {
+    "create": ("install_party.creator.create", "create"),
+    "list": ("install_party.lister.list", "get_and_print_list"),
+    "delete": ("install_party.eraser.delete", "delete"),
+    "reconcile": ("install_party.reconciler.reconcile", "reconcile"),
+    "exec": ("install_party.runner.execute", "execute"),
+    "serve": ("install_party.daemon.serve", "serve"),
+    "client": ("install_party.daemon.client", "run_client"),
+}
+
+# The modes which don't need to read the configuration file.
+MODES_WITHOUT_CONFIG = ("client",)
+
+USAGE = "Usage: install_party.py [--profile[=cprofile|wall]] [mode] [args]\n"
+
+
+def parse_global_args():
+    """Parse and remove from argv the arguments that come before the mode and apply
+    to every mode.
+
+    Returns:
+        The kind of profiler to use, or None if profiling isn't enabled.
+    """
+    profiler = None
+
+    while len(sys.argv) > 1 and sys.argv[1].startswith("--"):
+        arg = sys.argv.pop(1)
+        if arg == "--profile":
+            profiler = "cprofile"
+        elif arg.startswith("--profile="):
+            from install_party.util import profiling
+
+            profiler = arg.split("=", 1)[1]
+            if profiler not in profiling.PROFILERS:
+                sys.stderr.write(
+                    "Unknown profiler %s. Available profilers: %s\n"
+                    % (profiler, ", ".join(profiling.PROFILERS))
+                )
+                sys.exit(1)
+        else:
+            sys.stderr.write("Unknown argument %s\n" % arg)
+            sys.stderr.write(USAGE)
+            sys.exit(1)
+
+    return profiler
 
 
 if __name__ == '__main__':
+    profiler = parse_global_args()
+
     if len(sys.argv) < 2:
-        sys.stderr.write("Usage: install_party.py [mode] [args]\n")
+        sys.stderr.write(USAGE)
         sys.exit(1)
 
     # Configure logging.
@@ -25,13 +75,20 @@ if __name__ == '__main__':
     rootLogger.addHandler(handler)
     rootLogger.setLevel(logging.INFO)
 
-    # Read and parse the configuration file.
-    config_location = os.getenv("INSTALL_PARTY_CONFIG", "config.yaml")
-    config_content = open(config_location).read()
-    config = yaml.safe_load(config_content)
-
     mode = sys.argv[1]
 
+    # Read and parse the configuration file.
+    config = None
+    if mode not in MODES_WITHOUT_CONFIG:
+        config_location = os.getenv("INSTALL_PARTY_CONFIG", "config.yaml")
+        config_content = open(config_location).read()
+        # Use the C implementation of the YAML loader if libyaml is available, since
+        # it's much faster than the pure Python one.
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        config = yaml.load(config_content, Loader=loader)
+        transport.configure(config)
+        tracing.configure(config)
+
     # Remove the mode from argv so that it doesn't interfere with the parsing of
     # arguments in the mode's code.
     if len(sys.argv) > 2:
@@ -39,18 +96,29 @@ if __name__ == '__main__':
     else:
         sys.argv = [sys.argv[0]]
 
-    if mode == "create":
+    if mode not in MODES:
+        sys.stderr.write(
+            "Unknown mode %s. Available modes: %s\n" % (mode, ", ".join(MODES))
+        )
+        sys.exit(1)
+
+    if profiler is not None:
+        from install_party.util import profiling
+
+        context = profiling.profile(profiler, mode)
+    else:
+        context = contextlib.ExitStack()
+
+    with context:
+        module_name, function_name = MODES[mode]
+        run_mode = getattr(importlib.import_module(module_name), function_name)
+
         try:
-            create(config)
+            run_mode(config)
         except errors.InstanceCreationError:
             sys.stderr.write("An error occurred while building the instance. Aborting.\n")
             sys.exit(2)
-    elif mode == "list":
-        get_and_print_list(config)
-    elif mode == "delete":
-        delete(config)
-    else:
-        sys.stderr.write(
-            "Unknown mode %s. Available modes: create, list, delete\n" % mode
-        )
+        except errors.QuotaExceededError as e:
+            sys.stderr.write("%s\n" % e)
+            sys.exit(3)
 
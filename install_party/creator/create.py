@@ -1,26 +1,22 @@
 import argparse
 import datetime
 import logging
-import random
 import pathlib
-import string
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-
+from install_party.creator.names import load_name_allocator
 from install_party.dns import dns_provider
 from install_party.instances import instances_provider
-from install_party.util import errors
+from install_party.util import errors, metrics, simulation, tracing, transport
 
 logger = logging.getLogger(__name__)
 
 
-def random_string(n):
-    """Generate a random string made of n lowercase letters."""
-    return ''.join(random.choices(string.ascii_lowercase, k=n))
-
-
-def create_instance(name, expected_domain, post_install_script, config):
+def create_instance(
+        name, expected_domain, post_install_script, config, reserved_address=None,
+):
     """Create the instance with a boot script using the instances provider's API.
 
     Args:
@@ -32,6 +28,8 @@ def create_instance(name, expected_domain, post_install_script, config):
         post_install_script (str): A script to run after the post-creation script has
             finished. If no script has been provided, it's an empty string.
         config (dict): The parsed configuration.
+        reserved_address (str): An address reserved with reserve_addresses to associate
+            with the instance once it's active, if any.
 
     Returns:
         str: the IPv4 address of the instance.
@@ -62,14 +60,79 @@ def create_instance(name, expected_domain, post_install_script, config):
     client = instances_provider.get_instances_provider_client(config)
 
     instance_name = "%s-%s" % (config["general"]["namespace"], name)
-    instance = client.create_instance(instance_name, post_creation_script)
+    with metrics.timed("instance.create", {"instance.name": instance_name}) as span:
+        instance = client.create_instance(instance_name, post_creation_script)
+        span.set_attribute("instance.id", instance.instance_id)
+
+    if reserved_address:
+        logger.info("Associating address %s with the instance...", reserved_address)
+        with metrics.timed(
+                "instance.associate_address", {"address": reserved_address},
+        ):
+            instance = client.associate_address(instance, reserved_address)
 
     # Commit the operation.
-    client.commit()
+    with metrics.timed("instance.commit"):
+        client.commit()
 
     return instance.ip_address
 
 
+def reserve_addresses(count, config):
+    """Reserve public addresses for the servers about to be created, if the instances
+    provider supports it, so their DNS records can be created while the instances boot.
+    If the reservation fails, log it and carry on without reserved addresses.
+
+    Args:
+        count (int): The number of servers about to be created.
+        config (dict): The parsed configuration.
+
+    Returns:
+        list: The reserved addresses, which can be fewer than requested.
+    """
+    client = instances_provider.get_instances_provider_client(config)
+    if not client.supports_address_reservation:
+        return []
+
+    try:
+        with metrics.timed("instance.reserve_addresses"):
+            addresses = client.reserve_addresses(count)
+    except Exception as e:
+        logger.warning("Failed to reserve addresses, carrying on without: %s", e)
+        return []
+
+    if addresses:
+        logger.info("Reserved %d address(es)", len(addresses))
+
+    return addresses
+
+
+def release_reservation(record, ip_address, config):
+    """Delete the DNS record created for a reserved address, if any, and release the
+    address, because the creation of the server it was reserved for failed. If one of
+    these operations fails, log it and carry on.
+
+    Args:
+        record (DNSRecord): The DNS record pointing to the address, or None if it
+            wasn't created.
+        ip_address (str): The reserved address.
+        config (dict): The parsed configuration.
+    """
+    if record is not None:
+        try:
+            dns_client = dns_provider.get_dns_provider_client(config)
+            dns_client.delete_sub_domain(record)
+            dns_client.commit(config["dns"]["zone"])
+        except Exception as e:
+            logger.error("Failed to delete DNS record %s: %s", record.sub_domain, e)
+
+    try:
+        instances_client = instances_provider.get_instances_provider_client(config)
+        instances_client.release_address(ip_address)
+    except Exception as e:
+        logger.error("Failed to release address %s: %s", ip_address, e)
+
+
 def create_record(name, ip_address, config):
     """Create a DNS A record to attach to an instance using the DNS provider's API.
 
@@ -90,14 +153,70 @@ def create_record(name, ip_address, config):
     zone = config["dns"]["zone"]
     sub_domain = "%s.%s" % (name, config["general"]["namespace"])
 
-    record = client.create_sub_domain(sub_domain, ip_address, zone)
+    with metrics.timed(
+            "dns.create", {"dns.sub_domain": sub_domain, "dns.target": ip_address},
+    ):
+        record = client.create_sub_domain(sub_domain, ip_address, zone)
 
     # Apply the new configuration.
-    client.commit(zone)
+    with metrics.timed("dns.commit", {"dns.zone": zone}):
+        client.commit(zone)
 
     return record
 
 
+def probe_http(domain_name, config):
+    """Send an HTTP request to the provided domain name.
+
+    Args:
+        domain_name (str): The domain name to send the request to.
+        config (dict): The parsed configuration.
+
+    Raises:
+        Exception: The request failed.
+    """
+    # Don't retry failed requests, since the connectivity check already polls the
+    # server until it answers.
+    session = transport.get_session(retry=False)
+    session.get("http://%s" % domain_name, timeout=transport.get_timeout())
+
+
+def probe_memory(domain_name, config):
+    """Check whether the server behind the provided domain name would answer an HTTP
+    request, if the server lives in the simulated cloud used by the in-memory
+    providers.
+
+    Args:
+        domain_name (str): The domain name to check.
+        config (dict): The parsed configuration.
+
+    Raises:
+        ConnectivityCheckError: The server isn't reachable yet.
+    """
+    if not simulation.is_ready(domain_name):
+        raise errors.ConnectivityCheckError("%s isn't reachable yet." % domain_name)
+
+
+def probe_none(domain_name, config):
+    """Consider the server as reachable without checking anything, e.g. when replaying
+    a cassette.
+
+    Args:
+        domain_name (str): The domain name to check.
+        config (dict): The parsed configuration.
+    """
+    pass
+
+
+# The functions that can be used to check whether a server is reachable, associated
+# with the name to use in the configuration to select them.
+CONNECTIVITY_PROBES = {
+    "http": probe_http,
+    "memory": probe_memory,
+    "none": probe_none,
+}
+
+
 def check_connectivity(domain_name, config):
     """Every second, check if we can reach the host's HTTPS server, and only exit it if
     we got a response.
@@ -106,6 +225,10 @@ def check_connectivity(domain_name, config):
     post-creation script, reaching this condition means that the execution finished
     successfully.
 
+    The check is performed with the probe configured in the "connectivity_check"
+    setting (defaults to "http"), and the interval between two checks can be changed
+    with the "connectivity_check_interval" setting.
+
     Args:
         domain_name (str): The domain name to perform the connectivity check on.
         config (dict): The parsed configuration.
@@ -114,14 +237,22 @@ def check_connectivity(domain_name, config):
         ConnectivityCheckError: The connectivity check had to be aborted (e.g. if it
             timed out)
     """
+    probe_name = config["general"].get("connectivity_check", "http")
+    probe = CONNECTIVITY_PROBES[probe_name]
+    interval = config["general"].get("connectivity_check_interval", 1)
 
     before = datetime.datetime.now().timestamp()
 
+    attempt = 0
     while True:
-        time.sleep(1)
+        time.sleep(interval)
+        attempt += 1
 
         try:
-            requests.get("http://%s" % domain_name)
+            with tracing.span(
+                    "connectivity.probe", {"probe": probe_name, "attempt": attempt},
+            ):
+                probe(domain_name, config)
             break
         except Exception:
             now = datetime.datetime.now().timestamp()
@@ -131,7 +262,7 @@ def check_connectivity(domain_name, config):
             continue
 
 
-def create_server(name, post_install_script, config):
+def create_server(name, post_install_script, config, reserved_address=None):
     """Create an instance, attach a domain name to it, and wait until the instance's
     boot script has been run.
 
@@ -140,6 +271,8 @@ def create_server(name, post_install_script, config):
         post_install_script (str): A script to run after the post-creation script has
             finished. If no script has been provided, it's an empty string.
         config (dict): The parsed configuration.
+        reserved_address (str): An address reserved with reserve_addresses for this
+            server, if any.
     """
 
     # Guess what the final domain name for the host is going to be. This is used for
@@ -151,18 +284,65 @@ def create_server(name, post_install_script, config):
     logger.info(
         "Provisioning server %s (expected domain name %s)" % (name, expected_domain)
     )
-    # Create the instance with the instances provider's API.
-    ip_address = create_instance(name, expected_domain, post_install_script, config)
-    logger.info("Host is active, IPv4 address is %s", ip_address)
-    # Create a DNS A record for the instance's IP address using the DNS provider's API.
-    record = create_record(name, ip_address, config)
-    # We use the data the API gave us in response to highlight any possible mismatch
-    # between the domain name we guessed and the one we actually created.
-    logger.info("Created DNS record %s.%s" % (record.sub_domain, record.zone))
+
+    attributes = {
+        "server.name": name,
+        "server.domain": expected_domain,
+        "server.reserved_address": reserved_address or "",
+    }
+    with metrics.timed("server.total", attributes):
+        return _create_server(
+            name, expected_domain, post_install_script, config, reserved_address,
+        )
+
+
+def _create_server(
+        name, expected_domain, post_install_script, config, reserved_address,
+):
+    """Perform the actual creation of a server, see create_server.
+
+    Args:
+        name (str): The name of the server.
+        expected_domain (str): The domain name the server will be reachable at.
+        post_install_script (str): A script to run after the post-creation script has
+            finished. If no script has been provided, it's an empty string.
+        config (dict): The parsed configuration.
+        reserved_address (str): An address reserved for this server, if any.
+    """
+    if reserved_address:
+        # We already know the server's address, so create the DNS record first, and
+        # let it propagate while the instance boots. If anything fails, don't leak the
+        # address.
+        record = None
+        try:
+            record = create_record(name, reserved_address, config)
+            logger.info("Created DNS record %s.%s" % (record.sub_domain, record.zone))
+
+            create_instance(
+                name, expected_domain, post_install_script, config, reserved_address,
+            )
+        except Exception:
+            release_reservation(record, reserved_address, config)
+            raise
+
+        logger.info("Host is active, IPv4 address is %s", reserved_address)
+    else:
+        # Create the instance with the instances provider's API.
+        ip_address = create_instance(
+            name, expected_domain, post_install_script, config,
+        )
+        logger.info("Host is active, IPv4 address is %s", ip_address)
+        # Create a DNS A record for the instance's IP address using the DNS provider's
+        # API.
+        record = create_record(name, ip_address, config)
+        # We use the data the API gave us in response to highlight any possible
+        # mismatch between the domain name we guessed and the one we actually created.
+        logger.info("Created DNS record %s.%s" % (record.sub_domain, record.zone))
 
     logger.info("Waiting for post-creation script to finish...")
 
-    check_connectivity(expected_domain, config)
+    with metrics.timed("connectivity_check"):
+        check_connectivity(expected_domain, config)
 
     logger.info("Done!")
 
@@ -189,6 +369,103 @@ def load_post_install_script(path):
         return ""
 
 
+def create_servers(names, post_install_script, config, concurrency=1):
+    """Create a server for each of the provided names. If an error happened during one
+    of the creations, log it and carry on.
+
+    Args:
+        names (list): The names of the servers to create.
+        post_install_script (str): A script to run after the post-creation script has
+            finished. If no script has been provided, it's an empty string.
+        config (dict): The parsed configuration.
+        concurrency (int): The maximum number of servers to create at the same time.
+
+    Returns:
+        list: The domain names of the servers that were successfully created.
+    """
+    server_domain_names = []
+
+    # Reserve the servers' addresses in bulk if the provider supports it. Servers we
+    # couldn't reserve an address for get theirs when their instance is created.
+    addresses = reserve_addresses(len(names), config)
+    addresses += [None] * (len(names) - len(addresses))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(create_server, name, post_install_script, config, address)
+            for name, address in zip(names, addresses)
+        ]
+
+        for future in futures:
+            try:
+                # Wait for the server to be created and save its domain name.
+                server_domain_names.append(future.result())
+            except Exception as e:
+                logger.error(
+                    "An error happened while creating the server, skipping: %s", e
+                )
+
+    return server_domain_names
+
+
+def admit(number_to_create, policy, config):
+    """Check the instances provider's limits before starting a batch of creations, so
+    that a batch which can't fit in the provider's quotas fails (or is cut down) in
+    seconds rather than after booting some of its instances.
+
+    Args:
+        number_to_create (int): The number of servers the user asked for.
+        policy (str): What to do if there isn't enough room for all of the servers:
+            "fail" to abort the batch, "cap" to only create as many servers as there is
+            room for, or "ignore" to skip the check altogether.
+        config (dict): The parsed configuration.
+
+    Returns:
+        int: The number of servers to create.
+
+    Raises:
+        QuotaExceededError: There isn't enough room for all of the servers and the
+            policy is "fail", or there's no room at all and the policy is "cap".
+    """
+    if policy == "ignore":
+        return number_to_create
+
+    client = instances_provider.get_instances_provider_client(config)
+    limits = client.get_limits()
+    if limits is None:
+        logger.debug("The instances provider's limits are unknown, skipping check")
+        return number_to_create
+
+    available = limits.available_instances()
+    logger.info(
+        "Room for %s more instance(s) (%s)",
+        available if available is not None else "unlimited",
+        limits.describe(),
+    )
+
+    if available is None or available >= number_to_create:
+        return number_to_create
+
+    # Tell the user how much of the usage comes from the current namespace, since
+    # deleting servers from it is the easiest way to make room.
+    namespace = config["general"]["namespace"]
+    in_namespace = len(client.get_instances(namespace))
+    message = (
+        "Not enough quota to create %d server(s): room for %d more, limited by %s"
+        " (%s, %d instance(s) in namespace %s)."
+        % (
+            number_to_create, available, limits.bottleneck().resource,
+            limits.describe(), in_namespace, namespace,
+        )
+    )
+
+    if policy == "fail" or available == 0:
+        raise errors.QuotaExceededError(message)
+
+    logger.warning("%s Only creating %d server(s).", message, available)
+    return available
+
+
 def create(config):
     """Create a server by creating an instance and attaching a domain name to it.
 
@@ -203,24 +480,54 @@ def create(config):
     post_install_script = load_post_install_script(args.post_install_script)
 
     number_to_create = int(args.number) if args.number is not None else 1
+    number_to_create = admit(number_to_create, args.quota_policy, config)
 
-    if number_to_create > 1:
-        server_domain_names = []
-        failures = 0
+    # Check the names in use with a single listing, so no creation is wasted on a name
+    # that's already taken.
+    try:
+        allocator = load_name_allocator(config, args.ignore_listing_errors)
+    except errors.InvalidNameError as e:
+        logger.error("Invalid configuration: %s", e)
+        sys.exit(1)
+    except Exception as e:
+        logger.error(
+            "Failed to list the existing servers, aborting (use --ignore-listing-errors"
+            " to create the servers anyway): %s", e,
+        )
+        sys.exit(1)
+
+    if number_to_create > 1 or args.ready_by is not None:
+        concurrency = args.concurrency or instances_provider.count_shards(config)
+        transport.set_concurrency(concurrency)
+
+        if args.ready_by is not None:
+            # Pace the creations so the servers are ready just in time.
+            from install_party.creator import schedule
+
+            past_duration = None
+            if args.durations_from:
+                past_duration = schedule.load_past_duration(args.durations_from)
+
+            server_domain_names = schedule.create_by_deadline(
+                number_to_create,
+                args.ready_by,
+                post_install_script,
+                config,
+                concurrency,
+                allocator,
+                past_duration,
+                args.warm_up,
+                args.ready_margin,
+                args.start_interval,
+            )
+        else:
+            # Create the n servers, each with a random name that's not in use.
+            names = allocator.allocate(number_to_create)
+            server_domain_names = create_servers(
+                names, post_install_script, config, concurrency,
+            )
 
-        # Create the n servers.
-        for i in range(number_to_create):
-            # Generate a random name for the server.
-            name = random_string(5)
-            try:
-                # Create the server and stave its domain name.
-                domain_name = create_server(name, post_install_script, config)
-                server_domain_names.append(domain_name)
-            except Exception as e:
-                logger.error(
-                    "An error happened while creating the server, skipping: %s", e
-                )
-                failures += 1
+        failures = number_to_create - len(server_domain_names)
 
         # Print specific messages depending on whether creations failed.
         if failures < number_to_create:
@@ -238,20 +545,59 @@ def create(config):
         else:
             print("\nAll servers have failed to create.")
     else:
-        # Generate a random name (5 lowercase letters) if none was provided.
-        if args.name is None:
-            name = random_string(5)
-        else:
-            name = args.name
-
         # Create the server.
         try:
-            create_server(name, post_install_script, config)
+            # Generate a random name (5 lowercase letters) if none was provided.
+            if args.name is None:
+                name = allocator.allocate()[0]
+            else:
+                name = allocator.reserve(args.name)
+
+            addresses = reserve_addresses(1, config)
+            create_server(
+                name, post_install_script, config, addresses[0] if addresses else None,
+            )
         except Exception as e:
             logger.error(
                 "An error happened while creating the server, aborting: %s", e
             )
 
+    report_metrics(args)
+
+
+def report_metrics(args):
+    """Print a summary of the time spent in each phase of the creation and of the
+    calls made to the providers' APIs, and export them to the files provided in the
+    command-line arguments, if any.
+
+    Args:
+        args (Namespace): The parsed command-line arguments.
+    """
+    from tabulate import tabulate
+
+    print("\nTIME SPENT PER PHASE (SECONDS)")
+    print(tabulate(
+        metrics.summary_rows(),
+        headers=["Phase", "Count", "p50", "p95", "Max"],
+        tablefmt="psql",
+        floatfmt=".3f",
+    ))
+
+    calls = metrics.get_calls()
+    if calls:
+        print("\nPROVIDER API CALLS")
+        print(tabulate(
+            sorted(calls.items()),
+            headers=["Endpoint", "Calls"],
+            tablefmt="psql",
+        ))
+
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+
+    if args.metrics_prometheus:
+        metrics.write_prometheus(args.metrics_prometheus)
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -263,13 +609,87 @@ def parse_args():
         help="Path to a Bash script to run once the server has been created and the"
              " minimal installation has been performed.",
     )
+    parser.add_argument(
+        "--metrics-json",
+        metavar="PATH",
+        help="Write the time spent in each phase of the creation and the number of calls"
+             " made to the providers' APIs to this file, as JSON.",
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        metavar="PATH",
+        help="Write the time spent in each phase of the creation and the number of calls"
+             " made to the providers' APIs to this file, using Prometheus' text-based"
+             " format (e.g. for the node exporter's textfile collector).",
+    )
+    parser.add_argument(
+        "--ignore-listing-errors",
+        action="store_true",
+        help="Create the servers even if the existing ones can't be listed, at the risk"
+             " of giving a new server the name of an existing one.",
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        help="Maximum number of servers to create at the same time when using"
+             " -N/--number. Defaults to the number of shards instances are spread"
+             " across (i.e. 1 if instances aren't sharded).",
+    )
+    parser.add_argument(
+        "-q", "--quota-policy",
+        choices=["fail", "cap", "ignore"],
+        default="fail",
+        help="What to do if the instances provider's quotas don't leave enough room for"
+             " all of the servers to create: abort before creating anything (fail),"
+             " only create as many servers as there is room for (cap), or don't check"
+             " the quotas at all (ignore). Defaults to fail.",
+    )
+    parser.add_argument(
+        "-r", "--ready-by",
+        metavar="TIME",
+        type=deadline,
+        help="Time (HH:MM for today, or YYYY-MM-DD HH:MM) by which the servers must be"
+             " ready. Rather than creating all of the servers right away, creations are"
+             " spread out and paced so that servers are ready just in time, from how"
+             " long creating a server takes. Can only be used with -N/--number.",
+    )
+    parser.add_argument(
+        "--durations-from",
+        metavar="PATH",
+        help="Metrics written by a past run with --metrics-json, to estimate how long"
+             " creating a server takes when using -r/--ready-by.",
+    )
+    parser.add_argument(
+        "--warm-up",
+        type=int,
+        default=1,
+        help="Number of servers to create right away to estimate how long creating a"
+             " server takes when using -r/--ready-by without --durations-from. Defaults"
+             " to 1.",
+    )
+    parser.add_argument(
+        "--ready-margin",
+        type=float,
+        default=60,
+        metavar="SECONDS",
+        help="Number of seconds before the time provided with -r/--ready-by the servers"
+             " must be ready by. Defaults to 60.",
+    )
+    parser.add_argument(
+        "--start-interval",
+        type=float,
+        default=0,
+        metavar="SECONDS",
+        help="Minimum number of seconds between the starts of two creations when using"
+             " -r/--ready-by, e.g. to stay under the provider's rate limits. Defaults to"
+             " 0.",
+    )
     group = parser.add_mutually_exclusive_group()
     group.add_argument(
         "-n", "--name",
         help="Name to give the instance, and to build its domain name from. Defaults to "
-             " a random string of 5 lowercase letters. Can only contain the characters"
-             " allowed in a domain name label. Cannot be used in combination with"
-             " -N/--number.",
+             " a random string of 5 lowercase letters. Can only contain lowercase letters"
+             " and digits. Cannot be used in combination with -N/--number.",
     )
     group.add_argument(
         "-N", "--number",
@@ -277,4 +697,22 @@ def parse_args():
              " 5 lowercase letters. Cannot be used in combination with -n/--name.",
     )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    if args.ready_by is not None:
+        if args.number is None:
+            parser.error("argument -r/--ready-by can only be used with -N/--number")
+        if args.ready_by <= time.time():
+            parser.error("argument -r/--ready-by: the deadline has already passed")
+
+    return args
+
+
+def deadline(value):
+    """Parse the deadline provided with -r/--ready-by, see schedule.parse_deadline."""
+    from install_party.creator.schedule import parse_deadline
+
+    try:
+        return parse_deadline(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
@@ -0,0 +1,252 @@
+import logging
+import random
+import re
+import string
+import threading
+from typing import Iterable, List, Optional
+
+from install_party.lister.list import get_list
+from install_party.util import errors
+
+logger = logging.getLogger(__name__)
+
+# The length of the names generated for the servers. 5 lowercase letters give about
+# 11.8 million possible names.
+NAME_LENGTH = 5
+
+# The number of names to draw for a server before giving up, if every one of them is
+# already in use. Only reached if the namespace is close to full.
+MAX_ATTEMPTS = 100
+
+# A DNS label as per RFC 1035 (with the relaxation of RFC 1123 allowing labels to
+# start with a digit), which namespaces must be. Only lowercase letters are allowed,
+# since DNS names are case insensitive but instance names aren't, so "Foo" and "foo"
+# would be different instances sharing the same domain name.
+LABEL_REGEX = re.compile(r"^[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?$")
+
+# A server's name, i.e. a DNS label without hyphens. Instances are named
+# "<namespace>-<name>", so a hyphen in the name would make the namespace ambiguous (see
+# lister.list.INSTANCE_NAME_REGEX).
+NAME_REGEX = re.compile(r"^[a-z0-9]{1,63}$")
+
+# The maximum length of a domain name, in its dotted form without the trailing dot.
+MAX_DOMAIN_LENGTH = 253
+
+
+def random_string(n):
+    """Generate a random string made of n lowercase letters."""
+    return ''.join(random.choices(string.ascii_lowercase, k=n))
+
+
+def check_label(label: str, what: str = "namespace"):
+    """Check that the provided string can be used as a label in a domain name.
+
+    Args:
+        label (str): The string to check.
+        what (str): What the string is, for the error message.
+
+    Raises:
+        InvalidNameError: The string isn't a valid DNS label.
+    """
+    if not LABEL_REGEX.match(label):
+        raise errors.InvalidNameError(
+            "Invalid %s %r: must be 1 to 63 lowercase letters, digits or hyphens, and"
+            " can't start or end with a hyphen." % (what, label)
+        )
+
+
+def check_namespace(config):
+    """Check that the configured namespace can be used as a label in a domain name.
+
+    Args:
+        config (dict): The parsed configuration.
+
+    Raises:
+        InvalidNameError: The configured namespace isn't a valid DNS label.
+    """
+    check_label(config["general"]["namespace"], "namespace (general.namespace)")
+
+
+class NameAllocator:
+    def __init__(
+            self,
+            used_names: Iterable[str] = (),
+            namespace: Optional[str] = None,
+            zone: Optional[str] = None,
+            length: int = NAME_LENGTH,
+    ):
+        """Hands out names for new servers that aren't already in use, and that make
+        valid domain names. Names are reserved as soon as they're handed out, so a
+        whole batch can be allocated up front without collisions within the batch.
+
+        The names in use and the names handed out are kept apart, so that the former
+        can be replaced with a fresh listing (see reset) without forgetting about the
+        servers still being created.
+
+        Args:
+            used_names (Iterable[str]): The names of the existing servers, e.g. the keys
+                of the dict returned by list.get_list.
+            namespace (str): The namespace the servers are created in, if the names
+                must be checked against the length limit of domain names.
+            zone (str): The DNS zone the servers' domain names are created in, if the
+                names must be checked against the length limit of domain names.
+            length (int): The length of the generated names.
+
+        Raises:
+            InvalidNameError: The namespace isn't a valid DNS label.
+        """
+        self.length = length
+        self.lock = threading.Lock()
+        self.used = set(used_names)
+        # The names handed out which haven't been released.
+        self.reserved = set()
+
+        # The number of characters "name.namespace.zone" takes on top of the name.
+        self.suffix_length = 0
+        if namespace is not None:
+            check_label(namespace, "namespace")
+            self.suffix_length = len(namespace) + 1
+            if zone is not None:
+                self.suffix_length += len(zone.rstrip(".")) + 1
+
+    def check(self, name: str):
+        """Check that a name is a valid DNS label without hyphens, and that the domain
+        name it would give the server isn't too long.
+
+        Args:
+            name (str): The name to check.
+
+        Raises:
+            InvalidNameError: The name can't be used.
+        """
+        if not NAME_REGEX.match(name):
+            raise errors.InvalidNameError(
+                "Invalid name %r: must be 1 to 63 lowercase letters or digits." % name
+            )
+
+        if len(name) + self.suffix_length > MAX_DOMAIN_LENGTH:
+            raise errors.InvalidNameError(
+                "Invalid name %r: the server's domain name would be longer than %d"
+                " characters." % (name, MAX_DOMAIN_LENGTH)
+            )
+
+    def reserve(self, name: str) -> str:
+        """Reserve a name picked by the user.
+
+        Args:
+            name (str): The name to reserve.
+
+        Returns:
+            The name.
+
+        Raises:
+            InvalidNameError: The name can't be used.
+            NameCollisionError: The name is already in use.
+        """
+        self.check(name)
+
+        with self.lock:
+            if name in self.used or name in self.reserved:
+                raise errors.NameCollisionError("Name %s is already in use." % name)
+            self.reserved.add(name)
+
+        return name
+
+    def allocate(self, count: int = 1) -> List[str]:
+        """Generate and reserve names that aren't in use.
+
+        Args:
+            count (int): The number of names to generate.
+
+        Returns:
+            The names.
+
+        Raises:
+            InvalidNameError: The generated names would make domain names that are too
+                long.
+            NameCollisionError: No free name could be found.
+        """
+        if self.length + self.suffix_length > MAX_DOMAIN_LENGTH:
+            raise errors.InvalidNameError(
+                "Can't generate names: the servers' domain names would be longer than"
+                " %d characters." % MAX_DOMAIN_LENGTH
+            )
+
+        names = []
+        with self.lock:
+            for _ in range(count):
+                for _ in range(MAX_ATTEMPTS):
+                    name = random_string(self.length)
+                    if name not in self.used and name not in self.reserved:
+                        break
+                else:
+                    # Don't keep the names allocated so far.
+                    self.reserved.difference_update(names)
+                    raise errors.NameCollisionError(
+                        "Couldn't find a free name after %d attempts (%d names in"
+                        " use)." % (MAX_ATTEMPTS, len(self.used | self.reserved))
+                    )
+
+                self.reserved.add(name)
+                names.append(name)
+
+        return names
+
+    def reset(self, used_names: Iterable[str]):
+        """Replace the names in use, e.g. with the ones from a fresh listing. The names
+        handed out are still considered in use until they're released, unless they're
+        part of the new names in use.
+
+        Args:
+            used_names (Iterable[str]): The names of the existing servers.
+        """
+        used = set(used_names)
+        with self.lock:
+            self.used = used
+            self.reserved.difference_update(used)
+
+    def release(self, names: Iterable[str]):
+        """Make names handed out available again, e.g. because the servers they were
+        handed out for have been created (and are part of the names in use), or failed
+        to.
+
+        Args:
+            names (Iterable[str]): The names to release.
+        """
+        with self.lock:
+            self.reserved.difference_update(names)
+
+
+def load_name_allocator(config, ignore_listing_errors: bool = False) -> NameAllocator:
+    """Build a name allocator aware of the names already in use in the configured
+    namespace, using a single listing of the instances and DNS records.
+
+    Args:
+        config (dict): The parsed configuration.
+        ignore_listing_errors (bool): Whether to carry on with an allocator only aware
+            of the names it hands out if the listing fails, rather than raising.
+
+    Returns:
+        The name allocator.
+
+    Raises:
+        InvalidNameError: The configured namespace isn't a valid DNS label.
+    """
+    # Don't bother listing the servers if the namespace can't be used anyway.
+    check_namespace(config)
+
+    try:
+        used_names = get_list(config).keys()
+    except Exception as e:
+        if not ignore_listing_errors:
+            raise
+        logger.warning(
+            "Failed to list the existing servers, names may collide with them: %s", e,
+        )
+        used_names = ()
+
+    logger.debug("%d name(s) already in use", len(used_names))
+
+    return NameAllocator(
+        used_names, config["general"]["namespace"], config["dns"]["zone"],
+    )
@@ -0,0 +1,490 @@
+import datetime
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+from install_party.creator.create import create_server, reserve_addresses
+from install_party.creator.names import NameAllocator
+from install_party.util import metrics
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of servers to observe before trusting the observed durations over the
+# ones from past runs.
+MIN_SAMPLES = 3
+
+# The formats the deadline can be provided in.
+DEADLINE_FORMATS = (
+    "%H:%M",
+    "%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+)
+
+
+def parse_deadline(value: str) -> float:
+    """Parse a deadline provided on the command line, either as a time of the day (e.g.
+    "14:00", meaning today) or as a date and a time (e.g. "2019-11-02 14:00"), in the
+    local timezone.
+
+    Args:
+        value (str): The deadline to parse.
+
+    Returns:
+        The deadline as a UNIX timestamp.
+
+    Raises:
+        ValueError: The deadline isn't in one of the supported formats.
+    """
+    for deadline_format in DEADLINE_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(value, deadline_format)
+        except ValueError:
+            continue
+
+        if "%Y" not in deadline_format:
+            parsed = datetime.datetime.combine(datetime.date.today(), parsed.time())
+
+        return parsed.timestamp()
+
+    raise ValueError(
+        "Invalid deadline %s, expected HH:MM or YYYY-MM-DD HH:MM" % value
+    )
+
+
+def load_past_duration(path: str) -> Optional[float]:
+    """Read how long creating a server took in a past run from the metrics written by
+    that run (see the --metrics-json argument).
+
+    Args:
+        path (str): The path of the file the metrics were written to.
+
+    Returns:
+        The 95th percentile of the time it took to create a server, in seconds, or None
+        if the file doesn't contain this information.
+    """
+    with open(path) as f:
+        phases = json.load(f).get("phases", {})
+
+    if "server.total" not in phases:
+        logger.warning("%s doesn't contain any server creation duration", path)
+        return None
+
+    return phases["server.total"]["p95"]
+
+
+class DurationEstimator:
+    def __init__(self, past_duration: Optional[float] = None):
+        """Estimates how long creating a server (from the call to the instances
+        provider's API to the server answering requests) takes, from past runs and from
+        the servers created so far.
+
+        Args:
+            past_duration (float): How long creating a server took in a past run, if
+                known.
+        """
+        self.past_duration = past_duration
+        self.samples: List[float] = []
+
+    def add(self, duration: float):
+        """Record how long creating a server took.
+
+        Args:
+            duration (float): The duration, in seconds.
+        """
+        self.samples.append(duration)
+
+    def estimate(self) -> Optional[float]:
+        """Returns: The duration to plan for, in seconds, or None if there's nothing to
+        base an estimate on yet. This is the 95th percentile of the observed durations
+        once there are enough of them, and the longest of the known durations until
+        then."""
+        if len(self.samples) >= MIN_SAMPLES:
+            return metrics.percentile(self.samples, 95)
+
+        known = list(self.samples)
+        if self.past_duration is not None:
+            known.append(self.past_duration)
+
+        return max(known) if known else None
+
+
+def plan_starts(
+        count: int,
+        finish_by: float,
+        duration: float,
+        concurrency: int,
+        start_interval: float = 0,
+) -> List[float]:
+    """Compute the latest times at which the creation of each server can start so that
+    every server is ready by the provided time, i.e. so that servers spend as little
+    time as possible sitting idle before they're needed.
+
+    Servers are planned backwards from the deadline in waves of as many servers as can
+    be created at the same time, each wave starting one creation duration before the
+    next one.
+
+    Args:
+        count (int): The number of servers to create.
+        finish_by (float): The time every server must be ready by, as a UNIX timestamp.
+        duration (float): How long creating a server takes, in seconds.
+        concurrency (int): The maximum number of servers to create at the same time.
+        start_interval (float): The minimum number of seconds between the starts of two
+            creations, e.g. to stay under the provider's rate limits.
+
+    Returns:
+        The start times, as UNIX timestamps, in chronological order.
+    """
+    starts: List[float] = []
+    for i in range(count):
+        start = finish_by - (i // concurrency + 1) * duration
+        if starts:
+            start = min(start, starts[-1] - start_interval)
+        starts.append(start)
+
+    starts.reverse()
+    return starts
+
+
+class DeadlineScheduler:
+    def __init__(
+            self,
+            count: int,
+            deadline: float,
+            post_install_script: str,
+            config,
+            concurrency: int,
+            estimator: DurationEstimator,
+            allocator: NameAllocator,
+            warm_up: int = 0,
+            margin: float = 0,
+            start_interval: float = 0,
+    ):
+        """Creates servers so that they're all ready just in time for a deadline,
+        rather than long before it (which costs instance-hours) or after it.
+
+        The creations are planned backwards from the deadline using the estimated
+        duration of a creation, and re-planned each time a server becomes ready, so the
+        pace adjusts to the durations actually observed. Servers that fail to create are
+        replaced.
+
+        Args:
+            count (int): The number of servers to create.
+            deadline (float): The time the servers must be ready by, as a UNIX
+                timestamp.
+            post_install_script (str): A script to run after the post-creation script
+                has finished. If no script has been provided, it's an empty string.
+            config (dict): The parsed configuration.
+            concurrency (int): The maximum number of servers to create at the same time.
+            estimator (DurationEstimator): The estimator for the duration of a creation.
+            allocator (NameAllocator): The allocator to get the servers' names from,
+                including the names of the servers replacing failed ones.
+            warm_up (int): The number of servers to create right away to measure how
+                long a creation takes, if the estimator can't tell yet.
+            margin (float): The number of seconds before the deadline the servers must
+                be ready by, to absorb variations in the creations' durations.
+            start_interval (float): The minimum number of seconds between the starts of
+                two creations, e.g. to stay under the provider's rate limits.
+        """
+        self.count = count
+        self.deadline = deadline
+        self.post_install_script = post_install_script
+        self.config = config
+        self.concurrency = concurrency
+        self.estimator = estimator
+        self.allocator = allocator
+        self.warm_up = warm_up
+        self.margin = margin
+        self.start_interval = start_interval
+
+        # The servers being created, associated with their name.
+        self.in_flight: Dict = {}
+        # The domain names of the servers that are ready, along with the time at which
+        # they became ready.
+        self.ready: List[Tuple[str, float]] = []
+        self.failures = 0
+        self.last_start = 0.0
+        # Whether we gave up on creating the requested number of servers.
+        self.gave_up = False
+
+    def run(self) -> List[Tuple[str, float]]:
+        """Create the servers.
+
+        Returns:
+            The domain names of the servers that were successfully created, along with
+            the time at which each of them became ready, as a UNIX timestamp.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            if self.estimator.estimate() is None:
+                warm_up = max(min(self.warm_up, self.count, self.concurrency), 1)
+                logger.info(
+                    "No known creation duration, creating %d server(s) to measure it",
+                    warm_up,
+                )
+                for _ in range(warm_up):
+                    self.start(executor)
+
+            while len(self.ready) < self.count:
+                # Give up if creations keep failing rather than replacing them forever.
+                if self.failures >= self.count:
+                    logger.error("Too many creations failed, giving up")
+                    self.gave_up = True
+                    break
+
+                timeout = self.start_due(executor)
+
+                if not self.in_flight:
+                    if timeout is None:
+                        break
+                    # Nothing to wait for but the next start.
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(
+                    list(self.in_flight), timeout=timeout, return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    self.collect(future)
+
+            if self.in_flight:
+                self.collect_stragglers()
+
+        return self.ready
+
+    def collect_stragglers(self):
+        """Cancel the creations that haven't started yet, and wait for the ones that
+        have, since they can't be interrupted. The servers they create are accounted
+        for like any other, rather than being left behind without being reported.
+        """
+        stragglers = []
+        for future in list(self.in_flight):
+            if future.cancel():
+                self.in_flight.pop(future)
+            else:
+                stragglers.append(future)
+
+        if not stragglers:
+            return
+
+        logger.warning(
+            "Waiting for %d creation(s) already in progress: %s",
+            len(stragglers),
+            ", ".join(sorted(self.in_flight[future] for future in stragglers)),
+        )
+
+        for future in wait(stragglers)[0]:
+            self.collect(future)
+
+    def start_due(self, executor) -> Optional[float]:
+        """Start the creations which planned start time has passed, as long as there's
+        room for them.
+
+        Args:
+            executor (ThreadPoolExecutor): The executor to run the creations in.
+
+        Returns:
+            The number of seconds until the next creation is due, or None if we must
+            wait for a creation to finish first.
+        """
+        duration = self.estimator.estimate()
+        if duration is None:
+            # Still warming up. If the warm-up creations all failed, try another one.
+            if not self.in_flight:
+                self.start(executor)
+            return None
+
+        remaining = self.count - len(self.ready) - len(self.in_flight)
+        if remaining <= 0:
+            return None
+
+        starts = plan_starts(
+            remaining,
+            self.deadline - self.margin,
+            duration,
+            self.concurrency,
+            self.start_interval,
+        )
+
+        for start in starts:
+            now = time.time()
+            if len(self.in_flight) >= self.concurrency:
+                return None
+
+            if now - self.last_start < self.start_interval:
+                return self.start_interval - (now - self.last_start)
+
+            if start > now:
+                return start - now
+
+            self.start(executor)
+
+        return None
+
+    def start(self, executor):
+        """Start the creation of a new server.
+
+        Args:
+            executor (ThreadPoolExecutor): The executor to run the creation in.
+        """
+        name = self.allocator.allocate()[0]
+        logger.info(
+            "Starting creation of %s (%d ready, %d in progress, %d to go)",
+            name,
+            len(self.ready),
+            len(self.in_flight),
+            self.count - len(self.ready) - len(self.in_flight),
+        )
+
+        self.last_start = time.time()
+        self.in_flight[executor.submit(self.create, name)] = name
+
+    def create(self, name: str) -> Tuple[str, float]:
+        """Create a server and measure how long it took.
+
+        Args:
+            name (str): The name of the server.
+
+        Returns:
+            The domain name of the server, and how long creating it took in seconds.
+        """
+        start = time.monotonic()
+
+        addresses = reserve_addresses(1, self.config)
+        domain_name = create_server(
+            name,
+            self.post_install_script,
+            self.config,
+            addresses[0] if addresses else None,
+        )
+
+        return domain_name, time.monotonic() - start
+
+    def collect(self, future):
+        """Account for a creation that finished, and re-estimate the duration of a
+        creation.
+
+        Args:
+            future (Future): The creation that finished.
+        """
+        name = self.in_flight.pop(future)
+
+        try:
+            domain_name, duration = future.result()
+        except Exception as e:
+            self.failures += 1
+            logger.error(
+                "Failed to create server %s%s: %s",
+                name,
+                "" if self.gave_up else ", replacing it",
+                e,
+            )
+            return
+
+        now = time.time()
+        self.ready.append((domain_name, now))
+        self.estimator.add(duration)
+
+        lateness = self.projected_finish(now) - self.deadline
+        logger.info(
+            "%s is ready after %.1fs (%d/%d ready, planning for %.1fs per server%s)",
+            domain_name,
+            duration,
+            len(self.ready),
+            self.count,
+            self.estimator.estimate(),
+            ", %.0fs behind schedule" % lateness if lateness > 0 else "",
+        )
+
+    def projected_finish(self, now: float) -> float:
+        """Estimate when the last server will be ready if creations keep taking as long
+        as they have so far.
+
+        Args:
+            now (float): The current time, as a UNIX timestamp.
+
+        Returns:
+            The projected time, as a UNIX timestamp.
+        """
+        duration = self.estimator.estimate()
+        remaining = self.count - len(self.ready) - len(self.in_flight)
+        if duration is None or remaining <= 0:
+            return now
+
+        starts = plan_starts(
+            remaining,
+            self.deadline - self.margin,
+            duration,
+            self.concurrency,
+            self.start_interval,
+        )
+        # If the first creation should already have started, everything is pushed back
+        # by as much.
+        return self.deadline - self.margin + max(now - starts[0], 0)
+
+
+def create_by_deadline(
+        count: int,
+        deadline: float,
+        post_install_script: str,
+        config,
+        concurrency: int,
+        allocator: NameAllocator,
+        past_duration: Optional[float] = None,
+        warm_up: int = 1,
+        margin: float = 0,
+        start_interval: float = 0,
+) -> List[str]:
+    """Create servers so that they're all ready just in time for the deadline, and
+    print how many instance-hours were spent waiting for it. See DeadlineScheduler.
+
+    Args:
+        count (int): The number of servers to create.
+        deadline (float): The time the servers must be ready by, as a UNIX timestamp.
+        post_install_script (str): A script to run after the post-creation script has
+            finished. If no script has been provided, it's an empty string.
+        config (dict): The parsed configuration.
+        concurrency (int): The maximum number of servers to create at the same time.
+        allocator (NameAllocator): The allocator to get the servers' names from.
+        past_duration (float): How long creating a server took in a past run, if known.
+        warm_up (int): The number of servers to create right away to measure how long a
+            creation takes, if past_duration isn't provided.
+        margin (float): The number of seconds before the deadline the servers must be
+            ready by.
+        start_interval (float): The minimum number of seconds between the starts of two
+            creations.
+
+    Returns:
+        The domain names of the servers that were successfully created.
+    """
+    scheduler = DeadlineScheduler(
+        count,
+        deadline,
+        post_install_script,
+        config,
+        concurrency,
+        DurationEstimator(past_duration),
+        allocator,
+        warm_up,
+        margin,
+        start_interval,
+    )
+    ready = scheduler.run()
+
+    idle = sum(max(deadline - ready_at, 0) for _, ready_at in ready)
+    late = [domain_name for domain_name, ready_at in ready if ready_at > deadline]
+
+    print(
+        "\n%d server(s) ready, %.2f instance-hour(s) spent idle before the deadline."
+        % (len(ready), idle / 3600)
+    )
+    if late:
+        print(
+            "%d server(s) became ready after the deadline (the last one %.0fs late)."
+            % (len(late), max(ready_at for _, ready_at in ready) - deadline)
+        )
+
+    return [domain_name for domain_name, _ in ready]
@@ -0,0 +1,244 @@
+import argparse
+import http.client
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import urllib.parse
+
+from install_party.creator.create import load_post_install_script
+from install_party.lister.list import print_list
+from install_party.util.entry import Entry
+
+logger = logging.getLogger(__name__)
+
+# The address of the daemon to use if none has been provided.
+DEFAULT_URL = "http://127.0.0.1:8642"
+
+# The environment variable the token to authenticate with can be read from.
+TOKEN_ENV_VAR = "INSTALL_PARTY_TOKEN"
+
+# The number of seconds to wait between two checks of a creation job's status.
+JOB_POLL_INTERVAL = 1
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout=None):
+        """An HTTP connection going through a Unix socket.
+
+        Args:
+            path (str): The path to the Unix socket.
+            timeout (float): The timeout for the socket's operations, if any.
+        """
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def send_request(args, method: str, path: str, body: dict = None) -> dict:
+    """Send a request to the daemon and return its response.
+
+    Args:
+        args (Namespace): The parsed command-line arguments.
+        method (str): The HTTP method to use.
+        path (str): The path to send the request to.
+        body (dict): The body of the request, if any.
+
+    Returns:
+        The parsed body of the response.
+    """
+    if args.socket:
+        connection = UnixHTTPConnection(args.socket)
+    else:
+        url = urllib.parse.urlsplit(args.url)
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+
+    headers = {}
+    if args.token:
+        headers["Authorization"] = "Bearer %s" % args.token
+
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+
+    try:
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        content = json.loads(response.read() or b"{}")
+    finally:
+        connection.close()
+
+    if response.status not in (200, 202):
+        sys.stderr.write("Error from the daemon: %s\n" % content.get("error"))
+        sys.exit(1)
+
+    return content
+
+
+def run_client(config):
+    """Send a create, list or delete request to a running daemon (see serve.serve) and
+    print the result.
+
+    Args:
+        config (dict): The parsed configuration. Not used, since the daemon has its own.
+    """
+    args = parse_args()
+
+    if args.command == "list":
+        content = send_request(args, "GET", "/list?refresh" if args.refresh else "/list")
+        entries_dict = {
+            entry_id: Entry.from_dict(entry)
+            for entry_id, entry in content["entries"].items()
+        }
+        print_list(entries_dict, args.hide_orphans)
+    elif args.command == "create":
+        content = send_request(args, "POST", "/create", {
+            "name": args.name,
+            "number": int(args.number) if args.number is not None else 1,
+            "concurrency": args.concurrency,
+            "post_install_script": load_post_install_script(args.post_install_script),
+        })
+
+        # The servers are created in the background, wait for them.
+        print("Creating %d server(s)..." % len(content["names"]))
+        while content["status"] == "running":
+            time.sleep(JOB_POLL_INTERVAL)
+            content = send_request(args, "GET", "/jobs/%s" % content["id"])
+
+        if content["error"]:
+            sys.stderr.write("The creation failed: %s\n" % content["error"])
+            sys.exit(1)
+
+        if content["created"]:
+            print("Created servers:")
+            for domain_name in content["created"]:
+                print("\t-", domain_name)
+        if content["failed"]:
+            print("%d server(s) failed to create." % content["failed"])
+    elif args.command == "delete":
+        content = send_request(args, "POST", "/delete", {
+            "servers": args.server,
+            "all": args.all,
+            "exclude": args.exclude,
+            "dry_run": args.dry_run,
+        })
+
+        verb = "Would have deleted" if content["dry_run"] else "Deleted"
+        print("%s servers:" % verb)
+        for name in content["deleted"]:
+            print("\t-", name)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="install_party client",
+        description="Send requests to a daemon started with the serve mode.",
+    )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument(
+        "-u", "--url",
+        default=DEFAULT_URL,
+        help="URL of the daemon. Defaults to %s." % DEFAULT_URL,
+    )
+    target.add_argument(
+        "-S", "--socket",
+        metavar="PATH",
+        help="Path to the Unix socket the daemon listens on.",
+    )
+
+    parser.add_argument(
+        "-t", "--token-file",
+        metavar="PATH",
+        help="Path to a file containing the token to authenticate with. Can also be"
+             " provided with the %s environment variable." % TOKEN_ENV_VAR,
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    list_parser = subparsers.add_parser("list", help="List existing servers.")
+    list_parser.add_argument(
+        "-H", "--hide-orphans",
+        action="store_true",
+        help="Hide instances without a domain and domains without an instance. Defaults"
+             " to false.",
+    )
+    list_parser.add_argument(
+        "-r", "--refresh",
+        action="store_true",
+        help="Make the daemon refresh its list of servers before answering.",
+    )
+
+    create_parser = subparsers.add_parser("create", help="Create new servers.")
+    create_parser.add_argument(
+        "-s", "--post-install-script",
+        help="Path to a Bash script to run once the server has been created and the"
+             " minimal installation has been performed.",
+    )
+    group = create_parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "-n", "--name",
+        help="Name to give the server. Defaults to a random string of 5 lowercase"
+             " letters. Cannot be used in combination with -N/--number.",
+    )
+    group.add_argument(
+        "-N", "--number",
+        help="Number of servers to create. Cannot be used in combination with"
+             " -n/--name.",
+    )
+
+    create_parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        help="Maximum number of servers to create at the same time when using"
+             " -N/--number. Defaults to the daemon's -c/--concurrency.",
+    )
+
+    delete_parser = subparsers.add_parser("delete", help="Delete existing servers.")
+    delete_parser.add_argument(
+        "-d", "--dry-run",
+        action="store_true",
+        help="List the deletions that would normally happen but don't actually perform"
+             " them.",
+    )
+    delete_parser.add_argument(
+        "-e", "--exclude",
+        action="append",
+        metavar="NAME",
+        help="Servers to exclude from the deletion (use it once per name). Can only be"
+             " used with the -a/--all argument.",
+    )
+    group = delete_parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        "-s", "--server",
+        action="append",
+        metavar="NAME",
+        help="Only delete the servers for the provided name(s) (use it once per name).",
+    )
+    group.add_argument(
+        "-a", "--all",
+        action="store_true",
+        help="Delete all of the servers (except the ones provided with --exclude, if"
+             " any).",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "delete" and args.exclude and not args.all:
+        parser.error("argument -e/--exclude can only be used with argument -a/--all")
+
+    if args.token_file:
+        with open(args.token_file) as f:
+            args.token = f.read().strip()
+    else:
+        args.token = os.getenv(TOKEN_ENV_VAR, "").strip()
+
+    return args
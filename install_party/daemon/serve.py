@@ -0,0 +1,631 @@
+import argparse
+import hmac
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from install_party.creator.create import admit, create_servers
+from install_party.creator.names import NameAllocator, check_namespace
+from install_party.dns import dns_provider
+from install_party.eraser.delete import delete_entries, filter_entries_dict
+from install_party.instances import instances_provider
+from install_party.lister.list import get_list
+from install_party.util import errors, transport
+from install_party.util.entry import Entry
+
+logger = logging.getLogger(__name__)
+
+# The environment variable the token clients must authenticate with can be read from.
+TOKEN_ENV_VAR = "INSTALL_PARTY_TOKEN"
+
+# The number of finished jobs to remember, so their outcome can still be retrieved.
+MAX_FINISHED_JOBS = 100
+
+
+class EntryIndex:
+    def __init__(self, config):
+        """An in-memory copy of the entries under the configured namespace, as built by
+        list.get_list, which can be queried without hitting the providers' APIs.
+
+        Args:
+            config (dict): The parsed configuration.
+        """
+        self.config = config
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Entry] = {}
+        self.refreshed_at = 0.0
+        # Hands out the names of the servers to create, so that concurrent creations
+        # never pick the same name. Aware of the names in the index, and of the names
+        # handed out to the creations that are still running.
+        self.allocator = NameAllocator(
+            (), config["general"]["namespace"], config["dns"]["zone"],
+        )
+
+    def refresh(self):
+        """Retrieve the entries from the providers' APIs and replace the index's
+        content with them.
+        """
+        logger.debug("Refreshing the index...")
+
+        entries = get_list(self.config)
+        with self.lock:
+            self.entries = entries
+            self.refreshed_at = time.time()
+            self.allocator.reset(entries.keys())
+
+        logger.debug("Index refreshed, %d entries", len(entries))
+
+    def reserve_names(self, name: Optional[str] = None, number: int = 1) -> List[str]:
+        """Reserve names for new servers, which aren't in the index nor reserved for
+        another creation, see NameAllocator.
+
+        Args:
+            name (str): The name picked by the user, if any.
+            number (int): The number of names to generate if no name was picked.
+
+        Returns:
+            The names.
+
+        Raises:
+            InvalidNameError: The name can't be used.
+            NameCollisionError: The name is already in use, or no free name could be
+                found.
+        """
+        with self.lock:
+            if name:
+                return [self.allocator.reserve(name)]
+            return self.allocator.allocate(number)
+
+    def release_names(self, names: List[str]):
+        """Release names reserved with reserve_names, once the servers they were
+        reserved for have been created (and the index refreshed) or failed to.
+
+        Args:
+            names (list): The names to release.
+        """
+        with self.lock:
+            self.allocator.release(names)
+
+    def snapshot(self) -> Tuple[float, Dict[str, Entry]]:
+        """Returns: The time of the last refresh, and the entries. The entries must not
+        be modified, which lets us hand them out without copying them, since refreshes
+        replace them rather than modify them."""
+        with self.lock:
+            return self.refreshed_at, self.entries
+
+
+def refresh_periodically(index: EntryIndex, interval: float, stop: threading.Event):
+    """Refresh the index every few seconds until told to stop. If a refresh fails, log
+    the error and keep serving the previous content of the index.
+
+    Args:
+        index (EntryIndex): The index to refresh.
+        interval (float): The number of seconds between two refreshes.
+        stop (threading.Event): An event which, when set, stops the refreshes.
+    """
+    while not stop.wait(interval):
+        try:
+            index.refresh()
+        except Exception as e:
+            logger.error("Failed to refresh the index: %s", e)
+
+
+class Job:
+    def __init__(self, job_id: str, names: List[str]):
+        """The creation of one or more servers, running in the background.
+
+        Args:
+            job_id (str): The identifier of the job.
+            names (list): The names of the servers to create.
+        """
+        self.job_id = job_id
+        self.names = names
+        self.status = "running"
+        self.created: List[str] = []
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.job_id,
+            "status": self.status,
+            "names": self.names,
+            "created": self.created,
+            "failed": len(self.names) - len(self.created),
+            "error": self.error,
+        }
+
+
+class JobRegistry:
+    def __init__(self):
+        """The jobs started by the daemon, so clients can follow their progress."""
+        self.lock = threading.Lock()
+        self.jobs: Dict[str, Job] = OrderedDict()
+
+    def start(self, names: List[str], create: Callable[[List[str]], List[str]]) -> Job:
+        """Start a job in a new thread.
+
+        Args:
+            names (list): The names of the servers to create.
+            create (Callable): The function creating the servers, called with their
+                names and returning the domain names of the servers that were
+                successfully created.
+
+        Returns:
+            The job.
+        """
+        job = Job(uuid.uuid4().hex, names)
+
+        with self.lock:
+            self.jobs[job.job_id] = job
+            self.prune()
+
+        threading.Thread(target=self.run, args=(job, create), daemon=True).start()
+
+        return job
+
+    def run(self, job: Job, create: Callable[[List[str]], List[str]]):
+        try:
+            job.created = create(job.names)
+            job.status = "done"
+        except Exception as e:
+            logger.exception("Job %s failed", job.job_id)
+            job.error = str(e)
+            job.status = "failed"
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def prune(self):
+        """Forget the oldest finished jobs if there are too many of them. Must be called
+        with the lock held."""
+        finished = [
+            job_id for job_id, job in self.jobs.items() if job.status != "running"
+        ]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Handles requests to the daemon's API. The server it's attached to must have an
+    "index" attribute holding the EntryIndex to serve, a "jobs" attribute holding the
+    JobRegistry tracking the creations, and a "token" attribute holding the token
+    clients must provide (as a bearer token in the Authorization header), or None if
+    clients don't need to authenticate.
+
+    Routes:
+        GET /list: List the entries in the index. If the "refresh" query parameter is
+            provided, refresh the index first.
+        GET /jobs/{id}: Get the status of a creation job.
+        POST /create: Start creating one or more servers in the background, and respond
+            with the job's identifier. The body can contain "name" (the name of the
+            server to create), "number" (the number of servers to create, each with a
+            random name) and "post_install_script" (the content of a script to run
+            after the server's creation).
+        POST /delete: Delete one or more servers. The body must contain either "servers"
+            (the names of the servers to delete) or "all" (set to true), in which case
+            it can also contain "exclude" (the names of the servers not to delete). It
+            can also contain "dry_run".
+        POST /refresh: Refresh the index.
+    """
+
+    def do_GET(self):
+        if not self.authorised():
+            return
+
+        path, _, query = self.path.partition("?")
+
+        if path == "/list":
+            self.dispatch(self.handle_list, query.split("&"))
+        elif path.startswith("/jobs/"):
+            self.dispatch(self.handle_job, path[len("/jobs/"):])
+        else:
+            self.send_json(404, {"error": "Unknown route %s" % path})
+
+    def do_POST(self):
+        if not self.authorised():
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self.send_json(400, {"error": "Invalid body: %s" % e})
+            return
+
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "Invalid body: must be a JSON object"})
+            return
+
+        routes = {
+            "/create": self.handle_create,
+            "/delete": self.handle_delete,
+            "/refresh": self.handle_refresh,
+        }
+
+        handler = routes.get(self.path)
+        if handler is None:
+            self.send_json(404, {"error": "Unknown route %s" % self.path})
+            return
+
+        self.dispatch(handler, body)
+
+    def authorised(self) -> bool:
+        """Check the token provided by the client, if the daemon requires one, and
+        respond with an error if it's missing or wrong.
+
+        Returns:
+            Whether the request can be processed.
+        """
+        token = self.server.token
+        if token is None:
+            return True
+
+        scheme, _, provided = self.headers.get("Authorization", "").partition(" ")
+        if scheme == "Bearer" and hmac.compare_digest(
+                provided.encode("utf-8"), token.encode("utf-8"),
+        ):
+            return True
+
+        self.send_json(401, {"error": "Missing or invalid token"})
+        return False
+
+    def dispatch(self, handler: Callable, arg):
+        """Call a route's handler, and respond with an error if it fails, e.g. because
+        a provider's API couldn't be reached.
+
+        Args:
+            handler (Callable): The handler to call.
+            arg: The argument to call the handler with.
+        """
+        try:
+            handler(arg)
+        except Exception as e:
+            logger.exception("Failed to process request to %s", self.path)
+            self.send_json(500, {"error": str(e)})
+
+    def handle_list(self, query: List[str]):
+        if "refresh" in query:
+            self.server.index.refresh()
+        self.send_entries()
+
+    def handle_job(self, job_id: str):
+        job = self.server.jobs.get(job_id)
+        if job is None:
+            self.send_json(404, {"error": "Unknown job %s" % job_id})
+            return
+
+        self.send_json(200, job.to_dict())
+
+    def handle_create(self, body):
+        index = self.server.index
+        config = index.config
+
+        try:
+            number = 1 if body.get("name") else get_positive_int(body, "number", 1)
+            concurrency = get_positive_int(body, "concurrency", self.server.concurrency)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        # Check the provider's quotas before reserving any name, so a batch that can't
+        # fit fails right away, like it would with the create mode.
+        try:
+            number = admit(number, self.server.quota_policy, config)
+        except errors.QuotaExceededError as e:
+            self.send_json(409, {"error": str(e)})
+            return
+
+        # Pick names that aren't in use according to the index, which saves listing
+        # the servers again.
+        try:
+            names = index.reserve_names(body.get("name"), number)
+        except errors.InvalidNameError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except errors.NameCollisionError as e:
+            self.send_json(409, {"error": str(e)})
+            return
+
+        post_install_script = body.get("post_install_script", "")
+
+        def create(names_to_create: List[str]) -> List[str]:
+            created = create_servers(
+                names_to_create, post_install_script, config, concurrency,
+            )
+            try:
+                index.refresh()
+            except Exception as e:
+                # Keep the names reserved, since the index doesn't know about the
+                # servers that were created, nor about what the failed creations left
+                # behind.
+                logger.error("Failed to refresh the index: %s", e)
+            else:
+                index.release_names(names_to_create)
+            return created
+
+        job = self.server.jobs.start(names, create)
+        self.send_json(202, job.to_dict())
+
+    def handle_delete(self, body):
+        if not body.get("servers") and not body.get("all"):
+            self.send_json(400, {"error": "One of 'servers' or 'all' must be provided"})
+            return
+
+        # Make sure we know about every server before deleting them.
+        self.server.index.refresh()
+        _, entries_dict = self.server.index.snapshot()
+
+        args = argparse.Namespace(
+            server=body.get("servers"),
+            exclude=body.get("exclude") if body.get("all") else None,
+        )
+        try:
+            entries_to_delete = filter_entries_dict(entries_dict, args)
+        except KeyError as e:
+            self.send_json(404, {"error": "Unknown server: %s" % e.args[0]})
+            return
+
+        dry_run = bool(body.get("dry_run"))
+        delete_entries(entries_to_delete, self.server.index.config, dry_run)
+
+        if not dry_run:
+            self.server.index.refresh()
+        self.send_json(200, {"deleted": sorted(entries_to_delete), "dry_run": dry_run})
+
+    def handle_refresh(self, body):
+        self.server.index.refresh()
+        self.send_entries()
+
+    def send_entries(self):
+        refreshed_at, entries_dict = self.server.index.snapshot()
+        self.send_json(200, {
+            "refreshed_at": refreshed_at,
+            "entries": {
+                entry_id: entry.to_dict() for entry_id, entry in entries_dict.items()
+            },
+        })
+
+    def send_json(self, code: int, content: dict):
+        body = json.dumps(content).encode("utf-8")
+
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Clients connecting through a Unix socket don't have an address.
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return self.client_address[0]
+        return "unix"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer,
+):
+    daemon_threads = True
+
+
+def serve(config):
+    """Keep the providers' clients and an index of the entries under the configured
+    namespace warm, and expose the create, list and delete operations over an HTTP API,
+    either on a TCP port or on a Unix socket.
+
+    Args:
+        config (dict): The parsed configuration.
+    """
+    args = parse_args()
+    token = load_token(args.token_file)
+
+    # Anyone who can reach the port could create and delete servers, so don't listen
+    # on TCP without a token.
+    if token is None and not args.socket:
+        sys.stderr.write(
+            "A token is required to listen on a TCP port, provide one with --token-file"
+            " or the %s environment variable.\n" % TOKEN_ENV_VAR
+        )
+        sys.exit(1)
+
+    try:
+        check_namespace(config)
+    except errors.InvalidNameError as e:
+        sys.stderr.write("Invalid configuration: %s\n" % e)
+        sys.exit(1)
+
+    # Keep enough connections open for the creations of a whole job to run at the same
+    # time.
+    concurrency = args.concurrency or instances_provider.count_shards(config)
+    transport.set_concurrency(concurrency)
+
+    # Instantiate (and authenticate) the clients now, so they're ready to be used by
+    # the first request.
+    instances_provider.get_instances_provider_client(config)
+    dns_provider.get_dns_provider_client(config)
+
+    index = EntryIndex(config)
+    index.refresh()
+
+    if args.socket:
+        # Remove any socket left behind by a previous run.
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        # Only let the user running the daemon connect to the socket. Set the umask
+        # rather than chmod-ing the socket, so there's no window during which other
+        # users can connect.
+        umask = os.umask(0o177)
+        try:
+            server = ThreadingUnixHTTPServer(args.socket, RequestHandler)
+        finally:
+            os.umask(umask)
+        logger.info("Listening on %s", args.socket)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+        logger.info("Listening on %s:%d", args.host, args.port)
+
+    server.index = index
+    server.jobs = JobRegistry()
+    server.token = token
+    server.concurrency = concurrency
+    server.quota_policy = args.quota_policy
+
+    stop = threading.Event()
+    refresher = threading.Thread(
+        target=refresh_periodically,
+        args=(index, args.refresh_interval, stop),
+        daemon=True,
+    )
+    refresher.start()
+
+    # Shut down gracefully when asked to stop by a service manager. The shutdown must
+    # happen in another thread since it waits for serve_forever to return.
+    signal.signal(
+        signal.SIGTERM,
+        lambda *_: threading.Thread(target=server.shutdown, daemon=True).start(),
+    )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Shutting down...")
+        stop.set()
+        server.server_close()
+        if args.socket:
+            os.unlink(args.socket)
+
+
+def get_positive_int(body: dict, key: str, default: int) -> int:
+    """Read a positive integer from the body of a request.
+
+    Args:
+        body (dict): The parsed body of the request.
+        key (str): The key of the integer in the body.
+        default (int): The value to use if the body doesn't provide one.
+
+    Returns:
+        The integer.
+
+    Raises:
+        ValueError: The body's value isn't a positive integer.
+    """
+    value = body.get(key)
+    if value is None:
+        return default
+
+    # Don't accept booleans (which are integers in Python) nor floats.
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("'%s' must be a positive integer" % key)
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError("'%s' must be a positive integer" % key)
+    if value < 1:
+        raise ValueError("'%s' must be a positive integer" % key)
+
+    return value
+
+
+def load_token(path: Optional[str]) -> Optional[str]:
+    """Read the token clients must authenticate with, from a file or from the
+    environment.
+
+    Args:
+        path (str): The path to the file containing the token, if any.
+
+    Returns:
+        The token, or None if none was provided.
+    """
+    if path:
+        with open(path) as f:
+            token = f.read().strip()
+    else:
+        token = os.getenv(TOKEN_ENV_VAR, "").strip()
+
+    return token or None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="install_party serve",
+        description="Run a daemon exposing the create, list and delete operations over an"
+                    " HTTP API.",
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Increases the verbosity."
+    )
+    parser.add_argument(
+        "-r", "--refresh-interval",
+        type=float,
+        default=30,
+        help="Number of seconds between two refreshes of the list of servers. Defaults"
+             " to 30.",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on. Defaults to 127.0.0.1. Ignored if -S/--socket is"
+             " provided.",
+    )
+    parser.add_argument(
+        "-p", "--port",
+        type=int,
+        default=8642,
+        help="Port to listen on. Defaults to 8642. Ignored if -S/--socket is provided.",
+    )
+    parser.add_argument(
+        "-S", "--socket",
+        metavar="PATH",
+        help="Listen on a Unix socket at this path rather than on a TCP port. The"
+             " socket is only accessible to the user running the daemon.",
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        help="Maximum number of servers a creation job creates at the same time, unless"
+             " the request provides its own. Defaults to the number of shards instances"
+             " are spread across (i.e. 1 if instances aren't sharded).",
+    )
+    parser.add_argument(
+        "-q", "--quota-policy",
+        choices=["fail", "cap", "ignore"],
+        default="fail",
+        help="What to do if the instances provider's quotas don't leave enough room for"
+             " all of the servers a request asks for: reject the request (fail), only"
+             " create as many servers as there is room for (cap), or don't check the"
+             " quotas at all (ignore). Defaults to fail.",
+    )
+    parser.add_argument(
+        "-t", "--token-file",
+        metavar="PATH",
+        help="Path to a file containing the token clients must provide. Can also be"
+             " provided with the %s environment variable. Required unless -S/--socket"
+             " is provided." % TOKEN_ENV_VAR,
+    )
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger("install_party").setLevel(logging.DEBUG)
+
+    return args
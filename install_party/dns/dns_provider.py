@@ -1,10 +1,98 @@
 import importlib
+import json
+import logging
+import threading
+from typing import Dict
 
-from install_party.dns.dns_provider_client import DNSProviderClient
+from install_party.dns.dns_provider_client import (
+    AsyncDNSProviderClient,
+    DNSProviderClient,
+    ExecutorDNSProviderClient,
+)
+from install_party.util import cassette
 from install_party.util.errors import UnknownProviderError
 
+logger = logging.getLogger(__name__)
+
+# The clients that have already been instantiated, associated with a key derived from
+# the configuration they were instantiated from, so that they (and their authenticated
+# sessions) are reused rather than built again for every operation.
+_clients_lock = threading.Lock()
+_clients: Dict[str, DNSProviderClient] = {}
+
 
 def get_dns_provider_client(config) -> DNSProviderClient:
+    """Retrieve an API client for the configured DNS provider, instantiating it
+    if it hasn't been already.
+
+    Args:
+        config (dict): The parsed configuration.
+
+    Returns:
+        The client.
+
+    Raises:
+        UnknownProviderError: The configured DNS provider isn't supported.
+    """
+    key = json.dumps(
+        [
+            config["dns"]["provider"],
+            config["dns"]["args"],
+            config["general"].get("record_cassette"),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _build_dns_provider_client(config)
+        return _clients[key]
+
+
+def get_async_dns_provider_client(
+        config, max_workers: int = 10,
+) -> AsyncDNSProviderClient:
+    """Instantiate an asynchronous API client for the configured DNS provider.
+
+    If the provider has an asynchronous client (exposed in a variable named
+    async_provider_client_class), and its dependencies are installed, use it.
+    Otherwise, adapt the synchronous client so its calls run in a pool of threads. The
+    synchronous client is always used if calls are recorded.
+
+    Asynchronous clients are bound to an event loop, so a new one is returned on every
+    call, and must be closed once done.
+
+    Args:
+        config (dict): The parsed configuration.
+        max_workers (int): The maximum number of calls an adapted synchronous client
+            can run at the same time.
+
+    Returns:
+        The client.
+
+    Raises:
+        UnknownProviderError: The configured DNS provider isn't supported.
+    """
+    if not config["general"].get("record_cassette"):
+        provider_module = _import_provider_module(config["dns"]["provider"])
+        async_client_class = getattr(provider_module, "async_provider_client_class", None)
+        if async_client_class is not None:
+            try:
+                return async_client_class(config["dns"]["args"])
+            except ImportError as e:
+                logger.debug("Can't use the asynchronous client, falling back: %s", e)
+
+    return ExecutorDNSProviderClient(get_dns_provider_client(config), max_workers)
+
+
+def clear_cache():
+    """Forget about the clients that have already been instantiated."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def _build_dns_provider_client(config) -> DNSProviderClient:
     """Instantiate an API client for the configured DNS provider.
 
     Args:
@@ -17,13 +105,33 @@ def get_dns_provider_client(config) -> DNSProviderClient:
         UnknownProviderError: The configured DNS provider isn't supported.
     """
 
-    provider = config["dns"]["provider"]
-    args = config["dns"]["args"]
+    provider_module = _import_provider_module(config["dns"]["provider"])
+    client = provider_module.provider_client_class(config["dns"]["args"])
+
+    # Record the calls made to the provider's API if configured to do so.
+    cassette_path = config["general"].get("record_cassette")
+    if cassette_path:
+        client = cassette.RecordingDNSProviderClient(
+            client, cassette.get_writer(cassette_path)
+        )
 
+    return client
+
+
+def _import_provider_module(provider):
+    """Import the module implementing the provided DNS provider.
+
+    Args:
+        provider (str): The name of the DNS provider.
+
+    Returns:
+        The module.
+
+    Raises:
+        UnknownProviderError: The DNS provider isn't supported.
+    """
     try:
         provider_import_path = "install_party.dns.providers.%s" % provider
-        provider = importlib.import_module(provider_import_path)
-
-        return provider.provider_client_class(args)
+        return importlib.import_module(provider_import_path)
     except ModuleNotFoundError:
         raise UnknownProviderError("Unsupported DNS provider %s" % provider)
@@ -1,9 +1,35 @@
 import abc
 import ipaddress
-from typing import List
+import socket
+from typing import List, Set
+
+from install_party.util.aio import Executor
+from install_party.util.errors import UnsupportedListingError
+
+
+def check_ipv4(address: str):
+    """Check that the provided address is a valid IPv4 address in its dotted-quad form.
+
+    This is much cheaper than building an ipaddress.IPv4Address, which matters when
+    listing thousands of records.
+
+    Args:
+        address (str): The address to check.
+
+    Raises:
+        AddressValueError: The address isn't a valid IPv4 address.
+    """
+    try:
+        socket.inet_pton(socket.AF_INET, address)
+    except (OSError, TypeError):
+        raise ipaddress.AddressValueError("%r is not a valid IPv4 address" % address)
 
 
 class DNSRecord:
+    # Use slots rather than a per-object dict, since large inventories can hold
+    # thousands of records.
+    __slots__ = ("record_id", "sub_domain", "target", "zone")
+
     def __init__(self, record_id: str, sub_domain: str, target: str, zone: str):
         """The representation of a DNS record created or retrieved by the API client
         for the configured DNS provider.
@@ -16,15 +42,40 @@ class DNSRecord:
         """
         # This will raise an AddressValueError exception if the value isn't an IPv4
         # address.
-        ipaddress.IPv4Address(target)
+        check_ipv4(target)
 
         self.record_id = record_id
         self.sub_domain = sub_domain
         self.target = target
         self.zone = zone
 
+    def to_dict(self) -> dict:
+        """Returns: The record as a dict that can be serialised to JSON."""
+        return {
+            "record_id": self.record_id,
+            "sub_domain": self.sub_domain,
+            "target": self.target,
+            "zone": self.zone,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DNSRecord":
+        """Build a record from a dict generated by to_dict.
+
+        Args:
+            d (dict): The dict to build the record from.
+
+        Returns:
+            The record as a DNSRecord object.
+        """
+        return cls(d["record_id"], d["sub_domain"], d["target"], d["zone"])
+
 
 class DNSProviderClient(abc.ABC):
+    # Whether the provider can list sub-domains regardless of the namespace they're
+    # part of, i.e. whether get_all_sub_domains is implemented.
+    supports_listing_all = False
+
     @abc.abstractmethod
     def create_sub_domain(self, record_name: str, target: str, zone: str) -> DNSRecord:
         """Create a sub-domain using the DNS provider's API.
@@ -53,6 +104,38 @@ class DNSProviderClient(abc.ABC):
         """
         pass
 
+    def get_sub_domain_ids(self, namespace: str, zone: str) -> Set[str]:
+        """Retrieve the IDs of the sub-domains that are part of the provided namespace,
+        e.g. to check whether deleted sub-domains are gone. Providers which can list
+        the IDs without retrieving each record can override this.
+
+        Args:
+            namespace (str): The namespace to retrieve sub-domains for.
+            zone (str): The DNS zone to retrieve sub-domains in.
+
+        Returns:
+            The IDs of the retrieved DNS records.
+        """
+        return {record.record_id for record in self.get_sub_domains(namespace, zone)}
+
+    def get_all_sub_domains(self, zone: str) -> List[DNSRecord]:
+        """Retrieve every sub-domain that is part of a namespace, i.e. every sub-domain
+        that contains a '.', in the provided DNS zone, so that several namespaces can be
+        listed with a single query.
+
+        Only called if supports_listing_all is True. Otherwise, each namespace must be
+        listed on its own.
+
+        Args:
+            zone (str): The DNS zone to retrieve sub-domains in.
+
+        Returns:
+            The retrieved DNS records as a list of DNSRecord objects.
+        """
+        raise UnsupportedListingError(
+            "%s can't list DNS records across namespaces" % type(self).__name__
+        )
+
     @abc.abstractmethod
     def delete_sub_domain(self, record: DNSRecord):
         """ Delete the provided sub-domain.
@@ -70,3 +153,78 @@ class DNSProviderClient(abc.ABC):
             zone (str): The DNS zone to apply the changes for.
         """
         pass
+
+
+class AsyncDNSProviderClient(abc.ABC):
+    """The asynchronous counterpart of DNSProviderClient, so that many calls to the DNS
+    provider's API can be in flight at the same time from a single thread. See
+    DNSProviderClient for the documentation of each method.
+
+    Unlike synchronous clients, asynchronous clients are bound to the event loop they're
+    used in, so a new one must be instantiated for each loop, and closed once done.
+    """
+
+    supports_listing_all = False
+
+    @abc.abstractmethod
+    async def create_sub_domain(
+            self, record_name: str, target: str, zone: str,
+    ) -> DNSRecord:
+        pass
+
+    @abc.abstractmethod
+    async def get_sub_domains(self, namespace: str, zone: str) -> List[DNSRecord]:
+        pass
+
+    async def get_all_sub_domains(self, zone: str) -> List[DNSRecord]:
+        raise UnsupportedListingError(
+            "%s can't list DNS records across namespaces" % type(self).__name__
+        )
+
+    @abc.abstractmethod
+    async def delete_sub_domain(self, record: DNSRecord):
+        pass
+
+    @abc.abstractmethod
+    async def commit(self, zone: str):
+        pass
+
+    async def close(self):
+        """Release the resources (e.g. connections) held by the client."""
+        pass
+
+
+class ExecutorDNSProviderClient(AsyncDNSProviderClient):
+    def __init__(self, client: DNSProviderClient, max_workers: int):
+        """Adapts a synchronous DNS provider's client to the asynchronous interface, by
+        running its methods in a pool of threads.
+
+        Args:
+            client (DNSProviderClient): The client to adapt.
+            max_workers (int): The maximum number of calls to run at the same time.
+        """
+        self.client = client
+        self.executor = Executor(max_workers)
+        self.supports_listing_all = client.supports_listing_all
+
+    async def create_sub_domain(
+            self, record_name: str, target: str, zone: str,
+    ) -> DNSRecord:
+        return await self.executor.run(
+            self.client.create_sub_domain, record_name, target, zone,
+        )
+
+    async def get_sub_domains(self, namespace: str, zone: str) -> List[DNSRecord]:
+        return await self.executor.run(self.client.get_sub_domains, namespace, zone)
+
+    async def get_all_sub_domains(self, zone: str) -> List[DNSRecord]:
+        return await self.executor.run(self.client.get_all_sub_domains, zone)
+
+    async def delete_sub_domain(self, record: DNSRecord):
+        return await self.executor.run(self.client.delete_sub_domain, record)
+
+    async def commit(self, zone: str):
+        return await self.executor.run(self.client.commit, zone)
+
+    async def close(self):
+        self.executor.shutdown()
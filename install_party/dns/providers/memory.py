@@ -0,0 +1,70 @@
+import ipaddress
+
+from install_party.dns.dns_provider_client import DNSProviderClient, DNSRecord
+from install_party.util import simulation
+
+
+class MemoryDNSProviderClient(DNSProviderClient):
+    supports_listing_all = True
+
+    def __init__(self, args):
+        """A DNS provider which records only live in memory, for testing and
+        benchmarking purposes.
+
+        On top of the arguments supported by simulation.SimulatedAPI, the following
+        argument is supported:
+            cloud: The name of the simulated cloud to use. Defaults to "default".
+        """
+        self.cloud = simulation.get_cloud(args.get("cloud", "default"))
+        self.api = self.cloud.get_api("memory.dns", args)
+
+    def create_sub_domain(self, sub_domain, target, zone):
+        # This will raise an AddressValueError exception if the value isn't an IPv4
+        # address.
+        ipaddress.IPv4Address(target)
+
+        self.api.call("create")
+
+        record = simulation.SimulatedRecord(
+            record_id=self.api.make_id(),
+            sub_domain=sub_domain,
+            target=target,
+            zone=zone,
+        )
+        with self.cloud.lock:
+            self.cloud.records[record.record_id] = record
+
+        return DNSRecord(record.record_id, sub_domain, target, zone)
+
+    def get_sub_domains(self, namespace, zone):
+        self.api.call("list")
+
+        suffix = ".%s" % namespace
+        with self.cloud.lock:
+            return [
+                DNSRecord(record.record_id, record.sub_domain, record.target, zone)
+                for record in self.cloud.records.values()
+                if record.zone == zone and record.sub_domain.endswith(suffix)
+            ]
+
+    def get_all_sub_domains(self, zone):
+        self.api.call("list")
+
+        with self.cloud.lock:
+            return [
+                DNSRecord(record.record_id, record.sub_domain, record.target, zone)
+                for record in self.cloud.records.values()
+                if record.zone == zone and "." in record.sub_domain
+            ]
+
+    def delete_sub_domain(self, record):
+        self.api.call("delete")
+
+        with self.cloud.lock:
+            del self.cloud.records[record.record_id]
+
+    def commit(self, zone):
+        self.api.call("refresh")
+
+
+provider_client_class = MemoryDNSProviderClient
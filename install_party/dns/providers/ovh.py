@@ -1,17 +1,50 @@
+import asyncio
+import hashlib
 import ipaddress
+import json
+import time
+from typing import List
 
 import ovh
+from ovh.client import ENDPOINTS
+from ovh.exceptions import APIError
 
-from install_party.dns.dns_provider_client import DNSProviderClient, DNSRecord
+from install_party.dns.dns_provider_client import (
+    AsyncDNSProviderClient,
+    DNSProviderClient,
+    DNSRecord,
+)
+from install_party.util import aio, metrics, transport
+
+
+class SessionClient(ovh.Client):
+    def __init__(self, session: "requests.Session", **kwargs):
+        """An OVH API client sending its requests over the provided HTTP session rather
+        than its own. The version of the SDK we depend on doesn't let the session be
+        provided, so replace the one it creates.
+
+        Args:
+            session (requests.Session): The HTTP session to send requests over.
+            **kwargs: The arguments of ovh.Client.
+        """
+        super().__init__(**kwargs)
+        self._session.close()
+        self._session = session
 
 
 class OvhDNSProviderClient(DNSProviderClient):
+    supports_listing_all = True
+
     def __init__(self, args):
-        self.client = ovh.Client(
+        # Send the requests over the shared HTTP transport rather than the SDK's own
+        # session, so connections are pooled and failed requests are retried.
+        self.client = SessionClient(
+            transport.get_session(),
             endpoint=args["endpoint"],
             application_key=args["application_key"],
             application_secret=args["application_secret"],
             consumer_key=args["consumer_key"],
+            timeout=transport.get_timeout(),
         )
 
     def create_sub_domain(self, sub_domain, target, zone):
@@ -19,6 +52,7 @@ class OvhDNSProviderClient(DNSProviderClient):
         # address.
         ipaddress.IPv4Address(target)
 
+        metrics.count_call("ovh.POST /domain/zone/{zone}/record")
         record = self.client.post(
             "/domain/zone/%s/record" % zone,
             fieldType="A",
@@ -40,6 +74,14 @@ class OvhDNSProviderClient(DNSProviderClient):
             namespace=namespace,
         )
 
+        return self.get_records(zone, sub_domain_filter)
+
+    def get_all_sub_domains(self, zone):
+        # Retrieve all DNS records which sub domain contains a ".".
+        return self.get_records(zone, "%25.%25")
+
+    def get_records(self, zone, sub_domain_filter):
+        metrics.count_call("ovh.GET /domain/zone/{zone}/record")
         record_ids = self.client.get(
             "/domain/zone/%s/record?subDomain=%s" % (zone, sub_domain_filter)
         )
@@ -47,6 +89,7 @@ class OvhDNSProviderClient(DNSProviderClient):
         records = []
 
         for record_id in record_ids:
+            metrics.count_call("ovh.GET /domain/zone/{zone}/record/{id}")
             record = self.client.get("/domain/zone/%s/record/%s" % (zone, record_id))
 
             records.append(DNSRecord(
@@ -58,11 +101,208 @@ class OvhDNSProviderClient(DNSProviderClient):
 
         return records
 
+    def get_sub_domain_ids(self, namespace, zone):
+        # Only list the IDs, which saves retrieving each record.
+        metrics.count_call("ovh.GET /domain/zone/{zone}/record")
+        return set(self.client.get(
+            "/domain/zone/%s/record?subDomain=%%25.%s" % (zone, namespace)
+        ))
+
     def delete_sub_domain(self, record):
+        metrics.count_call("ovh.DELETE /domain/zone/{zone}/record/{id}")
         self.client.delete("/domain/zone/%s/record/%s" % (record.zone, record.record_id))
 
     def commit(self, zone):
+        metrics.count_call("ovh.POST /domain/zone/{zone}/refresh")
         self.client.post("/domain/zone/%s/refresh" % zone)
 
 
+class AsyncOvhDNSProviderClient(AsyncDNSProviderClient):
+    supports_listing_all = True
+
+    def __init__(self, args):
+        """An asynchronous client for OVH's API, which signs its requests itself and
+        sends them over a pool of keep-alive connections, so that e.g. retrieving
+        hundreds of records doesn't need hundreds of threads. Requires aiohttp.
+
+        On top of the arguments of the synchronous client, the following argument is
+        supported:
+            max_connections: The maximum number of connections to OVH's API to open at
+                the same time. Defaults to the pool size of the shared HTTP transport.
+
+        Raises:
+            ImportError: aiohttp isn't installed.
+        """
+        # aiohttp is an optional dependency, if it's missing the synchronous client is
+        # used instead.
+        import aiohttp
+        import yarl
+
+        self.aiohttp = aiohttp
+        self.yarl = yarl
+
+        self.endpoint = ENDPOINTS.get(args["endpoint"], args["endpoint"])
+        self.application_key = args["application_key"]
+        self.application_secret = args["application_secret"]
+        self.consumer_key = args["consumer_key"]
+        self.max_connections = int(
+            args.get("max_connections", transport.get_pool_size())
+        )
+
+        # Both are initialised on first use, since they need a running event loop.
+        self.session = None
+        self.time_delta = None
+
+    async def call(self, method: str, path: str, body: dict = None):
+        """Send a signed request to OVH's API.
+
+        Args:
+            method (str): The HTTP method to use.
+            path (str): The path to send the request to, relative to the endpoint.
+            body (dict): The body of the request, if any.
+
+        Returns:
+            The parsed body of the response.
+
+        Raises:
+            APIError: The API responded with an error.
+        """
+        if self.session is None:
+            self.session = self.aiohttp.ClientSession(
+                connector=self.aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=self.aiohttp.ClientTimeout(
+                    sock_connect=transport.get_timeout(),
+                    sock_read=transport.get_timeout(),
+                ),
+            )
+
+        url = self.endpoint + path
+        data = json.dumps(body) if body is not None else ""
+        timestamp = str(int(time.time()) + await self.get_time_delta())
+
+        # See https://docs.ovh.com/gb/en/api/first-steps-with-ovh-api/ for how requests
+        # are signed.
+        signature = hashlib.sha1("+".join([
+            self.application_secret, self.consumer_key, method, url, data, timestamp,
+        ]).encode("utf-8"))
+
+        headers = {
+            "X-Ovh-Application": self.application_key,
+            "X-Ovh-Consumer": self.consumer_key,
+            "X-Ovh-Timestamp": timestamp,
+            "X-Ovh-Signature": "$1$" + signature.hexdigest(),
+        }
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+
+        # The URL is signed as is, so make sure it's sent as is too.
+        async with self.session.request(
+            method, self.yarl.URL(url, encoded=True), data=data or None, headers=headers,
+        ) as response:
+            text = await response.text()
+
+        if response.status >= 400:
+            # Errors usually come with a JSON body including a message, but e.g. a
+            # proxy in front of the API may respond with anything.
+            message = text
+            try:
+                content = json.loads(text)
+                if isinstance(content, dict) and "message" in content:
+                    message = content["message"]
+            except ValueError:
+                pass
+            raise APIError("%s %s (%d): %s" % (method, path, response.status, message))
+
+        return json.loads(text) if text else None
+
+    async def get_time_delta(self) -> int:
+        """Returns: The difference between OVH's clock and ours, in seconds, which
+        needs to be taken into account when signing requests."""
+        if self.time_delta is None:
+            async with self.session.get(self.endpoint + "/auth/time") as response:
+                server_time = int(await response.text())
+            self.time_delta = server_time - int(time.time())
+
+        return self.time_delta
+
+    async def create_sub_domain(self, sub_domain, target, zone):
+        # This will raise an AddressValueError exception if the value isn't an IPv4
+        # address.
+        ipaddress.IPv4Address(target)
+
+        metrics.count_call("ovh.POST /domain/zone/{zone}/record")
+        record = await self.call("POST", "/domain/zone/%s/record" % zone, {
+            "fieldType": "A",
+            "subDomain": sub_domain,
+            "target": target,
+        })
+
+        return DNSRecord(
+            record_id=record["id"],
+            sub_domain=record["subDomain"],
+            target=record["target"],
+            zone=record["zone"],
+        )
+
+    async def get_sub_domains(self, namespace, zone) -> List[DNSRecord]:
+        # Retrieve all DNS records which sub domain ends with "." followed by the
+        # namespace.
+        sub_domain_filter = "%25.{namespace}".format(
+            namespace=namespace,
+        )
+
+        return await self.get_records(zone, sub_domain_filter)
+
+    async def get_all_sub_domains(self, zone) -> List[DNSRecord]:
+        # Retrieve all DNS records which sub domain contains a ".".
+        return await self.get_records(zone, "%25.%25")
+
+    async def get_records(self, zone, sub_domain_filter) -> List[DNSRecord]:
+        metrics.count_call("ovh.GET /domain/zone/{zone}/record")
+        record_ids = await self.call(
+            "GET", "/domain/zone/%s/record?subDomain=%s" % (zone, sub_domain_filter)
+        )
+
+        async def get_record(record_id):
+            metrics.count_call("ovh.GET /domain/zone/{zone}/record/{id}")
+            return await self.call("GET", "/domain/zone/%s/record/%s" % (zone, record_id))
+
+        # Retrieve the records concurrently, as many at a time as we have connections.
+        results = await aio.gather_bounded(
+            (get_record(record_id) for record_id in record_ids), self.max_connections,
+        )
+
+        records = []
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+            records.append(DNSRecord(
+                record_id=result["id"],
+                sub_domain=result["subDomain"],
+                target=result["target"],
+                zone=result["zone"],
+            ))
+
+        return records
+
+    async def delete_sub_domain(self, record):
+        metrics.count_call("ovh.DELETE /domain/zone/{zone}/record/{id}")
+        await self.call(
+            "DELETE", "/domain/zone/%s/record/%s" % (record.zone, record.record_id),
+        )
+
+    async def commit(self, zone):
+        metrics.count_call("ovh.POST /domain/zone/{zone}/refresh")
+        await self.call("POST", "/domain/zone/%s/refresh" % zone)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            # Give the connections some time to close, see
+            # https://docs.aiohttp.org/en/stable/client_advanced.html#graceful-shutdown
+            await asyncio.sleep(0.250)
+
+
 provider_client_class = OvhDNSProviderClient
+async_provider_client_class = AsyncOvhDNSProviderClient
@@ -0,0 +1,37 @@
+from install_party.dns.dns_provider_client import DNSProviderClient, DNSRecord
+from install_party.util.cassette import get_player
+
+
+class ReplayDNSProviderClient(DNSProviderClient):
+    def __init__(self, args):
+        """A DNS provider replaying the interactions recorded in a cassette, see
+        cassette.Player for the supported arguments.
+        """
+        self.player = get_player("dns", args)
+
+    def create_sub_domain(self, sub_domain, target, zone):
+        result = self.player.replay(
+            "create_sub_domain",
+            {"record_name": sub_domain, "target": target, "zone": zone},
+        )
+
+        # The sub-domain and target depend on the server's name and instance, so use
+        # the ones we were given rather than the recorded ones.
+        result["sub_domain"] = sub_domain
+        result["target"] = target
+        return DNSRecord.from_dict(result)
+
+    def get_sub_domains(self, namespace, zone):
+        result = self.player.replay(
+            "get_sub_domains", {"namespace": namespace, "zone": zone},
+        )
+        return [DNSRecord.from_dict(record) for record in result]
+
+    def delete_sub_domain(self, record):
+        self.player.replay("delete_sub_domain", {"record": record.to_dict()})
+
+    def commit(self, zone):
+        self.player.replay("commit", {"zone": zone})
+
+
+provider_client_class = ReplayDNSProviderClient
@@ -0,0 +1,248 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import dns.name
+import dns.query
+import dns.rcode
+import dns.rdatatype
+import dns.tsigkeyring
+import dns.update
+
+from install_party.dns.dns_provider_client import (
+    DNSProviderClient,
+    DNSRecord,
+    check_ipv4,
+)
+from install_party.util import metrics, transport
+from install_party.util.errors import DNSUpdateError
+
+logger = logging.getLogger(__name__)
+
+
+class Batch:
+    def __init__(self):
+        """Changes to a zone queued to be sent in a single UPDATE message, along with
+        the outcome of sending them, so every thread which queued one of the changes can
+        learn about it, whichever thread sent them.
+        """
+        # Each change is a tuple of an action ("add" or "delete"), a sub-domain and a
+        # target.
+        self.changes: List[Tuple[str, str, str]] = []
+        self.sent = threading.Event()
+        self.error: Optional[Exception] = None
+
+
+class RFC2136DNSProviderClient(DNSProviderClient):
+    supports_listing_all = True
+
+    def __init__(self, args):
+        """A DNS provider talking directly to an authoritative DNS server (e.g. BIND or
+        Knot) using dynamic updates (RFC 2136), authenticated with TSIG.
+
+        Creations and deletions are queued, and sent to the server in a single UPDATE
+        message when the changes are committed, so a batch of any size only takes one
+        round-trip and is applied atomically. Listing transfers the zone (AXFR).
+
+        Changes can be queued from several threads. A commit sends every change queued
+        for the zone so far, including the ones queued by other threads. If sending
+        them fails, the commit raises, and so does the next commit of every other thread
+        which queued one of the changes.
+
+        The following arguments are supported:
+            server: The IP address of the DNS server.
+            port: The port the DNS server listens on. Defaults to 53.
+            key_name: The name of the TSIG key.
+            key_secret: The TSIG key's secret, encoded in base64.
+            key_algorithm: The TSIG key's algorithm. Defaults to hmac-sha256.
+            ttl: The TTL of the records to create. Defaults to 300.
+        """
+        self.server = args["server"]
+        self.port = int(args.get("port", 53))
+        self.key_name = args["key_name"]
+        self.key_algorithm = args.get("key_algorithm", "hmac-sha256")
+        self.keyring = dns.tsigkeyring.from_text({self.key_name: args["key_secret"]})
+        self.ttl = int(args.get("ttl", 300))
+        self.timeout = transport.get_timeout()
+
+        # The batches of changes waiting to be committed, associated with the zone they
+        # apply to.
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Batch] = {}
+        # The batches each thread queued changes in since its last commit, associated
+        # with their zone.
+        self.local = threading.local()
+
+    def create_sub_domain(self, sub_domain, target, zone):
+        check_ipv4(target)
+
+        self.queue(zone, ("add", sub_domain, target))
+
+        return DNSRecord(make_record_id(sub_domain, target), sub_domain, target, zone)
+
+    def get_sub_domains(self, namespace, zone):
+        # Retrieve all DNS records which sub domain ends with "." followed by the
+        # namespace.
+        suffix = "." + namespace
+        return [
+            record for record in self.get_records(zone)
+            if record.sub_domain.endswith(suffix)
+        ]
+
+    def get_all_sub_domains(self, zone):
+        return [record for record in self.get_records(zone) if "." in record.sub_domain]
+
+    def get_records(self, zone) -> List[DNSRecord]:
+        """Retrieve every A record in the zone by transferring it.
+
+        Args:
+            zone (str): The DNS zone to retrieve the records of.
+
+        Returns:
+            The records.
+        """
+        metrics.count_call("rfc2136.AXFR")
+        messages = dns.query.xfr(
+            self.server,
+            zone,
+            port=self.port,
+            keyring=self.keyring,
+            keyname=self.key_name,
+            keyalgorithm=self.key_algorithm,
+            timeout=self.timeout,
+            lifetime=self.timeout,
+            # Keep the names absolute, so the zone's apex can be told apart.
+            relativize=False,
+        )
+
+        # Read the A records straight from the transfer rather than building a
+        # dns.zone.Zone, which would hold every record of the zone in memory at once.
+        origin = dns.name.from_text(zone)
+        records = []
+        for message in messages:
+            for rrset in message.answer:
+                # Skip any record that's not an A record, and the zone's apex.
+                if rrset.rdtype != dns.rdatatype.A or rrset.name == origin:
+                    continue
+
+                sub_domain = rrset.name.relativize(origin).to_text()
+                for rdata in rrset:
+                    records.append(DNSRecord(
+                        make_record_id(sub_domain, rdata.address),
+                        sub_domain,
+                        rdata.address,
+                        zone,
+                    ))
+
+        return records
+
+    def delete_sub_domain(self, record):
+        self.queue(record.zone, ("delete", record.sub_domain, record.target))
+
+    def queue(self, zone: str, change: Tuple[str, str, str]):
+        """Add a change to the batch of changes waiting to be committed for a zone, and
+        remember the calling thread contributed to it.
+
+        Args:
+            zone (str): The zone the change applies to.
+            change (tuple): The change, see Batch.
+        """
+        with self.lock:
+            batch = self.pending.get(zone)
+            if batch is None:
+                batch = self.pending[zone] = Batch()
+            batch.changes.append(change)
+
+        contributed = self.contributed_batches().setdefault(zone, [])
+        if not contributed or contributed[-1] is not batch:
+            contributed.append(batch)
+
+    def contributed_batches(self) -> Dict[str, List[Batch]]:
+        """Returns: The batches the calling thread queued changes in since its last
+        commit, associated with their zone."""
+        if not hasattr(self.local, "batches"):
+            self.local.batches = {}
+        return self.local.batches
+
+    def commit(self, zone):
+        contributed_batches = self.contributed_batches().pop(zone, [])
+
+        with self.lock:
+            batch = self.pending.pop(zone, None)
+
+        if batch is not None:
+            try:
+                self.send(zone, batch.changes)
+            except Exception as e:
+                batch.error = e
+                raise
+            finally:
+                batch.sent.set()
+
+        # Some of our changes may have been sent by another thread's commit, in which
+        # case make sure they were applied.
+        for contributed in contributed_batches:
+            if contributed is batch:
+                continue
+
+            contributed.sent.wait()
+            if contributed.error is not None:
+                raise DNSUpdateError(
+                    "The update of zone %s which included changes from this thread"
+                    " failed: %s" % (zone, contributed.error)
+                )
+
+    def send(self, zone: str, changes: List[Tuple[str, str, str]]):
+        """Send changes to the DNS server in a single UPDATE message.
+
+        Args:
+            zone (str): The zone the changes apply to.
+            changes (list): The changes to send, see Batch.
+
+        Raises:
+            DNSUpdateError: The server refused the update.
+        """
+        update = dns.update.Update(
+            zone,
+            keyring=self.keyring,
+            keyname=self.key_name,
+            keyalgorithm=self.key_algorithm,
+        )
+        for action, sub_domain, target in changes:
+            if action == "add":
+                update.add(sub_domain, self.ttl, "A", target)
+            else:
+                update.delete(sub_domain, "A", target)
+
+        logger.debug("Sending %d change(s) to zone %s", len(changes), zone)
+
+        # Use TCP since large batches wouldn't fit in a UDP datagram.
+        metrics.count_call("rfc2136.UPDATE")
+        response = dns.query.tcp(
+            update, self.server, port=self.port, timeout=self.timeout,
+        )
+
+        rcode = response.rcode()
+        if rcode != dns.rcode.NOERROR:
+            # The update is atomic, so none of the changes were applied.
+            raise DNSUpdateError(
+                "The DNS server refused the update of zone %s (%d change(s)): %s"
+                % (zone, len(changes), dns.rcode.to_text(rcode))
+            )
+
+
+def make_record_id(sub_domain: str, target: str) -> str:
+    """Build an identifier for a record, since DNS servers don't give them one. A record
+    is identified by its name and its target, since that's what's needed to delete it.
+
+    Args:
+        sub_domain (str): The sub-domain of the record.
+        target (str): The target of the record.
+
+    Returns:
+        The identifier.
+    """
+    return "%s/%s" % (sub_domain, target)
+
+
+provider_client_class = RFC2136DNSProviderClient
@@ -1,6 +1,8 @@
 import argparse
 import logging
-from typing import Dict
+import sys
+import time
+from typing import Dict, Tuple
 
 from install_party.dns import dns_provider
 from install_party.dns.dns_provider_client import DNSRecord, DNSProviderClient
@@ -10,6 +12,7 @@ from install_party.instances.instances_provider_client import (
     InstancesProviderClient,
 )
 from install_party.lister.list import get_list
+from install_party.util import aio, metrics, tracing, transport
 from install_party.util.entry import Entry
 
 logger = logging.getLogger(__name__)
@@ -106,10 +109,6 @@ def delete(config):
     # Populate the dict of entries.
     entries_dict = get_list(config)
 
-    # Instantiate the clients for the instances and the DNS providers.
-    instances_client = instances_provider.get_instances_provider_client(config)
-    dns_client = dns_provider.get_dns_provider_client(config)
-
     try:
         # Filter the entries_dict accordingly with the arguments.
         entries_to_delete = filter_entries_dict(entries_dict, args)
@@ -117,45 +116,269 @@ def delete(config):
         logger.error("Unknown server: %s", e.args[0])
         return
 
-    # Loop over the entries to delete and delete them.
-    instances_refresh_needed = False
-    dns_refresh_needed = False
+    transport.set_concurrency(args.concurrency)
+
+    start = time.monotonic()
+    deleted_instances, deleted_records = delete_entries(
+        entries_to_delete, config, args.dry_run, args.concurrency,
+    )
+
+    if not args.wait or args.dry_run:
+        return
+
+    with metrics.timed("delete.wait"):
+        remaining_instances, remaining_records = wait_for_teardown(
+            deleted_instances, deleted_records, config, args.wait_timeout,
+        )
+
+    print("Teardown took %.1f seconds." % (time.monotonic() - start))
+
+    if remaining_instances or remaining_records:
+        print_leftovers(remaining_instances, remaining_records)
+        sys.exit(1)
+
+
+def delete_entries(
+        entries_to_delete: Dict[str, Entry], config, dry_run: bool, concurrency: int = 10,
+) -> Tuple[Dict[str, Instance], Dict[str, DNSRecord]]:
+    """Delete the instances and DNS records of the provided entries, and commit the
+    changes.
+
+    Args:
+        entries_to_delete (dict): The entries to delete, associated with their ID.
+        config (dict): The parsed configuration.
+        dry_run (bool): Whether we're running in dry-run mode.
+        concurrency (int): The maximum number of deletions to perform at the same time.
+
+    Returns:
+        The instances and the DNS records which deletion was successfully requested,
+        associated with the ID of their entry.
+    """
+    attributes = {"entries": len(entries_to_delete), "dry_run": dry_run}
+    with tracing.span("delete", attributes):
+        return aio.run(
+            async_delete_entries(entries_to_delete, config, dry_run, concurrency)
+        )
+
+
+async def async_delete_entries(
+        entries_to_delete: Dict[str, Entry], config, dry_run: bool, concurrency: int,
+):
+    """Delete the instances and DNS records of the provided entries concurrently, and
+    commit the changes. See delete_entries.
+
+    Each deletion goes through delete_instance or delete_record, run in a pool of
+    threads so that up to the given number of them are in flight at the same time.
+
+    Args:
+        entries_to_delete (dict): The entries to delete, associated with their ID.
+        config (dict): The parsed configuration.
+        dry_run (bool): Whether we're running in dry-run mode.
+        concurrency (int): The maximum number of deletions to perform at the same time.
 
-    for entry_id, entry in entries_to_delete.items():
-        instance = entry.instance
-        record = entry.record
+    Returns:
+        The instances and the DNS records which deletion was successfully requested,
+        associated with the ID of their entry.
+    """
+    import asyncio
+
+    # Instantiate the clients for the instances and the DNS providers.
+    instances_client = instances_provider.get_instances_provider_client(config)
+    dns_client = dns_provider.get_dns_provider_client(config)
+    executor = aio.Executor(concurrency)
+
+    async def delete_entry_instance(entry_id, instance):
+        try:
+            attributes = {"entry.id": entry_id, "instance.id": instance.instance_id}
+            with tracing.span("instance.delete", attributes):
+                await executor.run(
+                    delete_instance, entry_id, instance, instances_client, dry_run,
+                )
+            return True
+        except Exception as e:
+            logger.error("Failed to delete instance for %s: %s", entry_id, e)
+            return False
+
+    async def delete_entry_record(entry_id, record):
+        try:
+            attributes = {"entry.id": entry_id, "dns.sub_domain": record.sub_domain}
+            with tracing.span("dns.delete", attributes):
+                await executor.run(delete_record, entry_id, record, dns_client, dry_run)
+            return True
+        except Exception as e:
+            logger.error("Failed to delete domain name for %s: %s", entry_id, e)
+            return False
+
+    try:
+        # Delete the instances and DNS records we know about for these entries. The
+        # executor already bounds the number of deletions in flight.
+        instances_deleted, records_deleted = await asyncio.gather(
+            asyncio.gather(*(
+                delete_entry_instance(entry_id, entry.instance)
+                for entry_id, entry in entries_to_delete.items()
+                if entry.instance
+            )),
+            asyncio.gather(*(
+                delete_entry_record(entry_id, entry.record)
+                for entry_id, entry in entries_to_delete.items()
+                if entry.record
+            )),
+        )
+
+        commits = []
+
+        if any(instances_deleted):
+            logger.info("Applying the instances deletion...")
+
+            if not dry_run:
+                # Commit the deletion to make it effective.
+                commits.append(tracing.traced(
+                    "instance.commit", executor.run(instances_client.commit),
+                ))
+
+        if any(records_deleted):
+            logger.info("Applying the DNS changes...")
+
+            if not dry_run:
+                # Refresh the DNS server's configuration to make it aware of the
+                # changes.
+                zone = config["dns"]["zone"]
+                commits.append(tracing.traced(
+                    "dns.commit", executor.run(dns_client.commit, zone),
+                ))
+
+        await asyncio.gather(*commits)
+    finally:
+        executor.shutdown()
 
-        # If we know about an instance for this entry, delete it.
-        if instance:
+    logger.info("Done!")
+
+    instances = [(i, e.instance) for i, e in entries_to_delete.items() if e.instance]
+    records = [(i, e.record) for i, e in entries_to_delete.items() if e.record]
+
+    return (
+        {i: instance for (i, instance), ok in zip(instances, instances_deleted) if ok},
+        {i: record for (i, record), ok in zip(records, records_deleted) if ok},
+    )
+
+
+def wait_for_teardown(
+        instances: Dict[str, Instance],
+        records: Dict[str, DNSRecord],
+        config,
+        timeout: float,
+        min_interval: float = 1,
+        max_interval: float = 15,
+) -> Tuple[Dict[str, Instance], Dict[str, DNSRecord]]:
+    """Wait until the provided instances and DNS records have disappeared from the
+    providers' listings, or until the timeout is reached.
+
+    Rather than polling each instance or record individually, the whole namespace is
+    listed once per tick for each provider (only listing the IDs of the DNS records if
+    the provider can). Polling starts every min_interval seconds, and backs off (up to
+    max_interval) while nothing disappears. A listing that fails is retried on the next
+    tick.
+
+    Args:
+        instances (dict): The deleted instances, associated with their entry's ID.
+        records (dict): The deleted DNS records, associated with their entry's ID.
+        config (dict): The parsed configuration.
+        timeout (float): The maximum number of seconds to wait for.
+        min_interval (float): The initial number of seconds between two ticks.
+        max_interval (float): The maximum number of seconds between two ticks.
+
+    Returns:
+        The instances and DNS records that still exist once the wait is over,
+        associated with their entry's ID.
+    """
+    instances_client = instances_provider.get_instances_provider_client(config)
+    dns_client = dns_provider.get_dns_provider_client(config)
+    namespace = config["general"]["namespace"]
+
+    remaining_instances = dict(instances)
+    remaining_records = dict(records)
+
+    deadline = time.monotonic() + timeout
+    interval = min_interval
+
+    while remaining_instances or remaining_records:
+        before = len(remaining_instances) + len(remaining_records)
+
+        # A failed listing doesn't tell anything about the deletions, so just try again
+        # on the next tick rather than give up on the whole wait.
+        if remaining_instances:
             try:
-                delete_instance(entry_id, instance, instances_client, args.dry_run)
-                instances_refresh_needed = True
+                # Keep the latest version of each instance, to report its current
+                # status.
+                existing = {
+                    instance.instance_id: instance
+                    for instance in instances_client.get_instances(namespace)
+                }
             except Exception as e:
-                logger.error("Failed to delete instance for %s:" % entry_id, e)
-
-        # If we know about a DNS record for this entry, delete it.
-        if record:
+                logger.warning("Failed to list the instances, will retry: %s", e)
+            else:
+                remaining_instances = {
+                    entry_id: existing[instance.instance_id]
+                    for entry_id, instance in remaining_instances.items()
+                    if instance.instance_id in existing
+                }
+
+        if remaining_records:
             try:
-                delete_record(entry_id, record, dns_client, args.dry_run)
-                dns_refresh_needed = True
+                existing_ids = dns_client.get_sub_domain_ids(
+                    namespace, config["dns"]["zone"],
+                )
             except Exception as e:
-                logger.error("Failed to delete domain name for %s:" % entry_id, e)
+                logger.warning("Failed to list the DNS records, will retry: %s", e)
+            else:
+                remaining_records = {
+                    entry_id: record
+                    for entry_id, record in remaining_records.items()
+                    if record.record_id in existing_ids
+                }
 
-    if instances_refresh_needed:
-        logger.info("Applying the instances deletion...")
+        left = len(remaining_instances) + len(remaining_records)
+        if not left:
+            break
 
-        if not args.dry_run:
-            # Commit the deletion to make it effective.
-            instances_client.commit()
+        now = time.monotonic()
+        if now >= deadline:
+            logger.warning("Timed out waiting for %d deletion(s) to complete", left)
+            break
 
-    if dns_refresh_needed:
-        logger.info("Applying the DNS changes...")
+        logger.info(
+            "Waiting for %d instance(s) and %d DNS record(s) to disappear...",
+            len(remaining_instances), len(remaining_records),
+        )
 
-        if not args.dry_run:
-            # Refresh the DNS server's configuration to make it aware of the changes.
-            dns_client.commit(config["dns"]["zone"])
+        # Poll at the same pace as long as things are disappearing, otherwise back off.
+        if left == before:
+            interval = min(interval * 1.5, max_interval)
+        time.sleep(min(interval, deadline - now))
 
-    logger.info("Done!")
+    return remaining_instances, remaining_records
+
+
+def print_leftovers(instances: Dict[str, Instance], records: Dict[str, DNSRecord]):
+    """Print the instances and DNS records that are still around after a deletion.
+
+    Args:
+        instances (dict): The remaining instances, associated with their entry's ID.
+        records (dict): The remaining DNS records, associated with their entry's ID.
+    """
+    from tabulate import tabulate
+
+    rows = [
+        (entry_id, "instance", instance.name, instance.status)
+        for entry_id, instance in sorted(instances.items())
+    ]
+    rows += [
+        (entry_id, "DNS record", "%s.%s" % (record.sub_domain, record.zone), "")
+        for entry_id, record in sorted(records.items())
+    ]
+
+    print("\nLEFT BEHIND")
+    print(tabulate(rows, headers=["Name", "Type", "Resource", "Status"], tablefmt="psql"))
 
 
 def parse_args():
@@ -174,6 +397,26 @@ def parse_args():
         help="List the deletions that would normally happen but don't actually perform"
              " them.",
     )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=10,
+        help="Maximum number of instances and DNS records to delete at the same time."
+             " Defaults to 10.",
+    )
+    parser.add_argument(
+        "-w", "--wait",
+        action="store_true",
+        help="Wait for the instances and DNS records to actually disappear, then report"
+             " how long the teardown took and what was left behind, if anything. Exits"
+             " with a non-zero code if anything was left behind.",
+    )
+    parser.add_argument(
+        "--wait-timeout",
+        type=float,
+        default=300,
+        help="Maximum number of seconds to wait for with -w/--wait. Defaults to 300.",
+    )
     parser.add_argument(
         "-e", "--exclude",
         action="append",
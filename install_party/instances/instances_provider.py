@@ -1,10 +1,105 @@
 import importlib
+import json
+import logging
+import threading
+from typing import Dict
 
-from install_party.instances.instances_provider_client import InstancesProviderClient
+from install_party.instances.instances_provider_client import (
+    AsyncInstancesProviderClient,
+    ExecutorInstancesProviderClient,
+    InstancesProviderClient,
+)
+from install_party.instances.sharding import Shard, ShardedInstancesProviderClient
+from install_party.util import cassette
 from install_party.util.errors import UnknownProviderError
 
+logger = logging.getLogger(__name__)
+
+# The clients that have already been instantiated, associated with a key derived from
+# the configuration they were instantiated from, so that they (and their authenticated
+# sessions) are reused rather than built again for every operation.
+_clients_lock = threading.Lock()
+_clients: Dict[str, InstancesProviderClient] = {}
+
 
 def get_instances_provider_client(config) -> InstancesProviderClient:
+    """Retrieve an API client for the configured instances provider, instantiating it
+    if it hasn't been already.
+
+    Args:
+        config (dict): The parsed configuration.
+
+    Returns:
+        The client.
+
+    Raises:
+        UnknownProviderError: The configured instances provider isn't supported.
+    """
+    key = json.dumps(
+        [
+            config["instances"].get("provider"),
+            config["instances"].get("args"),
+            config["instances"].get("shards"),
+            config["general"].get("record_cassette"),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _build_instances_provider_client(config)
+        return _clients[key]
+
+
+def get_async_instances_provider_client(
+        config, max_workers: int = 10,
+) -> AsyncInstancesProviderClient:
+    """Instantiate an asynchronous API client for the configured instances provider.
+
+    If the provider has an asynchronous client (exposed in a variable named
+    async_provider_client_class), and its dependencies are installed, use it.
+    Otherwise, adapt the synchronous client so its calls run in a pool of threads. The
+    synchronous client is always used if instances are sharded or calls are recorded.
+
+    Asynchronous clients are bound to an event loop, so a new one is returned on every
+    call, and must be closed once done.
+
+    Args:
+        config (dict): The parsed configuration.
+        max_workers (int): The maximum number of calls an adapted synchronous client
+            can run at the same time.
+
+    Returns:
+        The client.
+
+    Raises:
+        UnknownProviderError: The configured instances provider isn't supported.
+    """
+    if (
+        not config["instances"].get("shards")
+        and not config["general"].get("record_cassette")
+    ):
+        provider_module = _import_provider_module(config["instances"]["provider"])
+        async_client_class = getattr(provider_module, "async_provider_client_class", None)
+        if async_client_class is not None:
+            try:
+                return async_client_class(config["instances"]["args"])
+            except ImportError as e:
+                logger.debug("Can't use the asynchronous client, falling back: %s", e)
+
+    return ExecutorInstancesProviderClient(
+        get_instances_provider_client(config), max_workers,
+    )
+
+
+def clear_cache():
+    """Forget about the clients that have already been instantiated."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def _build_instances_provider_client(config) -> InstancesProviderClient:
     """Instantiate an API client for the configured instances provider.
 
     Args:
@@ -16,14 +111,76 @@ def get_instances_provider_client(config) -> InstancesProviderClient:
     Raises:
         UnknownProviderError: The configured instances provider isn't supported.
     """
+    shards = config["instances"].get("shards")
 
-    provider = config["instances"]["provider"]
-    args = config["instances"]["args"]
+    if shards:
+        # Spread the instances across several providers accounts or regions.
+        client = ShardedInstancesProviderClient([
+            Shard(
+                name=shard.get("name", "%s-%d" % (shard["provider"], i)),
+                weight=float(shard.get("weight", 1)),
+                client=_instantiate_provider_client(shard["provider"], shard["args"]),
+            )
+            for i, shard in enumerate(shards)
+        ])
+    else:
+        client = _instantiate_provider_client(
+            config["instances"]["provider"], config["instances"]["args"],
+        )
 
+    # Record the calls made to the provider's API if configured to do so.
+    cassette_path = config["general"].get("record_cassette")
+    if cassette_path:
+        client = cassette.RecordingInstancesProviderClient(
+            client, cassette.get_writer(cassette_path)
+        )
+
+    return client
+
+
+def _instantiate_provider_client(provider, args) -> InstancesProviderClient:
+    """Instantiate an API client for the provided instances provider.
+
+    Args:
+        provider (str): The name of the instances provider.
+        args (dict): The arguments to give the provider's client.
+
+    Returns:
+        The instantiated client.
+
+    Raises:
+        UnknownProviderError: The instances provider isn't supported.
+    """
+    return _import_provider_module(provider).provider_client_class(args)
+
+
+def _import_provider_module(provider):
+    """Import the module implementing the provided instances provider.
+
+    Args:
+        provider (str): The name of the instances provider.
+
+    Returns:
+        The module.
+
+    Raises:
+        UnknownProviderError: The instances provider isn't supported.
+    """
     try:
         provider_import_path = "install_party.instances.providers.%s" % provider
-        provider = importlib.import_module(provider_import_path)
-
-        return provider.provider_client_class(args)
+        return importlib.import_module(provider_import_path)
     except ModuleNotFoundError:
         raise UnknownProviderError("Unsupported instances provider %s" % provider)
+
+
+def count_shards(config) -> int:
+    """Count the number of shards (i.e. provider accounts or regions) instances are
+    spread across.
+
+    Args:
+        config (dict): The parsed configuration.
+
+    Returns:
+        The number of shards, which is 1 if the instances aren't sharded.
+    """
+    return len(config["instances"].get("shards") or [None])
@@ -1,8 +1,15 @@
 import abc
-from typing import List
+from typing import AsyncIterator, Iterator, List, Optional
+
+from install_party.util.aio import Executor
+from install_party.util.errors import UnsupportedListingError
 
 
 class Instance:
+    # Use slots rather than a per-object dict, since large inventories can hold
+    # thousands of instances.
+    __slots__ = ("instance_id", "name", "ip_address", "status")
+
     def __init__(self, instance_id: str, name: str, ip_address: str, status: str):
         """The representation of an instance created or retrieved by the API client for
         the configured instances provider.
@@ -19,8 +26,143 @@ class Instance:
         self.ip_address = ip_address
         self.status = status
 
+    def to_dict(self) -> dict:
+        """Returns: The instance as a dict that can be serialised to JSON."""
+        return {
+            "instance_id": self.instance_id,
+            "name": self.name,
+            "ip_address": self.ip_address,
+            "status": self.status,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Instance":
+        """Build an instance from a dict generated by to_dict.
+
+        Args:
+            d (dict): The dict to build the instance from.
+
+        Returns:
+            The instance as an Instance object.
+        """
+        return cls(d["instance_id"], d["name"], d["ip_address"], d["status"])
+
+
+class Quota:
+    def __init__(self, resource: str, limit: int, used: int, per_instance: int = 1):
+        """A limit set by the instances provider on a resource (e.g. instances, cores,
+        RAM), along with the current usage of this resource.
+
+        Args:
+            resource (str): The name of the resource.
+            limit (int): The maximum amount of this resource that can be used. A
+                negative value means there is no limit.
+            used (int): The amount of this resource currently in use.
+            per_instance (int): The amount of this resource each new instance uses.
+        """
+        self.resource = resource
+        self.limit = limit
+        self.used = used
+        self.per_instance = per_instance
+
+    def available_instances(self) -> Optional[int]:
+        """Returns: The number of new instances this quota allows for, or None if it's
+        unlimited.
+        """
+        if self.limit < 0 or self.per_instance <= 0:
+            return None
+        return max(self.limit - self.used, 0) // self.per_instance
+
+    def to_dict(self) -> dict:
+        """Returns: The quota as a dict that can be serialised to JSON."""
+        return {
+            "resource": self.resource,
+            "limit": self.limit,
+            "used": self.used,
+            "per_instance": self.per_instance,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Quota":
+        """Build a quota from a dict generated by to_dict.
+
+        Args:
+            d (dict): The dict to build the quota from.
+
+        Returns:
+            The quota as a Quota object.
+        """
+        return cls(d["resource"], d["limit"], d["used"], d["per_instance"])
+
+
+class Limits:
+    def __init__(self, quotas: List[Quota]):
+        """The limits set by the instances provider on the resources new instances
+        would use.
+
+        Args:
+            quotas (list): The quotas for each resource.
+        """
+        self.quotas = quotas
+
+    def to_dict(self) -> dict:
+        """Returns: The limits as a dict that can be serialised to JSON."""
+        return {"quotas": [quota.to_dict() for quota in self.quotas]}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Limits":
+        """Build limits from a dict generated by to_dict.
+
+        Args:
+            d (dict): The dict to build the limits from.
+
+        Returns:
+            The limits as a Limits object.
+        """
+        return cls([Quota.from_dict(quota) for quota in d["quotas"]])
+
+    def available_instances(self) -> Optional[int]:
+        """Returns: The number of new instances that can be created before hitting one
+        of the quotas, or None if none of them is limited.
+        """
+        available = [
+            quota.available_instances()
+            for quota in self.quotas
+            if quota.available_instances() is not None
+        ]
+        return min(available) if available else None
+
+    def bottleneck(self) -> Optional[Quota]:
+        """Returns: The quota that allows for the fewest new instances, or None if none
+        of them is limited.
+        """
+        limited = [q for q in self.quotas if q.available_instances() is not None]
+        return min(limited, key=Quota.available_instances) if limited else None
+
+    def describe(self) -> str:
+        """Returns: A human-readable description of the usage of each quota."""
+        return ", ".join(
+            "%s: %d/%s" % (
+                quota.resource,
+                quota.used,
+                quota.limit if quota.limit >= 0 else "unlimited",
+            )
+            for quota in self.quotas
+        )
+
 
 class InstancesProviderClient(abc.ABC):
+    # Whether the provider can reserve public addresses ahead of the creation of the
+    # instances they'll be associated with, i.e. whether reserve_addresses,
+    # associate_address and release_address are implemented. Providers which support
+    # it must set it to True, either on the class or on the client if it depends on the
+    # client's configuration.
+    supports_address_reservation = False
+
+    # Whether the provider can list instances regardless of the namespace they're part
+    # of, i.e. whether iter_all_instance_pages is implemented.
+    supports_listing_all = False
+
     @abc.abstractmethod
     def create_instance(self, name: str, post_creation_script: str) -> Instance:
         """Create an instance using the instances provider's API.
@@ -48,6 +190,39 @@ class InstancesProviderClient(abc.ABC):
         """
         pass
 
+    def iter_instance_pages(self, namespace: str) -> Iterator[List[Instance]]:
+        """Retrieve every instance that is part of the provided namespace lazily, one
+        page at a time, so that large namespaces don't have to be held in memory (or
+        transferred) all at once.
+
+        Providers that don't support pagination don't need to implement this method,
+        in which case all of the instances are returned in a single page.
+
+        Args:
+            namespace (str): The namespace to retrieve instances for.
+
+        Returns:
+            An iterator over the pages of instances, each page being a list of Instance
+            objects.
+        """
+        yield self.get_instances(namespace)
+
+    def iter_all_instance_pages(self) -> Iterator[List[Instance]]:
+        """Retrieve every instance the provider knows about, regardless of the namespace
+        it's part of, one page at a time, so that several namespaces can be listed with
+        a single pass over the instances.
+
+        Only called if supports_listing_all is True. Otherwise, each namespace must be
+        listed on its own.
+
+        Returns:
+            An iterator over the pages of instances, each page being a list of Instance
+            objects.
+        """
+        raise UnsupportedListingError(
+            "%s can't list instances across namespaces" % type(self).__name__
+        )
+
     @abc.abstractmethod
     def delete_instance(self, instance: Instance):
         """Delete the provided instance.
@@ -61,3 +236,149 @@ class InstancesProviderClient(abc.ABC):
     def commit(self):
         """Apply the changes if necessary."""
         pass
+
+    def get_limits(self) -> Optional[Limits]:
+        """Retrieve the limits the instances provider sets on the resources new
+        instances would use, and how much of these resources are currently in use, so
+        that batches of creations which can't succeed can be stopped before they start.
+
+        Providers that can't tell what their limits are don't need to implement this
+        method.
+
+        Returns:
+            The limits as a Limits object, or None if they're unknown.
+        """
+        return None
+
+    def reserve_addresses(self, count: int) -> List[str]:
+        """Reserve public IPv4 addresses (e.g. floating IPs) in bulk ahead of the
+        creation of the instances they'll be associated with, so that the DNS records
+        pointing to them can be created while the instances boot.
+
+        Only called if supports_address_reservation is True. Otherwise, the DNS records
+        are created once the instances are active.
+
+        Args:
+            count (int): The number of addresses to reserve.
+
+        Returns:
+            The reserved addresses, which can be fewer than requested (or none at all).
+        """
+        return []
+
+    def associate_address(self, instance: Instance, ip_address: str) -> Instance:
+        """Associate an address previously reserved with reserve_addresses with an
+        active instance. Only called if supports_address_reservation is True.
+
+        Providers that don't support reserving addresses don't need to implement this
+        method, since they never reserve any.
+
+        Args:
+            instance (Instance): The instance to associate the address with.
+            ip_address (str): The address to associate with the instance.
+
+        Returns:
+            The instance, with its new address.
+        """
+        return instance
+
+    def release_address(self, ip_address: str):
+        """Release an address previously reserved with reserve_addresses, e.g. because
+        the creation of the instance it was reserved for failed. Only called if
+        supports_address_reservation is True.
+
+        Providers that don't support reserving addresses don't need to implement this
+        method, since they never reserve any.
+
+        Args:
+            ip_address (str): The address to release.
+        """
+        pass
+
+
+class AsyncInstancesProviderClient(abc.ABC):
+    """The asynchronous counterpart of InstancesProviderClient, so that many calls to
+    the instances provider's API can be in flight at the same time from a single
+    thread. See InstancesProviderClient for the documentation of each method.
+
+    Unlike synchronous clients, asynchronous clients are bound to the event loop they're
+    used in, so a new one must be instantiated for each loop, and closed once done.
+    """
+
+    supports_listing_all = False
+
+    @abc.abstractmethod
+    async def create_instance(self, name: str, post_creation_script: str) -> Instance:
+        pass
+
+    @abc.abstractmethod
+    async def get_instances(self, namespace: str) -> List[Instance]:
+        pass
+
+    async def iter_instance_pages(self, namespace: str) -> AsyncIterator[List[Instance]]:
+        yield await self.get_instances(namespace)
+
+    def iter_all_instance_pages(self) -> AsyncIterator[List[Instance]]:
+        raise UnsupportedListingError(
+            "%s can't list instances across namespaces" % type(self).__name__
+        )
+
+    @abc.abstractmethod
+    async def delete_instance(self, instance: Instance):
+        pass
+
+    @abc.abstractmethod
+    async def commit(self):
+        pass
+
+    async def close(self):
+        """Release the resources (e.g. connections) held by the client."""
+        pass
+
+
+class ExecutorInstancesProviderClient(AsyncInstancesProviderClient):
+    def __init__(self, client: InstancesProviderClient, max_workers: int):
+        """Adapts a synchronous instances provider's client to the asynchronous
+        interface, by running its methods in a pool of threads.
+
+        Args:
+            client (InstancesProviderClient): The client to adapt.
+            max_workers (int): The maximum number of calls to run at the same time.
+        """
+        self.client = client
+        self.executor = Executor(max_workers)
+        self.supports_listing_all = client.supports_listing_all
+
+    async def create_instance(self, name: str, post_creation_script: str) -> Instance:
+        return await self.executor.run(
+            self.client.create_instance, name, post_creation_script,
+        )
+
+    async def get_instances(self, namespace: str) -> List[Instance]:
+        return await self.executor.run(self.client.get_instances, namespace)
+
+    async def iter_instance_pages(self, namespace: str) -> AsyncIterator[List[Instance]]:
+        pages = self.client.iter_instance_pages(namespace)
+        while True:
+            # Only fetch one page at a time, so pages are processed as they arrive.
+            page = await self.executor.run(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def iter_all_instance_pages(self) -> AsyncIterator[List[Instance]]:
+        pages = self.client.iter_all_instance_pages()
+        while True:
+            page = await self.executor.run(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def delete_instance(self, instance: Instance):
+        return await self.executor.run(self.client.delete_instance, instance)
+
+    async def commit(self):
+        return await self.executor.run(self.client.commit)
+
+    async def close(self):
+        self.executor.shutdown()
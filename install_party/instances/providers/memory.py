@@ -0,0 +1,195 @@
+import logging
+import time
+from typing import Iterator, List
+
+from install_party.instances.instances_provider_client import (
+    Instance,
+    InstancesProviderClient,
+    Limits,
+    Quota,
+)
+from install_party.util import simulation, tracing
+from install_party.util.errors import InstanceCreationError, SimulatedProviderError
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryInstancesProviderClient(InstancesProviderClient):
+    supports_listing_all = True
+
+    def __init__(self, args):
+        """An instances provider which instances only live in memory, for testing and
+        benchmarking purposes.
+
+        On top of the arguments supported by simulation.SimulatedAPI, the following
+        arguments are supported:
+            cloud: The name of the simulated cloud to use. Defaults to "default".
+            boot_time: How long an instance takes to become active, in seconds.
+                Defaults to 0.
+            setup_time: How long the post-creation script takes to run once the
+                instance is active, in seconds. Defaults to 0.
+            boot_error_rate: The probability (between 0 and 1) for an instance to end
+                up in the ERROR status. Defaults to 0.
+            delete_time: How long a deletion takes to complete, in seconds. Defaults
+                to 0.
+            poll_interval: How often to check the status of an instance while waiting
+                for it to become active, in seconds. Defaults to 0.1.
+            max_instances: The maximum number of instances that can exist in the
+                cloud at the same time. Defaults to -1 (no limit).
+            floating_ips: Whether addresses can be reserved ahead of the creation of
+                the instances, like OpenStack's floating IPs. Defaults to false.
+            page_size: The maximum number of instances returned by each call when
+                listing instances. Defaults to 0 (no pagination).
+        """
+        self.cloud = simulation.get_cloud(args.get("cloud", "default"))
+        self.api = self.cloud.get_api("memory.instances", args)
+
+        self.boot_time = float(args.get("boot_time", 0))
+        self.setup_time = float(args.get("setup_time", 0))
+        self.boot_error_rate = float(args.get("boot_error_rate", 0))
+        self.delete_time = float(args.get("delete_time", 0))
+        self.poll_interval = float(args.get("poll_interval", 0.1))
+        self.max_instances = int(args.get("max_instances", -1))
+        self.supports_address_reservation = bool(args.get("floating_ips", False))
+        self.page_size = int(args.get("page_size", 0))
+
+    def create_instance(self, name: str, post_creation_script: str) -> Instance:
+        self.api.call("create")
+
+        now = time.monotonic()
+        with self.cloud.lock:
+            if 0 <= self.max_instances <= len(self.cloud.instances):
+                raise SimulatedProviderError(
+                    "Quota exceeded for instances: %d allowed" % self.max_instances
+                )
+
+            instance = simulation.SimulatedInstance(
+                instance_id=self.api.make_id(),
+                name=name,
+                ip_address=self.cloud.allocate_address(),
+                active_at=now + self.boot_time,
+                ready_at=now + self.boot_time + self.setup_time,
+                failed=self.api.random.random() < self.boot_error_rate,
+            )
+            self.cloud.instances[instance.instance_id] = instance
+
+        logger.info("Waiting for instance to become active...")
+
+        # Wait for the instance to become active.
+        status = instance.status(time.monotonic())
+        polls = 0
+        while status != "ACTIVE":
+            if status == "ERROR":
+                raise InstanceCreationError("The instance status changed to ERROR.")
+
+            time.sleep(self.poll_interval)
+            polls += 1
+            with tracing.span("memory.poll", {"poll": polls}) as span:
+                self.api.call("get")
+                status = instance.status(time.monotonic())
+                span.set_attribute("instance.status", status)
+
+        return Instance(instance.instance_id, name, instance.ip_address, status)
+
+    def get_instances(self, namespace: str) -> List[Instance]:
+        instances = []
+        for page in self.iter_instance_pages(namespace):
+            instances.extend(page)
+        return instances
+
+    def iter_instance_pages(self, namespace: str) -> Iterator[List[Instance]]:
+        return self._iter_pages("%s-" % namespace)
+
+    def iter_all_instance_pages(self) -> Iterator[List[Instance]]:
+        return self._iter_pages("")
+
+    def _iter_pages(self, prefix: str) -> Iterator[List[Instance]]:
+        marker = None
+        while True:
+            self.api.call("list")
+
+            now = time.monotonic()
+            with self.cloud.lock:
+                self.cloud.purge_deleted(now, self.delete_time)
+
+                # Page through the instances in a stable order, like OpenStack does,
+                # starting after the last instance of the previous page.
+                matching = sorted(
+                    instance_id
+                    for instance_id, instance in self.cloud.instances.items()
+                    if instance.name.startswith(prefix)
+                    and (marker is None or instance_id > marker)
+                )
+                if self.page_size > 0:
+                    matching = matching[:self.page_size]
+
+                page = [
+                    Instance(
+                        instance.instance_id,
+                        instance.name,
+                        instance.ip_address,
+                        instance.status(now),
+                    )
+                    for instance in map(self.cloud.instances.get, matching)
+                ]
+
+            if page:
+                yield page
+
+            if self.page_size <= 0 or len(page) < self.page_size:
+                return
+            marker = matching[-1]
+
+    def delete_instance(self, instance: Instance):
+        self.api.call("delete")
+
+        with self.cloud.lock:
+            simulated_instance = self.cloud.instances[instance.instance_id]
+            if simulated_instance.deleted_at is None:
+                simulated_instance.deleted_at = time.monotonic()
+            self.cloud.purge_deleted(time.monotonic(), self.delete_time)
+
+    def commit(self):
+        pass
+
+    def get_limits(self) -> Limits:
+        self.api.call("limits")
+
+        with self.cloud.lock:
+            self.cloud.purge_deleted(time.monotonic(), self.delete_time)
+            used = len(self.cloud.instances)
+
+        return Limits([Quota("instances", self.max_instances, used)])
+
+    def reserve_addresses(self, count: int) -> List[str]:
+        if count <= 0:
+            return []
+
+        self.api.call("reserve")
+
+        with self.cloud.lock:
+            addresses = [self.cloud.allocate_address() for _ in range(count)]
+            self.cloud.reserved.update(addresses)
+
+        return addresses
+
+    def associate_address(self, instance: Instance, ip_address: str) -> Instance:
+        self.api.call("associate")
+
+        with self.cloud.lock:
+            if ip_address not in self.cloud.reserved:
+                raise SimulatedProviderError("Unknown floating IP %s" % ip_address)
+
+            self.cloud.reserved.discard(ip_address)
+            self.cloud.instances[instance.instance_id].ip_address = ip_address
+
+        return Instance(instance.instance_id, instance.name, ip_address, instance.status)
+
+    def release_address(self, ip_address: str):
+        self.api.call("release")
+
+        with self.cloud.lock:
+            self.cloud.reserved.discard(ip_address)
+
+
+provider_client_class = MemoryInstancesProviderClient
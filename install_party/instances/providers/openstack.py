@@ -1,7 +1,10 @@
 import ipaddress
 import logging
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
 
+from keystoneauth1 import adapter, session
+from keystoneauth1.identity import generic
 from novaclient import client as nova_client
 
 # Only imported for type hints.
@@ -10,75 +13,280 @@ from novaclient.v2.client import Client as V2Client
 from install_party.instances.instances_provider_client import (
     Instance,
     InstancesProviderClient,
+    Limits,
+    Quota,
 )
+from install_party.util import metrics, tracing, transport
 from install_party.util.errors import InstanceCreationError
 
 logger = logging.getLogger(__name__)
 
 
 class OpenStackInstancesProviderClient(InstancesProviderClient):
+    supports_listing_all = True
+
     def __init__(self, args):
+        # Share a single authenticated session between the compute (nova) and network
+        # (neutron) APIs, on top of the shared HTTP transport. Authenticate the same
+        # way novaclient does when given the credentials directly, i.e. only pass the
+        # domains if they're configured.
+        self.session = session.Session(
+            auth=generic.Password(
+                auth_url=args["auth_url"],
+                username=args["username"],
+                password=args["password"],
+                project_id=args["tenant_id"],
+                project_name=args["tenant_name"],
+                user_domain_id=args.get("user_domain_id"),
+                project_domain_id=args.get("project_domain_id"),
+            ),
+            session=transport.get_session(),
+            timeout=transport.get_timeout(),
+        )
+
         self.client: V2Client = nova_client.Client(
             version=args["api_version"],
-            auth_url=args["auth_url"],
-            username=args["username"],
-            password=args["password"],
-            project_id=args["tenant_id"],
-            project_name=args["tenant_name"],
+            session=self.session,
             region_name=args["region_name"],
         )
 
+        # If an external network is configured, reserve floating IPs on it so the DNS
+        # records can be created before the instances have finished booting.
+        self.floating_ip_network = args.get("floating_ip_network")
+        # Number of floating IPs to create at the same time.
+        self.floating_ip_concurrency = int(args.get("floating_ip_concurrency", 10))
+        self.supports_address_reservation = bool(self.floating_ip_network)
+        self.network = None
+        if self.floating_ip_network:
+            self.network = adapter.Adapter(
+                self.session, service_type="network", region_name=args["region_name"],
+            )
+
         self.image_id = args["image_id"]
         self.flavor_id = args["flavor_id"]
+        # Number of servers to retrieve per request when listing instances.
+        self.page_size = int(args.get("page_size", 100))
+        # The flavor's details (number of vCPUs and amount of RAM), only retrieved when
+        # needed.
+        self.flavor = None
 
     def create_instance(self, name: str, post_creation_script: str) -> Instance:
-        server = self.client.servers.create(
-            name=name,
-            image=self.image_id,
-            flavor=self.flavor_id,
-            userdata=post_creation_script,
-        )
+        with metrics.timed("instance.nova_create", {"instance.name": name}):
+            metrics.count_call("nova.servers.create")
+            server = self.client.servers.create(
+                name=name,
+                image=self.image_id,
+                flavor=self.flavor_id,
+                userdata=post_creation_script,
+            )
 
         logger.info("Waiting for instance to become active...")
 
         # Wait for the instance to become active.
         status = ""
-        while status != "ACTIVE":
-            server = self.client.servers.list(search_opts={
-                "name": name,
-            })[0]
+        polls = 0
+        with metrics.timed("instance.wait_active", {"instance.id": server.id}):
+            while status != "ACTIVE":
+                polls += 1
+                metrics.count_call("nova.servers.list")
+                with tracing.span("nova.poll", {"poll": polls}) as span:
+                    server = self.client.servers.list(search_opts={
+                        "name": name,
+                    })[0]
+                    span.set_attribute("instance.status", server.status)
 
-            status = server.status
+                status = server.status
 
-            if status == "ERROR":
-                raise InstanceCreationError(
-                    "The instance status changed to ERROR."
-                )
+                if status == "ERROR":
+                    raise InstanceCreationError(
+                        "The instance status changed to ERROR."
+                    )
 
         return Instance(server.id, name, get_ipv4(server), status)
 
     def get_instances(self, namespace: str) -> List[Instance]:
-        # Retrieve all instances which name starts with the namespace and is followed
-        # by "-".
-        servers = self.client.servers.list(search_opts={
-            "name": "%s-*" % namespace
-        })
-
         instances = []
+        for page in self.iter_instance_pages(namespace):
+            instances.extend(page)
+        return instances
 
-        for server in servers:
-            instances.append(Instance(
-                server.id, server.name, get_ipv4(server), server.status
-            ))
+    def iter_instance_pages(self, namespace: str) -> Iterator[List[Instance]]:
+        # Only retrieve the instances which name starts with the namespace and is
+        # followed by "-".
+        return self._iter_pages({"name": "%s-*" % namespace})
 
-        return instances
+    def iter_all_instance_pages(self) -> Iterator[List[Instance]]:
+        return self._iter_pages({})
+
+    def _iter_pages(self, search_opts: dict) -> Iterator[List[Instance]]:
+        marker = None
+        while True:
+            metrics.count_call("nova.servers.list")
+            servers = self.client.servers.list(
+                search_opts=search_opts,
+                marker=marker,
+                limit=self.page_size,
+            )
+
+            if not servers:
+                return
+
+            # Only keep what we need from each server rather than holding on to the
+            # whole response.
+            yield [
+                Instance(server.id, server.name, get_ipv4(server), server.status)
+                for server in servers
+            ]
+
+            if len(servers) < self.page_size:
+                return
+            marker = servers[-1].id
 
     def delete_instance(self, instance: Instance):
+        metrics.count_call("nova.servers.delete")
         self.client.servers.delete(instance.instance_id)
 
+        # Deleting a server only disassociates its floating IP, so release it as well
+        # to avoid leaking it.
+        if self.floating_ip_network and instance.ip_address:
+            self.release_address(instance.ip_address)
+
     def commit(self):
         pass
 
+    def get_limits(self) -> Limits:
+        if self.flavor is None:
+            metrics.count_call("nova.flavors.get")
+            self.flavor = self.client.flavors.get(self.flavor_id)
+
+        metrics.count_call("nova.limits.get")
+        absolute = {
+            limit.name: limit.value for limit in self.client.limits.get().absolute
+        }
+
+        return Limits([
+            Quota(
+                "instances",
+                absolute["maxTotalInstances"],
+                absolute["totalInstancesUsed"],
+            ),
+            Quota(
+                "cores",
+                absolute["maxTotalCores"],
+                absolute["totalCoresUsed"],
+                self.flavor.vcpus,
+            ),
+            Quota(
+                "ram",
+                absolute["maxTotalRAMSize"],
+                absolute["totalRAMUsed"],
+                self.flavor.ram,
+            ),
+        ])
+
+    def reserve_addresses(self, count: int) -> List[str]:
+        if count <= 0:
+            return []
+
+        # Neutron doesn't support creating floating IPs in bulk, so create them one
+        # request at a time, with a few requests in flight at the same time.
+        with ThreadPoolExecutor(
+            max_workers=min(count, self.floating_ip_concurrency),
+        ) as executor:
+            futures = [
+                executor.submit(tracing.propagate(self.create_floating_ip))
+                for _ in range(count)
+            ]
+
+        floating_ips = []
+        error = None
+        for future in futures:
+            try:
+                floating_ips.append(future.result())
+            except Exception as e:
+                error = error or e
+
+        if error is not None:
+            # Don't leak the floating IPs which were created before the failure.
+            for floating_ip in floating_ips:
+                try:
+                    self.delete_floating_ip(floating_ip["id"])
+                except Exception as e:
+                    logger.warning(
+                        "Failed to release floating IP %s: %s",
+                        floating_ip["floating_ip_address"],
+                        e,
+                    )
+            raise error
+
+        return [floating_ip["floating_ip_address"] for floating_ip in floating_ips]
+
+    def associate_address(self, instance: Instance, ip_address: str) -> Instance:
+        floating_ip = self.get_floating_ip(ip_address)
+        if floating_ip is None:
+            raise InstanceCreationError("Unknown floating IP %s" % ip_address)
+
+        metrics.count_call("neutron.ports.list")
+        ports = self.network.get(
+            "/v2.0/ports", params={"device_id": instance.instance_id},
+        ).json()["ports"]
+        if not ports:
+            raise InstanceCreationError(
+                "Instance %s doesn't have any port to associate %s with"
+                % (instance.name, ip_address)
+            )
+
+        metrics.count_call("neutron.floatingips.update")
+        self.network.put("/v2.0/floatingips/%s" % floating_ip["id"], json={
+            "floatingip": {"port_id": ports[0]["id"]},
+        })
+
+        return Instance(instance.instance_id, instance.name, ip_address, instance.status)
+
+    def release_address(self, ip_address: str):
+        floating_ip = self.get_floating_ip(ip_address)
+        if floating_ip is None:
+            return
+
+        self.delete_floating_ip(floating_ip["id"])
+
+    def create_floating_ip(self) -> dict:
+        """Create a floating IP on the configured external network.
+
+        Returns:
+            The floating IP as a dict.
+        """
+        metrics.count_call("neutron.floatingips.create")
+        response = self.network.post("/v2.0/floatingips", json={
+            "floatingip": {"floating_network_id": self.floating_ip_network},
+        })
+        return response.json()["floatingip"]
+
+    def delete_floating_ip(self, floating_ip_id: str):
+        """Delete the floating IP with the provided ID.
+
+        Args:
+            floating_ip_id (str): The ID of the floating IP.
+        """
+        metrics.count_call("neutron.floatingips.delete")
+        self.network.delete("/v2.0/floatingips/%s" % floating_ip_id)
+
+    def get_floating_ip(self, ip_address: str):
+        """Retrieve the floating IP with the provided address from neutron.
+
+        Args:
+            ip_address (str): The address of the floating IP.
+
+        Returns:
+            The floating IP as a dict, or None if there's no such floating IP.
+        """
+        metrics.count_call("neutron.floatingips.list")
+        floating_ips = self.network.get(
+            "/v2.0/floatingips", params={"floating_ip_address": ip_address},
+        ).json()["floatingips"]
+
+        return floating_ips[0] if floating_ips else None
+
 
 provider_client_class = OpenStackInstancesProviderClient
 
@@ -86,13 +294,18 @@ provider_client_class = OpenStackInstancesProviderClient
 def get_ipv4(server):
     """Get the server's public IPv4 address from its metadata.
 
-    Loops through all of the interfaces of the Ext-Net network (which is the
-    public-facing network) because we can't always know how the interfaces are ordered.
+    If a floating IP is associated with the server, return it. Otherwise, loop through
+    all of the interfaces of the Ext-Net network (which is the public-facing network)
+    because we can't always know how the interfaces are ordered.
 
     Args:
          server (Server): The server to retrieve the IPv4 of, as an instance of the
             Server class from the nova SDK.
     """
+    for interfaces in server.addresses.values():
+        for interface in interfaces:
+            if interface.get("OS-EXT-IPS:type") == "floating":
+                return interface["addr"]
 
     interfaces = server.addresses.get("Ext-Net")
     if interfaces is None:
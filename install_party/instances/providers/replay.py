@@ -0,0 +1,73 @@
+from typing import List, Optional
+
+from install_party.instances.instances_provider_client import (
+    Instance,
+    InstancesProviderClient,
+    Limits,
+)
+from install_party.util.cassette import get_player
+from install_party.util.errors import CassetteError
+
+
+class ReplayInstancesProviderClient(InstancesProviderClient):
+    def __init__(self, args):
+        """An instances provider replaying the interactions recorded in a cassette, see
+        cassette.Player for the supported arguments.
+        """
+        self.player = get_player("instances", args)
+
+        # Whether addresses were reserved is only known once the cassette is replayed,
+        # see reserve_addresses.
+        self.supports_address_reservation = True
+
+    def create_instance(self, name: str, post_creation_script: str) -> Instance:
+        result = self.player.replay(
+            "create_instance",
+            {"name": name, "post_creation_script_length": len(post_creation_script)},
+        )
+
+        # The name is usually randomly generated, so use the one we were given rather
+        # than the recorded one.
+        result["name"] = name
+        return Instance.from_dict(result)
+
+    def get_instances(self, namespace: str) -> List[Instance]:
+        result = self.player.replay("get_instances", {"namespace": namespace})
+        return [Instance.from_dict(instance) for instance in result]
+
+    def delete_instance(self, instance: Instance):
+        self.player.replay("delete_instance", {"instance": instance.to_dict()})
+
+    def commit(self):
+        self.player.replay("commit", {})
+
+    def get_limits(self) -> Optional[Limits]:
+        try:
+            result = self.player.replay("get_limits", {})
+        except CassetteError:
+            # The cassette was recorded without checking the limits.
+            return None
+
+        return Limits.from_dict(result) if result else None
+
+    def reserve_addresses(self, count: int) -> List[str]:
+        try:
+            return self.player.replay("reserve_addresses", {"count": count})
+        except CassetteError:
+            # The cassette was recorded without reserving addresses.
+            return []
+
+    def associate_address(self, instance: Instance, ip_address: str) -> Instance:
+        result = self.player.replay(
+            "associate_address",
+            {"instance": instance.to_dict(), "ip_address": ip_address},
+        )
+
+        result["name"] = instance.name
+        return Instance.from_dict(result)
+
+    def release_address(self, ip_address: str):
+        self.player.replay("release_address", {"ip_address": ip_address})
+
+
+provider_client_class = ReplayInstancesProviderClient
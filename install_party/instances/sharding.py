@@ -0,0 +1,246 @@
+import logging
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+
+from install_party.instances.instances_provider_client import (
+    Instance,
+    InstancesProviderClient,
+    Limits,
+    Quota,
+)
+from install_party.util import tracing
+from install_party.util.errors import UnknownInstanceError
+
+logger = logging.getLogger(__name__)
+
+# The number of seconds the threads paging through shards wait for room in the queue
+# before checking whether the pages are still wanted.
+QUEUE_POLL_INTERVAL = 0.1
+
+
+class Shard:
+    def __init__(self, name: str, weight: float, client: InstancesProviderClient):
+        """An instances provider account or region servers can be spread across.
+
+        Args:
+            name (str): The name of the shard.
+            weight (float): The share of the servers to create on this shard, relative
+                to the other shards' weights.
+            client (InstancesProviderClient): The client for the shard's provider.
+        """
+        self.name = name
+        self.weight = weight
+        self.client = client
+        # Number of instances this client has created (or is creating) on this shard.
+        self.assigned = 0
+        # Number of instances this client can assign to this shard before hitting the
+        # shard's limits, or None if unknown or unlimited. Set by get_limits.
+        self.capacity: Optional[int] = None
+
+    def is_full(self) -> bool:
+        return self.capacity is not None and self.assigned >= self.capacity
+
+
+class ShardedLimits(Limits):
+    def __init__(self, shards_limits: Dict[str, Limits]):
+        """The limits of every shard. New instances can go to any shard, so the number
+        of instances that can be created is the sum of what each shard allows for.
+
+        Args:
+            shards_limits (dict): The limits of each shard, associated with the shard's
+                name.
+        """
+        super().__init__([
+            Quota("%s/%s" % (name, q.resource), q.limit, q.used, q.per_instance)
+            for name, limits in shards_limits.items()
+            for q in limits.quotas
+        ])
+        self.shards_limits = shards_limits
+
+    def available_instances(self) -> Optional[int]:
+        available = [
+            limits.available_instances() for limits in self.shards_limits.values()
+        ]
+        if None in available:
+            return None
+        return sum(available)
+
+
+class ShardedInstancesProviderClient(InstancesProviderClient):
+    def __init__(self, shards: List[Shard]):
+        """An instances provider client spreading instances across several shards (e.g.
+        provider accounts or regions), so that capacity and creation throughput scale
+        with the number of shards.
+
+        Instances are created on the shard with the lowest number of instances created
+        by this client relative to its weight. Listing queries every shard in parallel
+        and merges the results.
+
+        Args:
+            shards (list): The shards to spread instances across.
+
+        Raises:
+            ValueError: A shard's weight isn't a positive number.
+        """
+        for shard in shards:
+            if not 0 < shard.weight < math.inf:
+                raise ValueError(
+                    "The weight of shard %s must be a positive number, not %s"
+                    % (shard.name, shard.weight)
+                )
+
+        self.shards = shards
+        self.supports_listing_all = all(
+            shard.client.supports_listing_all for shard in shards
+        )
+        self.lock = threading.Lock()
+        # The shard each instance we know about lives on, associated with the
+        # instance's ID.
+        self.owners: Dict[str, Shard] = {}
+
+    def pick_shard(self) -> Shard:
+        """Pick the shard to create the next instance on, and account for it.
+
+        Returns:
+            The shard to create the instance on.
+        """
+        with self.lock:
+            # Avoid shards we know are full, unless they all are, in which case let the
+            # provider report the error.
+            candidates = [s for s in self.shards if not s.is_full()] or self.shards
+            shard = min(candidates, key=lambda s: (s.assigned + 1) / s.weight)
+            shard.assigned += 1
+            return shard
+
+    def create_instance(self, name: str, post_creation_script: str) -> Instance:
+        shard = self.pick_shard()
+        logger.info("Creating instance on shard %s...", shard.name)
+
+        instance = shard.client.create_instance(name, post_creation_script)
+
+        with self.lock:
+            self.owners[instance.instance_id] = shard
+
+        return instance
+
+    def get_instances(self, namespace: str) -> List[Instance]:
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as executor:
+            futures = [
+                (shard, executor.submit(shard.client.get_instances, namespace))
+                for shard in self.shards
+            ]
+
+            instances = []
+            for shard, future in futures:
+                shard_instances = future.result()
+
+                with self.lock:
+                    for instance in shard_instances:
+                        self.owners[instance.instance_id] = shard
+
+                instances.extend(shard_instances)
+
+        return instances
+
+    def iter_instance_pages(self, namespace: str) -> Iterator[List[Instance]]:
+        return self._iter_pages(lambda client: client.iter_instance_pages(namespace))
+
+    def iter_all_instance_pages(self) -> Iterator[List[Instance]]:
+        return self._iter_pages(lambda client: client.iter_all_instance_pages())
+
+    def _iter_pages(self, iter_pages: Callable) -> Iterator[List[Instance]]:
+        # Page through every shard at the same time, with one thread per shard feeding
+        # a bounded queue, so listing is as fast as the slowest shard while only a few
+        # pages are held in memory at a time. Each item of the queue is either a page,
+        # the exception a shard failed with, or None once a shard has been paged
+        # through.
+        pages = queue.Queue(maxsize=len(self.shards))
+        # Set if the consumer stops iterating, so the threads don't block forever.
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=QUEUE_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce(shard: Shard):
+            try:
+                for page in iter_pages(shard.client):
+                    with self.lock:
+                        for instance in page:
+                            self.owners[instance.instance_id] = shard
+
+                    if not put(page):
+                        return
+            except Exception as e:
+                put(e)
+            else:
+                put(None)
+
+        for shard in self.shards:
+            threading.Thread(
+                target=tracing.propagate(produce), args=(shard,), daemon=True,
+            ).start()
+
+        try:
+            remaining = len(self.shards)
+            while remaining:
+                item = pages.get()
+                if item is None:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+    def delete_instance(self, instance: Instance):
+        with self.lock:
+            shard = self.owners.get(instance.instance_id)
+
+        if shard is None:
+            raise UnknownInstanceError(
+                "Don't know which shard instance %s lives on" % instance.instance_id
+            )
+
+        shard.client.delete_instance(instance)
+
+    def commit(self):
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as executor:
+            futures = [executor.submit(shard.client.commit) for shard in self.shards]
+            for future in futures:
+                future.result()
+
+    def get_limits(self) -> Optional[Limits]:
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as executor:
+            futures = [
+                (shard, executor.submit(shard.client.get_limits))
+                for shard in self.shards
+            ]
+
+            shards_limits = {}
+            for shard, future in futures:
+                limits = future.result()
+
+                if limits is None:
+                    # If we can't tell what a shard's limits are, we can't tell how
+                    # many instances can be created overall.
+                    return None
+
+                available = limits.available_instances()
+                with self.lock:
+                    shard.capacity = (
+                        shard.assigned + available if available is not None else None
+                    )
+
+                shards_limits[shard.name] = limits
+
+        return ShardedLimits(shards_limits)
@@ -1,71 +1,190 @@
 import argparse
 import logging
-from typing import Dict
-
-from tabulate import tabulate
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from install_party.dns import dns_provider
+from install_party.dns.dns_provider_client import DNSRecord
 from install_party.instances import instances_provider
+from install_party.instances.instances_provider_client import Instance
+from install_party.util import aio, tracing
 from install_party.util.entry import Entry
+from install_party.util.errors import UnsupportedListingError
 
 logger = logging.getLogger(__name__)
 
-
-def gather_instances(entries_dict: Dict[str, Entry], config):
-    """Gather all instances which name belongs to the namespace defined in the
-    configuration and add their info to a given dict.
+# The names of the instances and the sub-domains of the DNS records install_party
+# creates, i.e. "<namespace>-<name>" and "<name>.<namespace>", where the namespace is a
+# DNS label and the name is made of lowercase letters and digits. Used to tell which
+# namespaces exist when listing all of them, so that resources created by other means
+# aren't mistaken for servers.
+INSTANCE_NAME_REGEX = re.compile(r"^([a-z0-9](?:[a-z0-9-]*[a-z0-9])?)-[a-z0-9]+$")
+SUB_DOMAIN_REGEX = re.compile(r"^[a-z0-9]+\.([a-z0-9](?:[a-z0-9-]*[a-z0-9])?)$")
+
+
+class NamespaceIndex:
+    def __init__(self, namespaces: Iterable[str]):
+        """An index of namespaces, which tells which namespace an instance name or a
+        sub-domain belongs to by looking up each of its possible prefixes (or suffixes),
+        rather than by comparing it with every namespace.
+
+        Args:
+            namespaces (iterable): The namespaces to index.
+        """
+        self.namespaces = set(namespaces)
+
+    def split_instance_name(self, name: str) -> Optional[Tuple[str, str]]:
+        """Find the namespace an instance belongs to from its name, i.e. the longest
+        indexed namespace which the name starts with, followed by "-".
+
+        Args:
+            name (str): The name of the instance.
+
+        Returns:
+            The namespace and the entry ID, or None if the instance isn't part of any of
+            the indexed namespaces.
+        """
+        i = name.rfind("-")
+        while i > 0:
+            if name[:i] in self.namespaces:
+                return name[:i], name[i + 1:]
+            i = name.rfind("-", 0, i)
+        return None
+
+    def split_sub_domain(self, sub_domain: str) -> Optional[Tuple[str, str]]:
+        """Find the namespace a DNS record belongs to from its sub-domain, i.e. the
+        longest indexed namespace which the sub-domain ends with, preceded by ".".
+
+        Args:
+            sub_domain (str): The sub-domain of the DNS record.
+
+        Returns:
+            The namespace and the entry ID, or None if the record isn't part of any of
+            the indexed namespaces.
+        """
+        i = sub_domain.find(".")
+        while i != -1:
+            if sub_domain[i + 1:] in self.namespaces:
+                return sub_domain[i + 1:], sub_domain[:i]
+            i = sub_domain.find(".", i + 1)
+        return None
+
+
+def add_entry(
+        entries_dict: Dict[str, Entry],
+        entry_id: str,
+        instance: Optional[Instance] = None,
+        record: Optional[DNSRecord] = None,
+):
+    """Add an instance or a DNS record to the entry with the provided ID, creating the
+    entry if it doesn't exist yet.
 
     Args:
-        entries_dict (dict): The dict to add the instances' info to.
-        config (dict): The parsed configuration.
+        entries_dict (dict): The dict to add the instance or record to.
+        entry_id (str): The ID of the entry.
+        instance (Instance): The instance to add, if any.
+        record (DNSRecord): The DNS record to add, if any.
     """
-    logger.debug("Gathering instances...")
+    entry = entries_dict.get(entry_id)
+    if entry is None:
+        entries_dict[entry_id] = Entry(instance=instance, record=record)
+    elif instance is not None:
+        entry.instance = instance
+    else:
+        entry.record = record
+
 
-    client = instances_provider.get_instances_provider_client(config)
-    instances = client.get_instances(config["general"]["namespace"])
+def add_instances(
+        entries_dict: Dict[str, Entry], instances: List[Instance], namespace: str,
+):
+    """Add the provided instances to a given dict of entries.
 
-    # Edit the entries dictionary to add the instances' information.
+    Args:
+        entries_dict (dict): The dict to add the instances' info to.
+        instances (list): The instances which name belongs to the namespace.
+        namespace (str): The namespace the instances are part of.
+    """
+    prefix = namespace + "-"
     for instance in instances:
-        entry_id = instance.name.split("-", 1)[1]
-        if entry_id in entries_dict:
-            entries_dict[entry_id].instance = instance
-        else:
-            entries_dict[entry_id] = Entry(instance=instance)
+        # Strip the namespace rather than split on the first "-", since the namespace
+        # can contain one.
+        if instance.name.startswith(prefix):
+            add_entry(entries_dict, instance.name[len(prefix):], instance=instance)
 
 
-def gather_records(entries_dict: Dict[str, Entry], config):
-    """Gather all DNS records which sub-domain belongs to the namespace defined in the
-    configuration and add their info to a given dict.
+def add_records(
+        entries_dict: Dict[str, Entry], records: List[DNSRecord], namespace: str,
+):
+    """Add the provided DNS records to a given dict of entries.
 
     Args:
         entries_dict (dict): The dict to add the domain names' info to.
-        config (dict): The parsed configuration.
+        records (list): The DNS records which sub-domain belongs to the namespace.
+        namespace (str): The namespace the records are part of.
     """
-    client = dns_provider.get_dns_provider_client(config)
+    suffix = "." + namespace
+    for record in records:
+        if record.sub_domain.endswith(suffix):
+            add_entry(entries_dict, record.sub_domain[:-len(suffix)], record=record)
 
-    logger.debug("Gathering DNS records...")
 
-    records = client.get_sub_domains(
-        config["general"]["namespace"], config["dns"]["zone"]
-    )
+def partition_entries(
+        instances: List[Instance],
+        records: List[DNSRecord],
+        namespaces: Optional[Iterable[str]] = None,
+) -> Dict[str, Dict[str, Entry]]:
+    """Sort instances and DNS records from several namespaces into one dict of entries
+    per namespace.
+
+    Args:
+        instances (list): The instances to sort.
+        records (list): The DNS records to sort.
+        namespaces (iterable): The namespaces to sort the instances and records into.
+            Instances and records which aren't part of any of them are ignored. If None,
+            every namespace an instance or a record named the way install_party names
+            them is part of is included.
+
+    Returns:
+        The dicts of entries (see get_list), associated with their namespace.
+    """
+    if namespaces is None:
+        namespaces = set()
+        for instance in instances:
+            match = INSTANCE_NAME_REGEX.match(instance.name)
+            if match:
+                namespaces.add(match.group(1))
+        for record in records:
+            match = SUB_DOMAIN_REGEX.match(record.sub_domain)
+            if match:
+                namespaces.add(match.group(1))
+
+    index = NamespaceIndex(namespaces)
+    lists: Dict[str, Dict[str, Entry]] = {
+        namespace: {} for namespace in index.namespaces
+    }
+
+    for instance in instances:
+        match = index.split_instance_name(instance.name)
+        if match is not None:
+            add_entry(lists[match[0]], match[1], instance=instance)
 
     for record in records:
-        # Edit the entries dictionary to add the record's information.
-        entry_id = record.sub_domain.split(".", 1)[0]
-        if entry_id in entries_dict:
-            entries_dict[entry_id].record = record
-        else:
-            entries_dict[entry_id] = Entry(record=record)
+        match = index.split_sub_domain(record.sub_domain)
+        if match is not None:
+            add_entry(lists[match[0]], match[1], record=record)
+
+    return lists
 
 
 def sort_entries(entries_dict: Dict[str, Entry]):
-    """Process a dict populated by gather_instances and gather_domains and sorts its
+    """Process a dict populated by add_instances and add_records and sorts its
     entries into three lists: one containing the entries that have both an instance and a
     domain, one containing those that only have a domain, and one containing those that
     only have an instance.
 
-    All lists are populated in such a way that they can be directly fed to the call to
-    tabulate in get_and_print_list.
+    All lists are populated with tuples (which are more compact than lists) in such a
+    way that they can be directly fed to the call to tabulate in get_and_print_list.
 
     Args:
         entries_dict (dict): The dict containing the entries to sort.
@@ -79,7 +198,7 @@ def sort_entries(entries_dict: Dict[str, Entry]):
     complete_entries = []
     orphaned_instances = []
     orphaned_domains = []
-    for entries_dict, entry in entries_dict.items():
+    for entry_id, entry in entries_dict.items():
         instance = entry.instance
         record = entry.record
 
@@ -90,24 +209,24 @@ def sort_entries(entries_dict: Dict[str, Entry]):
         if instance is None:
             # We're sure that domain is not None (and therefore full_domain is defined)
             # here because otherwise this ID wouldn't be in the dict.
-            orphaned_domains.append([entries_dict, full_domain, record.target])
+            orphaned_domains.append((entry_id, full_domain, record.target))
         elif record is None:
             # We're sure that instance is not None here because otherwise this ID wouldn't
             # be in the dict.
-            orphaned_instances.append([
-                entries_dict,
+            orphaned_instances.append((
+                entry_id,
                 instance.name,
                 instance.status,
                 instance.ip_address
-            ])
+            ))
         else:
-            complete_entries.append([
-                entries_dict,
+            complete_entries.append((
+                entry_id,
                 instance.name,
                 full_domain,
                 instance.status,
                 instance.ip_address,
-            ])
+            ))
 
     return complete_entries, orphaned_domains, orphaned_instances
 
@@ -128,17 +247,152 @@ def get_list(config) -> Dict[str, Entry]:
         where "instance" is the instance associated with this ID (an Instance object) and
         "record" is the DNS record associated with this ID (a DNSRecord object).
     """
+    with tracing.span("list", {"namespace": config["general"]["namespace"]}):
+        return aio.run(async_get_list(config))
+
+
+async def async_get_list(config) -> Dict[str, Entry]:
+    """Retrieve a list of all instances and DNS records under a configured namespace,
+    querying the instances and DNS providers concurrently. See get_list.
+
+    Args:
+        config (dict): The parsed configuration.
+
+    Returns:
+        The entries, see get_list.
+    """
+    import asyncio
+
+    namespace = config["general"]["namespace"]
+
+    instances_client = instances_provider.get_async_instances_provider_client(config)
+    dns_client = dns_provider.get_async_dns_provider_client(config)
+
     # Initialise the empty dict which will be populated later.
     entries_dict = {}
 
-    # Populate the dict with instances.
-    gather_instances(entries_dict, config)
-    # Populate the dict with DNS records.
-    gather_records(entries_dict, config)
+    async def gather_instances():
+        logger.debug("Gathering instances...")
+        with tracing.span("list.instances") as span:
+            pages = 0
+            # Add the instances to the dict page by page, as they arrive, rather than
+            # waiting for all of them.
+            async for page in instances_client.iter_instance_pages(namespace):
+                add_instances(entries_dict, page, namespace)
+                pages += 1
+            span.set_attribute("pages", pages)
+
+    async def gather_records():
+        logger.debug("Gathering DNS records...")
+        with tracing.span("list.records") as span:
+            records = await dns_client.get_sub_domains(namespace, config["dns"]["zone"])
+            add_records(entries_dict, records, namespace)
+            span.set_attribute("records", len(records))
+
+    try:
+        await asyncio.gather(gather_instances(), gather_records())
+    finally:
+        await instances_client.close()
+        await dns_client.close()
 
     return entries_dict
 
 
+def get_lists(
+        config, namespaces: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Entry]]:
+    """Retrieve a list of all instances and DNS records under several namespaces, by
+    retrieving the instances and the DNS records in the zone once and sorting them by
+    namespace.
+
+    Args:
+        config (dict): The parsed configuration.
+        namespaces (list): The namespaces to list. If None, list every namespace that
+            has at least one instance or DNS record.
+
+    Returns:
+        The entries (see get_list), associated with their namespace.
+
+    Raises:
+        UnsupportedListingError: namespaces is None and one of the providers can't list
+            instances or DNS records across namespaces.
+    """
+    attributes = {"namespaces": ",".join(namespaces) if namespaces else "*"}
+    with tracing.span("list", attributes):
+        return aio.run(async_get_lists(config, namespaces))
+
+
+async def async_get_lists(
+        config, namespaces: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Entry]]:
+    """Retrieve a list of all instances and DNS records under several namespaces,
+    querying the instances and DNS providers concurrently. See get_lists.
+
+    Args:
+        config (dict): The parsed configuration.
+        namespaces (list): The namespaces to list, or None to list all of them.
+
+    Returns:
+        The entries, see get_lists.
+    """
+    import asyncio
+
+    zone = config["dns"]["zone"]
+
+    instances_client = instances_provider.get_async_instances_provider_client(config)
+    dns_client = dns_provider.get_async_dns_provider_client(config)
+
+    async def gather_instances():
+        logger.debug("Gathering instances...")
+        with tracing.span("list.instances") as span:
+            instances = await get_instances()
+            span.set_attribute("instances", len(instances))
+        return instances
+
+    async def gather_records():
+        logger.debug("Gathering DNS records...")
+        with tracing.span("list.records") as span:
+            records = await get_records()
+            span.set_attribute("records", len(records))
+        return records
+
+    async def get_instances():
+        instances = []
+        if instances_client.supports_listing_all:
+            async for page in instances_client.iter_all_instance_pages():
+                instances.extend(page)
+        else:
+            # Fall back to listing each namespace on its own.
+            for namespace in namespaces:
+                async for page in instances_client.iter_instance_pages(namespace):
+                    instances.extend(page)
+        return instances
+
+    async def get_records():
+        if dns_client.supports_listing_all:
+            return await dns_client.get_all_sub_domains(zone)
+
+        records = []
+        for namespace in namespaces:
+            records.extend(await dns_client.get_sub_domains(namespace, zone))
+        return records
+
+    try:
+        if namespaces is None and not (
+            instances_client.supports_listing_all and dns_client.supports_listing_all
+        ):
+            raise UnsupportedListingError(
+                "The configured providers can't list servers across namespaces"
+            )
+
+        instances, records = await asyncio.gather(gather_instances(), gather_records())
+    finally:
+        await instances_client.close()
+        await dns_client.close()
+
+    return partition_entries(instances, records, namespaces)
+
+
 def get_and_print_list(config):
     """Retrieve a list of all instances and dDNS record under a configured namespace and
     print a table listing them and associating each instance with its domain name.
@@ -153,8 +407,36 @@ def get_and_print_list(config):
     """
     args = parse_args()
 
-    # Retrieve the list of instances and DNS record.
-    entries_dict = get_list(config)
+    if not args.namespace and not args.all_namespaces:
+        # Retrieve the list of instances and DNS record.
+        entries_dict = get_list(config)
+
+        print_list(entries_dict, args.hide_orphans)
+        return
+
+    try:
+        lists = get_lists(config, None if args.all_namespaces else args.namespace)
+    except UnsupportedListingError:
+        sys.stderr.write(
+            "The configured providers can't list servers across namespaces, use"
+            " -n/--namespace instead.\n"
+        )
+        sys.exit(1)
+
+    for i, namespace in enumerate(sorted(lists)):
+        print("%sNAMESPACE %s" % ("\n" if i else "", namespace))
+        print_list(lists[namespace], args.hide_orphans)
+
+
+def print_list(entries_dict: Dict[str, Entry], hide_orphans: bool):
+    """Print a table listing the provided entries, see get_and_print_list.
+
+    Args:
+        entries_dict (dict): The entries to list, associated with their ID.
+        hide_orphans (bool): Whether to hide the tables listing the instances without a
+            DNS record and the DNS records without an instance.
+    """
+    from tabulate import tabulate
 
     # Sort the entries into three lists.
     complete_entries, orphaned_domains, orphaned_instances = sort_entries(entries_dict)
@@ -166,7 +448,7 @@ def get_and_print_list(config):
         tablefmt="psql",
     ))
 
-    if not args.hide_orphans:
+    if not hide_orphans:
         if orphaned_instances:
             print("\nORPHANED INSTANCES")
             print(tabulate(
@@ -201,6 +483,21 @@ def parse_args():
              " to false.",
     )
 
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "-n", "--namespace",
+        action="append",
+        metavar="NAMESPACE",
+        help="List the servers in the provided namespace(s) rather than the one in the"
+             " configuration (use it once per namespace). The instances and DNS records"
+             " are only retrieved once whatever the number of namespaces.",
+    )
+    group.add_argument(
+        "-A", "--all-namespaces",
+        action="store_true",
+        help="List the servers in every namespace.",
+    )
+
     args = parser.parse_args()
 
     if args.verbose:
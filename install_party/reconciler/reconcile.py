@@ -0,0 +1,331 @@
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from install_party.creator.create import (
+    create_record,
+    create_server,
+    load_post_install_script,
+)
+from install_party.creator.names import NameAllocator
+from install_party.dns import dns_provider
+from install_party.eraser.delete import delete_instance, delete_record
+from install_party.instances import instances_provider
+from install_party.lister.list import get_list, sort_entries
+from install_party.util import transport
+from install_party.util.entry import Entry
+
+logger = logging.getLogger(__name__)
+
+# The status of instances that are up and running.
+ACTIVE_STATUS = "ACTIVE"
+
+# The statuses of instances that are still being built, and will hopefully become
+# active. Instances in any status other than these and ACTIVE (e.g. ERROR, SHUTOFF or
+# DELETING) are considered broken.
+PENDING_STATUSES = ("BUILD", "REBUILD")
+
+
+class Plan:
+    def __init__(self):
+        """The actions to perform to converge the namespace towards the target number
+        of healthy servers.
+        """
+        # Entries to delete, along with the reason for deleting them.
+        self.to_delete: Dict[str, str] = {}
+        # Entries which instance needs a DNS record.
+        self.to_attach: List[str] = []
+        # Entries which DNS record must be replaced by one targeting their instance.
+        self.to_repoint: List[str] = []
+        # Names of the servers to create.
+        self.to_create: List[str] = []
+        # Entries that are left alone.
+        self.to_keep: List[str] = []
+
+    def is_empty(self) -> bool:
+        return not (
+            self.to_delete or self.to_attach or self.to_repoint or self.to_create
+        )
+
+    def rows(self) -> List[list]:
+        """Returns: The plan as rows that can be directly fed to tabulate."""
+        rows = [
+            [entry_id, "delete", reason] for entry_id, reason in self.to_delete.items()
+        ]
+        rows += [[entry_id, "attach DNS record", ""] for entry_id in self.to_attach]
+        rows += [
+            [entry_id, "re-point DNS record", "DNS record doesn't target the instance"]
+            for entry_id in self.to_repoint
+        ]
+        rows += [[name, "create", ""] for name in self.to_create]
+        return rows
+
+
+def compute_plan(entries_dict: Dict[str, Entry], count: int) -> Plan:
+    """Compute the minimal set of actions to reach the provided number of healthy
+    servers in the namespace.
+
+    Servers which instance is neither active nor being built (e.g. in the ERROR or
+    SHUTOFF status) are deleted and replaced by new servers. Active servers which DNS
+    record doesn't point to their instance get their DNS record replaced. Active
+    instances without a DNS record get one. DNS records without an instance are
+    deleted. Servers which instance is still being built are left alone and count as
+    healthy.
+
+    If there are more servers than needed, the broken ones are deleted without being
+    replaced first, then the ones which DNS record needs fixing, then healthy ones.
+
+    Args:
+        entries_dict (dict): The entries in the namespace, as returned by
+            list.get_list.
+        count (int): The target number of healthy servers.
+
+    Returns:
+        The plan.
+    """
+    plan = Plan()
+
+    complete_entries, orphaned_domains, orphaned_instances = sort_entries(entries_dict)
+
+    for entry_id, _, _, status, ip_address in complete_entries:
+        record = entries_dict[entry_id].record
+        if status not in PENDING_STATUSES and status != ACTIVE_STATUS:
+            plan.to_delete[entry_id] = "instance in %s status" % status
+        elif status == ACTIVE_STATUS and ip_address and record.target != ip_address:
+            plan.to_repoint.append(entry_id)
+        else:
+            plan.to_keep.append(entry_id)
+
+    for entry_id, _, status, ip_address in orphaned_instances:
+        if status not in PENDING_STATUSES and status != ACTIVE_STATUS:
+            plan.to_delete[entry_id] = "instance in %s status" % status
+        elif status == ACTIVE_STATUS and ip_address:
+            plan.to_attach.append(entry_id)
+        else:
+            plan.to_keep.append(entry_id)
+
+    for entry_id, _, _ in orphaned_domains:
+        plan.to_delete[entry_id] = "orphaned DNS record"
+
+    # Make the plan deterministic.
+    plan.to_keep.sort()
+    plan.to_attach.sort()
+    plan.to_repoint.sort()
+
+    # If we have too many servers, don't bother fixing the DNS records of servers we'd
+    # then delete.
+    surplus = len(plan.to_keep) + len(plan.to_attach) + len(plan.to_repoint) - count
+    for fixable in (plan.to_attach, plan.to_repoint, plan.to_keep):
+        while surplus > 0 and fixable:
+            plan.to_delete[fixable.pop()] = "surplus"
+            surplus -= 1
+
+    # Create the missing servers, with names that aren't already in use.
+    missing = count - len(plan.to_keep) - len(plan.to_attach) - len(plan.to_repoint)
+    plan.to_create = NameAllocator(entries_dict.keys()).allocate(max(missing, 0))
+
+    return plan
+
+
+def apply_plan(
+        plan: Plan,
+        entries_dict: Dict[str, Entry],
+        post_install_script: str,
+        concurrency: int,
+        config,
+):
+    """Perform the actions described in the plan, concurrently.
+
+    Deletions (including the deletions of the DNS records to re-point) happen first, so
+    that they free up the provider's quota for the creations. Creations and DNS record
+    attachments then happen concurrently.
+
+    Args:
+        plan (Plan): The plan to apply.
+        entries_dict (dict): The entries the plan has been computed from.
+        post_install_script (str): A script to run on the created servers after the
+            post-creation script has finished.
+        concurrency (int): The maximum number of actions to run at the same time.
+        config (dict): The parsed configuration.
+
+    Returns:
+        int: The number of actions that failed.
+    """
+    instances_client = instances_provider.get_instances_provider_client(config)
+    dns_client = dns_provider.get_dns_provider_client(config)
+
+    def delete(entry_id):
+        entry = entries_dict[entry_id]
+        if entry.instance:
+            delete_instance(entry_id, entry.instance, instances_client, False)
+        if entry.record:
+            delete_record(entry_id, entry.record, dns_client, False)
+
+    def detach(entry_id):
+        delete_record(entry_id, entries_dict[entry_id].record, dns_client, False)
+
+    def attach(entry_id):
+        instance = entries_dict[entry_id].instance
+        create_record(entry_id, instance.ip_address, config)
+
+    def create(name):
+        create_server(name, post_install_script, config)
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        deletions = {
+            entry_id: executor.submit(delete, entry_id) for entry_id in plan.to_delete
+        }
+        detachments = {
+            entry_id: executor.submit(detach, entry_id) for entry_id in plan.to_repoint
+        }
+        failures += wait_for(deletions, "delete")
+        failures += wait_for(detachments, "delete the DNS record of")
+
+        # Only apply the deletions on the providers that have some.
+        records_deleted = True
+        if any(entries_dict[entry_id].instance for entry_id in plan.to_delete):
+            failures += commit(instances_client.commit, "instance")
+        if plan.to_repoint or any(
+            entries_dict[entry_id].record for entry_id in plan.to_delete
+        ):
+            failed = commit(dns_client.commit, "DNS record", config["dns"]["zone"])
+            failures += failed
+            records_deleted = not failed
+
+        # Only attach a new DNS record to the servers which previous one was deleted,
+        # so a server never ends up with two.
+        to_attach = plan.to_attach + [
+            entry_id for entry_id, future in detachments.items()
+            if records_deleted and future.exception() is None
+        ]
+        attachments = {
+            entry_id: executor.submit(attach, entry_id) for entry_id in to_attach
+        }
+        creations = {name: executor.submit(create, name) for name in plan.to_create}
+        failures += wait_for(attachments, "attach a DNS record to")
+        failures += wait_for(creations, "create")
+
+    return failures
+
+
+def commit(func, kind: str, *args) -> int:
+    """Apply the deletions of the provided kind by calling the provided commit function,
+    and log it if it failed.
+
+    Args:
+        func (callable): The commit function of the provider client.
+        kind (str): The kind of resources deleted, for logging.
+        args: The arguments to call the commit function with.
+
+    Returns:
+        1 if the commit failed, 0 otherwise.
+    """
+    logger.info("Applying the %s deletions...", kind)
+    try:
+        func(*args)
+    except Exception as e:
+        logger.error("Failed to apply the %s deletions: %s", kind, e)
+        return 1
+    return 0
+
+
+def wait_for(futures, action: str) -> int:
+    """Wait for the provided futures to complete, and log the ones that failed.
+
+    Args:
+        futures (dict): The futures to wait for, associated with the name of the entry
+            they act on.
+        action (str): A description of the action, for logging.
+
+    Returns:
+        The number of futures that failed.
+    """
+    failures = 0
+    for name, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logger.error("Failed to %s %s: %s", action, name, e)
+            failures += 1
+    return failures
+
+
+def reconcile(config):
+    """Converge the namespace towards the number of healthy servers provided in the
+    command-line arguments, in a single pass.
+
+    Args:
+        config (dict): The parsed configuration.
+    """
+    args = parse_args()
+
+    from tabulate import tabulate
+
+    post_install_script = load_post_install_script(args.post_install_script)
+    transport.set_concurrency(args.concurrency)
+
+    entries_dict = get_list(config)
+    plan = compute_plan(entries_dict, args.count)
+
+    if plan.is_empty():
+        print("Nothing to do, %d servers are healthy." % len(plan.to_keep))
+        return
+
+    print(tabulate(plan.rows(), headers=["Name", "Action", "Reason"], tablefmt="psql"))
+
+    if args.dry_run:
+        return
+
+    failures = apply_plan(
+        plan, entries_dict, post_install_script, args.concurrency, config,
+    )
+
+    if failures:
+        print("\n%d action(s) failed, run again to retry them." % failures)
+    else:
+        print("\nAll actions succeeded.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="install_party reconcile",
+        description="Create, fix and delete servers so that the configured namespace"
+                    " contains exactly the provided number of healthy servers.",
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Increases the verbosity."
+    )
+    parser.add_argument(
+        "-N", "--count",
+        type=int,
+        required=True,
+        help="Number of healthy servers the namespace must contain.",
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=10,
+        help="Maximum number of actions to perform at the same time. Defaults to 10.",
+    )
+    parser.add_argument(
+        "-s", "--post-install-script",
+        help="Path to a Bash script to run once a server has been created and the"
+             " minimal installation has been performed.",
+    )
+    parser.add_argument(
+        "-d", "--dry-run",
+        action="store_true",
+        help="Print the actions that would normally be performed but don't actually"
+             " perform them.",
+    )
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger("install_party").setLevel(logging.DEBUG)
+
+    return args
@@ -0,0 +1,421 @@
+import argparse
+import logging
+import select
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, TextIO
+
+from install_party.lister.list import get_list, sort_entries
+from install_party.util import metrics, transport
+
+logger = logging.getLogger(__name__)
+
+# The number of bytes to read from a channel at once.
+CHUNK_SIZE = 32768
+
+# The maximum number of seconds to wait for data on a channel before checking whether
+# the command has exited or timed out.
+POLL_INTERVAL = 0.5
+
+
+class ConnectionPool:
+    def __init__(self, user: str, password: str, port: int = 22, timeout: float = 30):
+        """SSH connections to the servers, opened on first use and then reused by every
+        command run on the same server.
+
+        Args:
+            user (str): The user to log in as.
+            password (str): The user's password.
+            port (int): The port the servers' SSH daemon listens on.
+            timeout (float): The number of seconds to wait for a connection to be
+                established and authenticated.
+        """
+        self.user = user
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.host_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self.clients: Dict[str, object] = {}
+
+    def get(self, host: str):
+        """Get a connection to a server, opening it if there's no usable one already.
+
+        Args:
+            host (str): The address of the server.
+
+        Returns:
+            The connection, as a paramiko.SSHClient.
+        """
+        # Only connect once to each server, even if several threads need a connection
+        # to it at the same time.
+        with self.lock:
+            host_lock = self.host_locks[host]
+
+        with host_lock:
+            client = self.clients.get(host)
+            if client is not None:
+                ssh_transport = client.get_transport()
+                if ssh_transport is not None and ssh_transport.is_active():
+                    return client
+
+            client = self.connect(host)
+            self.clients[host] = client
+
+        return client
+
+    def connect(self, host: str):
+        """Open a connection to a server.
+
+        Args:
+            host (str): The address of the server.
+
+        Returns:
+            The connection, as a paramiko.SSHClient.
+        """
+        # paramiko is only needed by this mode, so don't make it a hard dependency.
+        import paramiko
+
+        client = paramiko.SSHClient()
+        # The servers are ephemeral and their host keys were generated on their first
+        # boot, so there's nothing to check them against.
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            host,
+            port=self.port,
+            username=self.user,
+            password=self.password,
+            timeout=self.timeout,
+            banner_timeout=self.timeout,
+            auth_timeout=self.timeout,
+            allow_agent=False,
+            look_for_keys=False,
+        )
+
+        return client
+
+    def close(self):
+        """Close every connection."""
+        with self.lock:
+            clients = list(self.clients.values())
+            self.clients.clear()
+
+        for client in clients:
+            client.close()
+
+
+class PrefixedWriter:
+    def __init__(self, prefix: str, stream: TextIO, lock: threading.Lock):
+        """Writes the output of a command line by line, each line prefixed with the
+        name of the server the command runs on, so the output of several servers can
+        be interleaved without being mixed up.
+
+        Args:
+            prefix (str): The prefix to add to each line.
+            stream (TextIO): The stream to write the lines to.
+            lock (threading.Lock): A lock shared by every writer using the same stream,
+                so lines are written whole.
+        """
+        self.prefix = prefix
+        self.stream = stream
+        self.lock = lock
+        self.buffer = b""
+
+    def feed(self, data: bytes):
+        """Write the complete lines in the provided data, and keep the rest until the
+        end of the line is received.
+
+        Args:
+            data (bytes): The data received from the command.
+        """
+        self.buffer += data
+        lines = self.buffer.split(b"\n")
+        self.buffer = lines.pop()
+        if lines:
+            self.write(lines)
+
+    def flush(self):
+        """Write what's left of the output, if anything."""
+        if self.buffer:
+            self.write([self.buffer])
+            self.buffer = b""
+
+    def write(self, lines: List[bytes]):
+        text = "".join(
+            "[%s] %s\n" % (self.prefix, line.decode("utf-8", "replace").rstrip("\r"))
+            for line in lines
+        )
+        with self.lock:
+            self.stream.write(text)
+            self.stream.flush()
+
+
+def run_script(client, script: str, timeout: float, sudo: bool, stdout, stderr) -> int:
+    """Run a script on a server and stream its output.
+
+    Args:
+        client (paramiko.SSHClient): The connection to the server.
+        script (str): The content of the script, run with Bash.
+        timeout (float): The maximum number of seconds the script can run for.
+        sudo (bool): Whether to run the script as root.
+        stdout (PrefixedWriter): The writer for the script's standard output.
+        stderr (PrefixedWriter): The writer for the script's standard error.
+
+    Returns:
+        The exit status of the script.
+
+    Raises:
+        TimeoutError: The script didn't finish in time.
+    """
+    deadline = time.monotonic() + timeout
+
+    channel = client.get_transport().open_session(timeout=timeout)
+    try:
+        channel.exec_command("sudo -n bash -s" if sudo else "bash -s")
+        channel.sendall(script.encode("utf-8"))
+        channel.shutdown_write()
+
+        while True:
+            # Check the deadline on every iteration, since a script that keeps writing
+            # output would otherwise never time out.
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Timed out after %.0f seconds" % timeout)
+
+            if channel.recv_ready():
+                stdout.feed(channel.recv(CHUNK_SIZE))
+            elif channel.recv_stderr_ready():
+                stderr.feed(channel.recv_stderr(CHUNK_SIZE))
+            elif channel.exit_status_ready():
+                break
+            else:
+                select.select([channel], [], [], min(remaining, POLL_INTERVAL))
+
+        return channel.recv_exit_status()
+    finally:
+        stdout.flush()
+        stderr.flush()
+        channel.close()
+
+
+def run_on_hosts(
+        hosts: Dict[str, str],
+        scripts: List[str],
+        pool: ConnectionPool,
+        concurrency: int = 10,
+        timeout: float = 600,
+        sudo: bool = False,
+) -> Dict[str, str]:
+    """Run scripts on several servers concurrently, streaming their output prefixed
+    with the servers' names. The scripts are run one after the other on each server,
+    over the same connection, and the following ones are skipped if one fails.
+
+    Args:
+        hosts (dict): The addresses of the servers, associated with their names.
+        scripts (list): The contents of the scripts to run.
+        pool (ConnectionPool): The connections to the servers.
+        concurrency (int): The maximum number of servers to run the scripts on at the
+            same time.
+        timeout (float): The maximum number of seconds the scripts can run for on each
+            server.
+        sudo (bool): Whether to run the scripts as root.
+
+    Returns:
+        The outcome on each server ("ok", or a description of the failure), associated
+        with the server's name.
+    """
+    output_lock = threading.Lock()
+
+    def run_on_host(name: str, host: str) -> str:
+        stdout = PrefixedWriter(name, sys.stdout, output_lock)
+        stderr = PrefixedWriter(name, sys.stderr, output_lock)
+        deadline = time.monotonic() + timeout
+
+        with metrics.timed("exec.host", {"server.name": name, "address": host}) as span:
+            try:
+                with metrics.timed("exec.connect"):
+                    client = pool.get(host)
+
+                for script in scripts:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out after %.0f seconds" % timeout)
+                    with metrics.timed("exec.script"):
+                        status = run_script(
+                            client, script, remaining, sudo, stdout, stderr,
+                        )
+                    if status != 0:
+                        outcome = "exited with status %d" % status
+                        break
+                else:
+                    outcome = "ok"
+            except Exception as e:
+                outcome = "failed: %s" % (str(e) or type(e).__name__)
+
+            span.set_attribute("outcome", outcome)
+
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            name: executor.submit(run_on_host, name, host)
+            for name, host in hosts.items()
+        }
+
+    return {name: future.result() for name, future in futures.items()}
+
+
+def execute(config):
+    """Run one or more scripts on every server (or on the servers provided in the
+    command-line arguments) over SSH, and print the outcome on each server.
+
+    Args:
+        config (dict): The parsed configuration.
+    """
+    args = parse_args()
+
+    try:
+        import paramiko  # noqa: F401
+    except ImportError:
+        sys.stderr.write(
+            "The exec mode requires paramiko (pip install install-party[exec]).\n"
+        )
+        sys.exit(1)
+
+    from tabulate import tabulate
+
+    scripts = []
+    for path in args.script or []:
+        with open(path) as f:
+            scripts.append(f.read())
+    if args.command:
+        scripts.append(args.command)
+
+    hosts = get_hosts(config, args.server)
+    if not hosts:
+        print("No server to run the script on.")
+        return
+
+    # paramiko logs every connection at the INFO level, which would drown the scripts'
+    # output.
+    logging.getLogger("paramiko").setLevel(logging.WARNING)
+
+    pool = ConnectionPool(
+        config["instances"]["user"],
+        config["instances"]["password"],
+        args.port,
+        transport.get_timeout(),
+    )
+    try:
+        outcomes = run_on_hosts(
+            hosts, scripts, pool, args.concurrency, args.timeout, args.sudo,
+        )
+    finally:
+        pool.close()
+
+    print()
+    print(tabulate(
+        sorted(outcomes.items()), headers=["Name", "Outcome"], tablefmt="psql",
+    ))
+
+    if any(outcome != "ok" for outcome in outcomes.values()):
+        sys.exit(1)
+
+
+def get_hosts(config, names: Optional[List[str]] = None) -> Dict[str, str]:
+    """Get the addresses of the servers which have both an instance and a DNS record.
+
+    Args:
+        config (dict): The parsed configuration.
+        names (list): The names of the servers to get the addresses of. If None, get
+            the addresses of every server.
+
+    Returns:
+        The addresses of the servers, associated with their names.
+    """
+    entries_dict = get_list(config)
+    complete_entries, _, _ = sort_entries(entries_dict)
+
+    hosts = {
+        entry_id: ip_address
+        for entry_id, _, _, status, ip_address in complete_entries
+        if status == "ACTIVE" and ip_address
+    }
+
+    if names is None:
+        return hosts
+
+    unknown = set(names).difference(hosts)
+    if unknown:
+        logger.warning(
+            "Skipping unknown or inactive server(s): %s", ", ".join(sorted(unknown)),
+        )
+
+    return {name: hosts[name] for name in names if name in hosts}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="install_party exec",
+        description="Run a script on existing servers over SSH.",
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Increases the verbosity."
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        "-s", "--script",
+        action="append",
+        metavar="PATH",
+        help="Path to a Bash script to run on the servers. Can be used several times, in"
+             " which case the scripts are run one after the other, and the following"
+             " ones are skipped on a server where one failed.",
+    )
+    group.add_argument(
+        "-e", "--command",
+        help="A Bash command to run on the servers.",
+    )
+    parser.add_argument(
+        "--server",
+        action="append",
+        metavar="NAME",
+        help="Only run the script on the provided server(s) (use it once per name)."
+             " Defaults to every server that has both an instance and a DNS record.",
+    )
+    parser.add_argument(
+        "--sudo",
+        action="store_true",
+        help="Run the script as root.",
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=10,
+        help="Maximum number of servers to run the script on at the same time. Defaults"
+             " to 10.",
+    )
+    parser.add_argument(
+        "-t", "--timeout",
+        type=float,
+        default=600,
+        help="Maximum number of seconds the script can run for on each server. Defaults"
+             " to 600.",
+    )
+    parser.add_argument(
+        "-p", "--port",
+        type=int,
+        default=22,
+        help="Port the servers' SSH daemon listens on. Defaults to 22.",
+    )
+
+    args = parser.parse_args()
+
+    if args.verbose:
+        logging.getLogger("install_party").setLevel(logging.DEBUG)
+
+    return args
@@ -1,30 +1,77 @@
 #!/bin/bash
 
-# Change the SSH auth rules to only allow authentication with password.
-sed -i "s/#PubkeyAuthentication yes/PubkeyAuthentication no/" /etc/ssh/sshd_config
-sed -i "s/PasswordAuthentication no/PasswordAuthentication yes/" /etc/ssh/sshd_config
+# Print a machine-readable timing marker to the console log (and to a log file on the
+# host), so the time spent in each phase can be measured. Markers look like:
+#   INSTALL_PARTY_PHASE phase=riot event=done ts_ms=1571234567890 duration_ms=5432
+# where event is one of start, done, skipped or failed.
+marker() {{
+	echo "INSTALL_PARTY_PHASE phase=$1 event=$2 ts_ms=$(date +%s%3N)${{3:+ duration_ms=$3}}" \
+		| tee -a /var/log/install_party_phases.log
+}}
 
-# Restart the SSH daemon to apply.
-systemctl restart sshd
+# Run a phase, i.e. a command, surrounded by timing markers. The phase is skipped if
+# the check (a shell condition, evaluated beforehand) succeeds, which makes running the
+# script again only perform the steps that haven't been done yet.
+# Usage: run_phase NAME CHECK COMMAND [ARGS...]
+run_phase() {{
+	local name=$1 check=$2 start code
+	shift 2
 
-# Create the user if it doesn't exist.
-id -u {user} > /dev/null 2>&1
-if [ "$?" != "0" ]; then
-	useradd {user} -m -s /bin/bash
-fi
+	if [ -n "$check" ] && eval "$check"; then
+		marker "$name" skipped
+		return 0
+	fi
+
+	start=$(date +%s%3N)
+	marker "$name" start
+	if "$@"; then
+		marker "$name" done $(( $(date +%s%3N) - start ))
+	else
+		code=$?
+		marker "$name" failed $(( $(date +%s%3N) - start ))
+		return $code
+	fi
+}}
+
+# Download and extract Riot.
+fetch_riot() {{
+	mkdir -p /var/www
+	curl -fsSL -o /tmp/riot-{riot_version}.tar.gz "https://github.com/vector-im/riot-web/releases/download/{riot_version}/riot-{riot_version}.tar.gz" \
+		&& tar xzf /tmp/riot-{riot_version}.tar.gz -C /var/www \
+		&& rm -f /tmp/riot-{riot_version}.tar.gz
+}}
 
-# Set the password for the user.
-echo "{user}:{password}" | chpasswd
-echo "{user} ALL=(ALL) NOPASSWD:ALL" >> /etc/sudoers
+# Install Caddy.
+fetch_caddy() {{
+	curl -fsSL https://getcaddy.com | bash -s personal
+}}
+
+# Download the SystemD service for Caddy. Download to a temporary file first so an
+# interrupted download doesn't look like a finished one.
+fetch_caddy_unit() {{
+	curl -fsSL -o /etc/systemd/system/caddy.service.part "https://raw.githubusercontent.com/caddyserver/caddy/master/dist/init/linux-systemd/caddy.service" \
+		&& mv /etc/systemd/system/caddy.service.part /etc/systemd/system/caddy.service
+}}
+
+# Change the SSH auth rules to only allow authentication with password, and restart
+# the SSH daemon to apply.
+configure_ssh() {{
+	sed -i "s/#PubkeyAuthentication yes/PubkeyAuthentication no/" /etc/ssh/sshd_config
+	sed -i "s/PasswordAuthentication no/PasswordAuthentication yes/" /etc/ssh/sshd_config
+	systemctl restart sshd
+}}
 
-# Install Riot.
-mkdir -p /var/www
-cd /var/www
-curl -LO "https://github.com/vector-im/riot-web/releases/download/{riot_version}/riot-{riot_version}.tar.gz"
-tar xvf riot-{riot_version}.tar.gz
+# Create the user if it doesn't exist, and set its password.
+configure_user() {{
+	id -u {user} > /dev/null 2>&1 || useradd {user} -m -s /bin/bash
+	echo "{user}:{password}" | chpasswd
+	grep -qxF "{user} ALL=(ALL) NOPASSWD:ALL" /etc/sudoers \
+		|| echo "{user} ALL=(ALL) NOPASSWD:ALL" >> /etc/sudoers
+}}
 
 # Configure Riot.
-cat > riot-{riot_version}/config.json <<EOF
+configure_riot() {{
+	cat > /var/www/riot-{riot_version}/config.json <<EOF
 {{
   "default_server_config": {{
     "m.homeserver": {{
@@ -34,29 +81,59 @@ cat > riot-{riot_version}/config.json <<EOF
   }}
 }}
 EOF
+}}
 
-# Install Caddy.
-curl https://getcaddy.com | bash -s personal
-
-mkdir /etc/ssl/caddy
-mkdir /etc/caddy
+# Configure and start Caddy.
+configure_caddy() {{
+	mkdir -p /etc/ssl/caddy /etc/caddy
 
-chown -R www-data:www-data /etc/ssl/caddy
-chown -R www-data:www-data /etc/caddy
+	chown -R www-data:www-data /etc/ssl/caddy
+	chown -R www-data:www-data /etc/caddy
 
-# Configure Caddy.
-cat > /etc/caddy/Caddyfile <<EOF
+	cat > /etc/caddy/Caddyfile <<EOF
 {expected_domain} {{
   root /var/www/riot-{riot_version}
   proxy /.well-known 127.0.0.1:8888
 }}
 EOF
 
-# Create a SystemD service for Caddy.
-curl "https://raw.githubusercontent.com/caddyserver/caddy/master/dist/init/linux-systemd/caddy.service" > /etc/systemd/system/caddy.service
+	systemctl daemon-reload
+	systemctl restart caddy
+}}
+
+TOTAL_START=$(date +%s%3N)
+marker total start
 
-# Start Caddy.
-systemctl start caddy
+# The downloads are network-bound and independent from each other, so run them in the
+# background while the host is being configured.
+run_phase riot "[ -f /var/www/riot-{riot_version}/index.html ]" fetch_riot &
+RIOT_PID=$!
+run_phase caddy "command -v caddy > /dev/null" fetch_caddy &
+CADDY_PID=$!
+run_phase caddy_unit "[ -f /etc/systemd/system/caddy.service ]" fetch_caddy_unit &
+CADDY_UNIT_PID=$!
+
+run_phase ssh "" configure_ssh
+run_phase user "" configure_user
+
+# Wait for the downloads to finish before configuring what they installed.
+FAILED=0
+wait $RIOT_PID || FAILED=1
+wait $CADDY_PID || FAILED=1
+wait $CADDY_UNIT_PID || FAILED=1
+
+run_phase riot_config "" configure_riot || FAILED=1
+run_phase caddy_config "" configure_caddy || FAILED=1
 
 # Run any additional script that may be provided.
+post_install() {{
+	:
 {post_install_script}
+}}
+run_phase post_install "" post_install || FAILED=1
+
+if [ "$FAILED" = "0" ]; then
+	marker total done $(( $(date +%s%3N) - TOTAL_START ))
+else
+	marker total failed $(( $(date +%s%3N) - TOTAL_START ))
+fi
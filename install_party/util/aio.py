@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Iterable, List
+
+from install_party.util import tracing
+
+
+def run(coroutine: Awaitable):
+    """Run a coroutine to completion in a new event loop and return its result.
+
+    Unlike asyncio.run, this works on Python 3.6, and from any thread (e.g. from the
+    daemon's request handlers).
+
+    Args:
+        coroutine (Awaitable): The coroutine to run.
+
+    Returns:
+        The result of the coroutine.
+    """
+    # asyncio takes a while to import, so only import it when it's needed rather than
+    # slowing down the start of every mode.
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+async def gather_bounded(coroutines: Iterable[Awaitable], limit: int) -> List:
+    """Run the provided coroutines concurrently, with at most a given number of them
+    in flight at the same time.
+
+    Args:
+        coroutines (Iterable): The coroutines to run.
+        limit (int): The maximum number of coroutines to run at the same time.
+
+    Returns:
+        The results of the coroutines, in the same order. If a coroutine raised an
+        exception, the exception is returned in place of its result.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(
+        *(bounded(coroutine) for coroutine in coroutines), return_exceptions=True,
+    )
+
+
+class Executor:
+    def __init__(self, max_workers: int):
+        """Runs blocking functions in a pool of threads so they can be awaited without
+        blocking the event loop. Used to adapt the synchronous providers' clients to
+        the asynchronous interfaces.
+
+        Args:
+            max_workers (int): The maximum number of functions to run at the same time.
+        """
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def run(self, func: Callable, *args):
+        """Run a blocking function in the pool and wait for its result.
+
+        Args:
+            func (Callable): The function to run.
+            *args: The arguments to call the function with.
+
+        Returns:
+            The result of the function.
+        """
+        import asyncio
+
+        # Keep the spans the function starts nested in the current one.
+        return await asyncio.get_event_loop().run_in_executor(
+            self.pool, tracing.propagate(func), *args,
+        )
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
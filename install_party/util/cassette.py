@@ -0,0 +1,343 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from install_party.dns.dns_provider_client import DNSProviderClient, DNSRecord
+from install_party.instances.instances_provider_client import (
+    Instance,
+    InstancesProviderClient,
+    Limits,
+)
+from install_party.util import errors
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteWriter:
+    def __init__(self, path: str):
+        """Appends interactions with the providers' APIs to a cassette file, i.e. a
+        file containing one JSON object per line, each object describing a call to a
+        provider's API, its result and how long it took.
+
+        Args:
+            path (str): The path of the cassette file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, interaction: dict):
+        """Append an interaction to the cassette.
+
+        Args:
+            interaction (dict): The interaction to append.
+        """
+        line = json.dumps(interaction, sort_keys=True)
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+_writers_lock = threading.Lock()
+_writers: Dict[str, CassetteWriter] = {}
+
+
+def get_writer(path: str) -> CassetteWriter:
+    """Retrieve the writer for the cassette at the provided path, so that every client
+    recording to the same cassette shares the same lock.
+
+    Args:
+        path (str): The path of the cassette file.
+
+    Returns:
+        The writer for this cassette.
+    """
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = CassetteWriter(path)
+        return _writers[path]
+
+
+def load_interactions(path: str, provider: str) -> List[dict]:
+    """Load the interactions recorded in a cassette for a given type of provider.
+
+    Args:
+        path (str): The path of the cassette file.
+        provider (str): The type of provider to load the interactions of, either
+            "instances" or "dns".
+
+    Returns:
+        The interactions, in the order they were recorded.
+
+    Raises:
+        CassetteError: The cassette couldn't be read.
+    """
+    try:
+        with open(path) as f:
+            interactions = [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError) as e:
+        raise errors.CassetteError("Could not read cassette %s: %s" % (path, e))
+
+    return [i for i in interactions if i["provider"] == provider]
+
+
+class Recorder:
+    def __init__(self, provider: str, writer: CassetteWriter):
+        """Performs calls to a provider's API and records them to a cassette.
+
+        Args:
+            provider (str): The type of provider, either "instances" or "dns".
+            writer (CassetteWriter): The writer for the cassette to record to.
+        """
+        self.provider = provider
+        self.writer = writer
+
+    def call(self, method: str, args: dict, func: Callable, serialise: Callable):
+        """Call the provided function and record the call, along with its result (or
+        the error it raised) and its duration.
+
+        Args:
+            method (str): The name of the method being called.
+            args (dict): The arguments given to the method, to record.
+            func (callable): The function performing the actual call.
+            serialise (callable): A function turning the function's result into
+                something that can be serialised to JSON.
+
+        Returns:
+            The result of the call.
+        """
+        interaction = {
+            "provider": self.provider,
+            "method": method,
+            "args": args,
+            "timestamp": time.time(),
+        }
+
+        start = time.perf_counter()
+        try:
+            result = func()
+            interaction["result"] = serialise(result)
+            return result
+        except Exception as e:
+            interaction["error"] = {"type": type(e).__name__, "message": str(e)}
+            raise
+        finally:
+            interaction["duration"] = time.perf_counter() - start
+            self.writer.write(interaction)
+
+
+class RecordingInstancesProviderClient(InstancesProviderClient):
+    def __init__(self, client: InstancesProviderClient, writer: CassetteWriter):
+        """Wraps an instances provider's client to record every call made to it.
+
+        Args:
+            client (InstancesProviderClient): The client to wrap.
+            writer (CassetteWriter): The writer for the cassette to record to.
+        """
+        self.client = client
+        self.recorder = Recorder("instances", writer)
+        self.supports_address_reservation = client.supports_address_reservation
+
+    def create_instance(self, name: str, post_creation_script: str) -> Instance:
+        # Only record the length of the script, because it contains the password of
+        # the attendees' user.
+        return self.recorder.call(
+            "create_instance",
+            {"name": name, "post_creation_script_length": len(post_creation_script)},
+            lambda: self.client.create_instance(name, post_creation_script),
+            lambda instance: instance.to_dict(),
+        )
+
+    def get_instances(self, namespace: str) -> List[Instance]:
+        return self.recorder.call(
+            "get_instances",
+            {"namespace": namespace},
+            lambda: self.client.get_instances(namespace),
+            lambda instances: [instance.to_dict() for instance in instances],
+        )
+
+    def delete_instance(self, instance: Instance):
+        return self.recorder.call(
+            "delete_instance",
+            {"instance": instance.to_dict()},
+            lambda: self.client.delete_instance(instance),
+            lambda _: None,
+        )
+
+    def commit(self):
+        return self.recorder.call(
+            "commit", {}, self.client.commit, lambda _: None,
+        )
+
+    def get_limits(self) -> Optional[Limits]:
+        return self.recorder.call(
+            "get_limits",
+            {},
+            self.client.get_limits,
+            lambda limits: limits.to_dict() if limits else None,
+        )
+
+    def reserve_addresses(self, count: int) -> List[str]:
+        return self.recorder.call(
+            "reserve_addresses",
+            {"count": count},
+            lambda: self.client.reserve_addresses(count),
+            lambda addresses: addresses,
+        )
+
+    def associate_address(self, instance: Instance, ip_address: str) -> Instance:
+        return self.recorder.call(
+            "associate_address",
+            {"instance": instance.to_dict(), "ip_address": ip_address},
+            lambda: self.client.associate_address(instance, ip_address),
+            lambda instance: instance.to_dict(),
+        )
+
+    def release_address(self, ip_address: str):
+        return self.recorder.call(
+            "release_address",
+            {"ip_address": ip_address},
+            lambda: self.client.release_address(ip_address),
+            lambda _: None,
+        )
+
+
+class RecordingDNSProviderClient(DNSProviderClient):
+    def __init__(self, client: DNSProviderClient, writer: CassetteWriter):
+        """Wraps a DNS provider's client to record every call made to it.
+
+        Args:
+            client (DNSProviderClient): The client to wrap.
+            writer (CassetteWriter): The writer for the cassette to record to.
+        """
+        self.client = client
+        self.recorder = Recorder("dns", writer)
+
+    def create_sub_domain(self, record_name: str, target: str, zone: str) -> DNSRecord:
+        return self.recorder.call(
+            "create_sub_domain",
+            {"record_name": record_name, "target": target, "zone": zone},
+            lambda: self.client.create_sub_domain(record_name, target, zone),
+            lambda record: record.to_dict(),
+        )
+
+    def get_sub_domains(self, namespace: str, zone: str) -> List[DNSRecord]:
+        return self.recorder.call(
+            "get_sub_domains",
+            {"namespace": namespace, "zone": zone},
+            lambda: self.client.get_sub_domains(namespace, zone),
+            lambda records: [record.to_dict() for record in records],
+        )
+
+    def delete_sub_domain(self, record: DNSRecord):
+        return self.recorder.call(
+            "delete_sub_domain",
+            {"record": record.to_dict()},
+            lambda: self.client.delete_sub_domain(record),
+            lambda _: None,
+        )
+
+    def commit(self, zone: str):
+        return self.recorder.call(
+            "commit",
+            {"zone": zone},
+            lambda: self.client.commit(zone),
+            lambda _: None,
+        )
+
+
+class Player:
+    def __init__(self, provider: str, args: dict):
+        """Replays the interactions recorded in a cassette for a given type of provider.
+
+        Calls are matched with the recorded interactions for the same method, in the
+        order they were recorded, preferring interactions which arguments match exactly.
+        Once every interaction for a method has been replayed, the last one is replayed
+        again.
+
+        Args:
+            provider (str): The type of provider, either "instances" or "dns".
+            args (dict): The arguments of the replay provider, from the configuration.
+                The supported arguments are:
+                    cassette: The path of the cassette file. Required.
+                    speed: How fast to replay the interactions compared to how long
+                        they took when they were recorded, e.g. 1 replays them at the
+                        recorded speed, 2 twice as fast. 0 replays them without any
+                        delay. Defaults to 0.
+        """
+        self.speed = float(args.get("speed", 0))
+        self.lock = threading.Lock()
+        self.pending: Dict[str, List[dict]] = {}
+        self.last: Dict[str, dict] = {}
+
+        for interaction in load_interactions(args["cassette"], provider):
+            self.pending.setdefault(interaction["method"], []).append(interaction)
+
+    def replay(self, method: str, args: dict):
+        """Replay the interaction matching a call.
+
+        Args:
+            method (str): The name of the method being called.
+            args (dict): The arguments given to the method.
+
+        Returns:
+            The recorded (serialised) result of the call.
+
+        Raises:
+            CassetteError: No interaction has been recorded for this method.
+            Exception: The error recorded for this interaction.
+        """
+        with self.lock:
+            pending = self.pending.get(method, [])
+            matching = [i for i in pending if i["args"] == args]
+            if matching:
+                interaction = matching[0]
+            elif pending:
+                interaction = pending[0]
+            elif method in self.last:
+                interaction = self.last[method]
+            else:
+                raise errors.CassetteError(
+                    "No interaction recorded for method %s" % method
+                )
+
+            if interaction in pending:
+                pending.remove(interaction)
+            self.last[method] = interaction
+
+        if self.speed > 0:
+            time.sleep(interaction["duration"] / self.speed)
+
+        if "error" in interaction:
+            # Raise an error of the same type as the one which was recorded if it's one
+            # of ours, so the code calling the provider can handle it the same way.
+            error_class = getattr(
+                errors, interaction["error"]["type"], errors.ReplayedProviderError,
+            )
+            raise error_class(interaction["error"]["message"])
+
+        return interaction["result"]
+
+
+_players_lock = threading.Lock()
+_players: Dict[tuple, Player] = {}
+
+
+def get_player(provider: str, args: dict) -> Player:
+    """Retrieve the player for the cassette and type of provider described by the
+    provided arguments, so that every client replaying the same cassette makes progress
+    through it rather than starting over.
+
+    Args:
+        provider (str): The type of provider, either "instances" or "dns".
+        args (dict): The arguments of the replay provider, see Player.
+
+    Returns:
+        The player.
+    """
+    key = (provider, args["cassette"])
+    with _players_lock:
+        if key not in _players:
+            _players[key] = Player(provider, args)
+        return _players[key]
@@ -3,6 +3,32 @@ from install_party.instances.instances_provider_client import Instance
 
 
 class Entry:
+    # Use slots rather than a per-object dict, since large inventories can hold
+    # thousands of entries.
+    __slots__ = ("instance", "record")
+
     def __init__(self, instance: Instance = None, record: DNSRecord = None):
         self.instance = instance
         self.record = record
+
+    def to_dict(self) -> dict:
+        """Returns: The entry as a dict that can be serialised to JSON."""
+        return {
+            "instance": self.instance.to_dict() if self.instance else None,
+            "record": self.record.to_dict() if self.record else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Entry":
+        """Build an entry from a dict generated by to_dict.
+
+        Args:
+            d (dict): The dict to build the entry from.
+
+        Returns:
+            The entry as an Entry object.
+        """
+        return cls(
+            instance=Instance.from_dict(d["instance"]) if d["instance"] else None,
+            record=DNSRecord.from_dict(d["record"]) if d["record"] else None,
+        )
@@ -8,3 +8,39 @@ class UnknownProviderError(Exception):
 
 class ConnectivityCheckError(Exception):
     pass
+
+
+class SimulatedProviderError(Exception):
+    pass
+
+
+class CassetteError(Exception):
+    pass
+
+
+class ReplayedProviderError(Exception):
+    pass
+
+
+class UnknownInstanceError(Exception):
+    pass
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class DNSUpdateError(Exception):
+    pass
+
+
+class InvalidNameError(Exception):
+    pass
+
+
+class NameCollisionError(Exception):
+    pass
+
+
+class UnsupportedListingError(Exception):
+    pass
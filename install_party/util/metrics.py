@@ -0,0 +1,209 @@
+import contextlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from install_party.util import tracing
+
+logger = logging.getLogger(__name__)
+
+# Durations (in seconds) recorded for each phase, and number of calls performed against
+# each provider API endpoint, since the start of the run. Phases and endpoints can be
+# recorded from several threads, hence the lock.
+_lock = threading.Lock()
+_durations: Dict[str, List[float]] = defaultdict(list)
+_calls: Dict[str, int] = defaultdict(int)
+
+
+def record(phase: str, duration: float):
+    """Record the duration of a phase.
+
+    Args:
+        phase (str): The name of the phase.
+        duration (float): How long the phase took, in seconds.
+    """
+    with _lock:
+        _durations[phase].append(duration)
+
+
+@contextlib.contextmanager
+def timed(phase: str, attributes: Optional[dict] = None):
+    """Context manager recording the time spent in its body as the duration of the
+    provided phase. The duration is recorded even if the body raises an exception. If
+    tracing is enabled, the body is also traced as a span named after the phase.
+
+    Args:
+        phase (str): The name of the phase.
+        attributes (dict): Attributes describing the span, if any.
+
+    Returns:
+        The span, see tracing.span.
+    """
+    start = time.perf_counter()
+    try:
+        with tracing.span(phase, attributes) as span:
+            yield span
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def count_call(endpoint: str):
+    """Count a call to a provider's API.
+
+    Args:
+        endpoint (str): The name of the endpoint that was called, prefixed with the name
+            of the provider (e.g. "nova.servers.list").
+    """
+    with _lock:
+        _calls[endpoint] += 1
+
+
+def get_calls() -> Dict[str, int]:
+    """Returns: A copy of the number of calls performed against each endpoint."""
+    with _lock:
+        return dict(_calls)
+
+
+def reset():
+    """Forget about every duration and call recorded so far."""
+    with _lock:
+        _durations.clear()
+        _calls.clear()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Compute a percentile of the provided values using the nearest-rank method.
+
+    Args:
+        values (list): The values to compute the percentile of. Must not be empty.
+        pct (float): The percentile to compute, between 0 and 100.
+
+    Returns:
+        The value at the requested percentile.
+    """
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarise() -> Dict[str, dict]:
+    """Compute the count, sum, p50, p95 and max of the durations recorded for each
+    phase.
+
+    Returns:
+        A dict associating each phase's name with a dict containing its statistics.
+    """
+    with _lock:
+        durations = {phase: list(values) for phase, values in _durations.items()}
+
+    summary = {}
+    for phase, values in sorted(durations.items()):
+        summary[phase] = {
+            "count": len(values),
+            "sum": sum(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": max(values),
+        }
+
+    return summary
+
+
+def summary_rows() -> List[list]:
+    """Returns: The summary of the recorded phases, as rows that can be directly fed to
+    tabulate."""
+    return [
+        [phase, stats["count"], stats["p50"], stats["p95"], stats["max"]]
+        for phase, stats in summarise().items()
+    ]
+
+
+def write_json(path: str):
+    """Write the summary of the recorded phases along with the API call counts to a
+    JSON file.
+
+    Args:
+        path (str): The path of the file to write.
+    """
+    content = json.dumps(
+        {
+            "timestamp": time.time(),
+            "phases": summarise(),
+            "calls": get_calls(),
+        },
+        indent=2,
+        sort_keys=True,
+    )
+    _write_atomically(path, content)
+
+
+def write_prometheus(path: str):
+    """Write the summary of the recorded phases along with the API call counts to a
+    file using Prometheus' text-based exposition format, e.g. to be picked up by the
+    node exporter's textfile collector.
+
+    Args:
+        path (str): The path of the file to write.
+    """
+    lines = [
+        "# HELP install_party_phase_duration_seconds Time spent in each phase.",
+        "# TYPE install_party_phase_duration_seconds summary",
+    ]
+    summary = summarise()
+    for phase, stats in summary.items():
+        for quantile in ("p50", "p95"):
+            lines.append(
+                'install_party_phase_duration_seconds{phase="%s",quantile="%s"} %f'
+                % (phase, "0.%s" % quantile[1:], stats[quantile])
+            )
+        lines.append(
+            'install_party_phase_duration_seconds_sum{phase="%s"} %f'
+            % (phase, stats["sum"])
+        )
+        lines.append(
+            'install_party_phase_duration_seconds_count{phase="%s"} %d'
+            % (phase, stats["count"])
+        )
+
+    lines += [
+        "# HELP install_party_phase_duration_seconds_max Longest run of each phase.",
+        "# TYPE install_party_phase_duration_seconds_max gauge",
+    ]
+    for phase, stats in summary.items():
+        lines.append(
+            'install_party_phase_duration_seconds_max{phase="%s"} %f'
+            % (phase, stats["max"])
+        )
+
+    lines += [
+        "# HELP install_party_provider_api_calls_total Calls to the providers' APIs.",
+        "# TYPE install_party_provider_api_calls_total counter",
+    ]
+    for endpoint, count in sorted(get_calls().items()):
+        lines.append(
+            'install_party_provider_api_calls_total{endpoint="%s"} %d'
+            % (endpoint, count)
+        )
+
+    _write_atomically(path, "\n".join(lines) + "\n")
+
+
+def _write_atomically(path: str, content: str):
+    """Write the provided content to a temporary file and then move it to the provided
+    path, so that readers (e.g. the node exporter) never see a partially written file.
+
+    Args:
+        path (str): The path of the file to write.
+        content (str): The content to write.
+    """
+    tmp_path = "%s.tmp" % path
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+    logger.debug("Wrote metrics to %s", path)
@@ -0,0 +1,276 @@
+import contextlib
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+# The kinds of profilers that can be used.
+PROFILERS = ("cprofile", "wall")
+
+# Categories of code, associated with the path segments identifying the modules that
+# belong to them. Anything that doesn't belong to one of these categories is
+# categorised as "other" (e.g. the standard library).
+CATEGORIES = (
+    ("novaclient", ("/novaclient/", "/keystoneauth1/", "/keystoneclient/")),
+    ("ovh", ("/ovh/",)),
+    ("requests", ("/requests/", "/urllib3/")),
+    ("install_party", ("/install_party/",)),
+)
+
+# The categories which correspond to code from providers' SDKs, i.e. time spent waiting
+# on remote services rather than running our own code.
+SDK_CATEGORIES = ("novaclient", "ovh", "requests")
+
+# How often the wall-clock profiler samples the threads' stacks, in seconds.
+SAMPLING_INTERVAL = 0.005
+
+# A function, as identified by pstats: (file name, line number, function name).
+FunctionKey = Tuple[str, int, str]
+
+
+def categorise(filename: str) -> str:
+    """Figure out which category a source file belongs to.
+
+    Args:
+        filename (str): The path to the source file.
+
+    Returns:
+        The name of the category.
+    """
+    filename = filename.replace(os.sep, "/")
+    for category, segments in CATEGORIES:
+        if any(segment in filename for segment in segments):
+            return category
+    return "other"
+
+
+class WallClockProfiler:
+    def __init__(self, interval: float = SAMPLING_INTERVAL):
+        """A sampling profiler which periodically looks at the stacks of every thread,
+        so that time spent blocked (e.g. waiting on a network response) is accounted for
+        the same way as time spent computing.
+
+        Args:
+            interval (float): How often to sample the stacks, in seconds.
+        """
+        self.interval = interval
+        self.samples = 0
+        # Number of samples in which each function was at the top of the stack, and in
+        # which it was anywhere in the stack.
+        self.self_samples: Dict[FunctionKey, int] = defaultdict(int)
+        self.total_samples: Dict[FunctionKey, int] = defaultdict(int)
+        self.callers: Dict[FunctionKey, Dict[FunctionKey, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        # Number of samples attributed to each category, see sample.
+        self.category_samples: Dict[str, int] = defaultdict(int)
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != self._thread.ident:
+                    self.sample(frame)
+
+    def sample(self, frame):
+        """Record a sample of a thread's stack.
+
+        The sample is attributed to the outermost SDK frame in the stack if there is
+        one, so that time spent in the standard library (e.g. in sockets) on behalf of a
+        provider's SDK is accounted to that SDK rather than to us.
+
+        Args:
+            frame (frame): The frame at the top of the stack.
+        """
+        self.samples += 1
+
+        seen = set()
+        category = None
+        callee = None
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+
+            if callee is None:
+                self.self_samples[key] += 1
+            else:
+                self.callers[callee][key] += 1
+
+            # Don't count recursive functions more than once per sample.
+            if key not in seen:
+                self.total_samples[key] += 1
+                seen.add(key)
+
+            frame_category = categorise(code.co_filename)
+            if frame_category in SDK_CATEGORIES:
+                category = frame_category
+            elif category is None and frame_category == "install_party":
+                category = frame_category
+
+            callee = key
+            frame = frame.f_back
+
+        self.category_samples[category or "other"] += 1
+
+    def create_stats(self) -> dict:
+        """Returns: The samples as a dict following the format used by pstats, with
+        sample counts converted to seconds."""
+        stats = {}
+        for key, total in self.total_samples.items():
+            self_time = self.self_samples.get(key, 0) * self.interval
+            callers = {
+                caller: (count, count, 0, count * self.interval)
+                for caller, count in self.callers.get(key, {}).items()
+            }
+            stats[key] = (total, total, self_time, total * self.interval, callers)
+        return stats
+
+    def dump_stats(self, path: str):
+        with open(path, "wb") as f:
+            marshal.dump(self.create_stats(), f)
+
+    def time_per_category(self) -> Dict[str, float]:
+        return {
+            category: samples * self.interval
+            for category, samples in self.category_samples.items()
+        }
+
+
+def cprofile_time_per_category(stats: pstats.Stats) -> Dict[str, float]:
+    """Compute the time spent in each category from deterministic profiling stats.
+
+    The time of a provider SDK is the cumulative time of its functions which have been
+    called from outside of any SDK, so that time spent in the standard library on behalf
+    of the SDK is accounted to it. The time of the other categories is the time spent in
+    their own functions.
+
+    Args:
+        stats (pstats.Stats): The stats to process.
+
+    Returns:
+        A dict associating each category with the time spent in it, in seconds.
+    """
+    times = defaultdict(float)
+    # Cumulative time of the calls into the SDKs, and time spent in the SDKs' own
+    # functions.
+    sdk_cumulative = 0.0
+    sdk_own = 0.0
+    for key, (_, _, self_time, cumulative, callers) in stats.stats.items():
+        category = categorise(key[0])
+        if category in SDK_CATEGORIES:
+            entry_time = sum(
+                caller_stats[3] for caller, caller_stats in callers.items()
+                if categorise(caller[0]) not in SDK_CATEGORIES
+            )
+            times[category] += entry_time
+            sdk_cumulative += entry_time
+            sdk_own += self_time
+        else:
+            times[category] += self_time
+
+    # Time accounted to SDKs includes the time spent in the standard library on their
+    # behalf, so remove it from the time accounted to the standard library.
+    times["other"] = max(times["other"] - (sdk_cumulative - sdk_own), 0)
+    return dict(times)
+
+
+def print_summary(stats: pstats.Stats, time_per_category: Dict[str, float], top: int):
+    """Print the functions in which the most time was spent, along with how the time
+    was split between our own code and the providers' SDKs.
+
+    Args:
+        stats (pstats.Stats): The profiling stats.
+        time_per_category (dict): The time spent in each category, in seconds.
+        top (int): The number of functions to print.
+    """
+    from tabulate import tabulate
+
+    hotspots = sorted(
+        stats.stats.items(), key=lambda item: item[1][2], reverse=True,
+    )[:top]
+
+    print("\nTOP %d HOTSPOTS (BY OWN TIME)" % top, file=sys.stderr)
+    print(tabulate(
+        [
+            [
+                "%s:%d(%s)" % (os.path.basename(key[0]), key[1], key[2]),
+                categorise(key[0]),
+                calls,
+                self_time,
+                cumulative,
+            ]
+            for key, (_, calls, self_time, cumulative, _) in hotspots
+        ],
+        headers=["Function", "Category", "Calls", "Own time (s)", "Cumulative (s)"],
+        tablefmt="psql",
+        floatfmt=".3f",
+    ), file=sys.stderr)
+
+    total = sum(time_per_category.values()) or 1
+    print("\nTIME PER CATEGORY", file=sys.stderr)
+    print(tabulate(
+        [
+            [
+                category,
+                "remote (SDK)" if category in SDK_CATEGORIES else "local",
+                seconds,
+                "%.1f%%" % (seconds / total * 100),
+            ]
+            for category, seconds in sorted(
+                time_per_category.items(), key=lambda item: item[1], reverse=True,
+            )
+        ],
+        headers=["Category", "Kind", "Time (s)", "Share"],
+        tablefmt="psql",
+        floatfmt=".3f",
+    ), file=sys.stderr)
+
+
+@contextlib.contextmanager
+def profile(kind: str, mode: str, top: int = 15):
+    """Profile the code running in the body of the context manager, then write the
+    stats to a pstats file named after the mode and print a summary of them.
+
+    Args:
+        kind (str): The kind of profiler to use, either "cprofile" (deterministic
+            profiling of the current thread) or "wall" (sampling of the wall-clock time
+            spent in every thread).
+        mode (str): The mode being profiled.
+        top (int): The number of hotspots to print in the summary.
+    """
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+    else:
+        profiler = WallClockProfiler()
+
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+        path = "install_party-%s-%s.pstats" % (mode, time.strftime("%Y%m%d-%H%M%S"))
+        profiler.dump_stats(path)
+
+        stats = pstats.Stats(path)
+        if kind == "cprofile":
+            time_per_category = cprofile_time_per_category(stats)
+        else:
+            time_per_category = profiler.time_per_category()
+
+        print_summary(stats, time_per_category, top)
+        print("\nProfiling stats written to %s" % path, file=sys.stderr)
@@ -0,0 +1,256 @@
+import ipaddress
+import random
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Set, Union
+
+from install_party.util import metrics
+from install_party.util.errors import SimulatedProviderError
+
+# The first address given to a simulated instance. Addresses are then allocated
+# sequentially.
+FIRST_ADDRESS = ipaddress.IPv4Address("10.0.0.1")
+
+
+class SimulatedInstance:
+    def __init__(self, instance_id: str, name: str, ip_address: str, active_at: float,
+                 ready_at: float, failed: bool):
+        """An instance living in a simulated cloud.
+
+        Args:
+            instance_id (str): The identifier of the instance.
+            name (str): The name of the instance.
+            ip_address (str): The IPv4 address of the instance.
+            active_at (float): The time (as returned by time.monotonic) at which the
+                instance has finished booting.
+            ready_at (float): The time at which the post-creation script will have
+                finished running on the instance.
+            failed (bool): Whether the instance will end up in the ERROR status rather
+                than ACTIVE.
+        """
+        self.instance_id = instance_id
+        self.name = name
+        self.ip_address = ip_address
+        self.active_at = active_at
+        self.ready_at = ready_at
+        self.failed = failed
+        self.deleted_at: Optional[float] = None
+
+    def status(self, now: float) -> str:
+        """Compute the status of the instance at the provided time.
+
+        Args:
+            now (float): The time to compute the status at.
+
+        Returns:
+            The status, following the naming used by OpenStack.
+        """
+        if self.deleted_at is not None:
+            return "DELETING"
+        if now < self.active_at:
+            return "BUILD"
+        if self.failed:
+            return "ERROR"
+        return "ACTIVE"
+
+
+class SimulatedRecord:
+    def __init__(self, record_id: str, sub_domain: str, target: str, zone: str):
+        """A DNS A record living in a simulated DNS zone.
+
+        Args:
+            record_id (str): The identifier of the record.
+            sub_domain (str): The sub-domain of the record.
+            target (str): The IPv4 address the record points to.
+            zone (str): The zone the record lives in.
+        """
+        self.record_id = record_id
+        self.sub_domain = sub_domain
+        self.target = target
+        self.zone = zone
+
+
+class SimulatedCloud:
+    def __init__(self):
+        """The state shared by the in-memory instances and DNS providers, so that
+        instances and records outlive the clients that created them, and the
+        connectivity check can resolve a domain name to an instance.
+        """
+        self.lock = threading.Lock()
+        self.instances: Dict[str, SimulatedInstance] = {}
+        self.records: Dict[str, SimulatedRecord] = {}
+        self.next_address = FIRST_ADDRESS
+        # Addresses reserved ahead of the creation of the instance they'll be
+        # associated with.
+        self.reserved: Set[str] = set()
+        self.apis: Dict[str, SimulatedAPI] = {}
+
+    def get_api(self, prefix: str, args: dict) -> "SimulatedAPI":
+        """Retrieve the simulated API with the provided prefix, creating it from the
+        provided arguments if it doesn't exist yet. The API is shared by all of the
+        clients using this cloud, so that rate limits and random failures apply across
+        clients.
+
+        Args:
+            prefix (str): The prefix of the API, see SimulatedAPI.
+            args (dict): The arguments of the provider, see SimulatedAPI.
+
+        Returns:
+            The simulated API.
+        """
+        with self.lock:
+            if prefix not in self.apis:
+                self.apis[prefix] = SimulatedAPI(prefix, args)
+            return self.apis[prefix]
+
+    def allocate_address(self) -> str:
+        """Returns: A new IPv4 address that isn't used by any other instance. Must be
+        called with the lock held."""
+        address = self.next_address
+        self.next_address += 1
+        return str(address)
+
+    def purge_deleted(self, now: float, delete_time: float):
+        """Forget about the instances which deletion has completed. Must be called with
+        the lock held.
+
+        Args:
+            now (float): The current time.
+            delete_time (float): How long a deletion takes to complete, in seconds.
+        """
+        for instance_id, instance in list(self.instances.items()):
+            if (
+                instance.deleted_at is not None
+                and now >= instance.deleted_at + delete_time
+            ):
+                del self.instances[instance_id]
+
+
+_clouds_lock = threading.Lock()
+_clouds: Dict[str, SimulatedCloud] = {}
+
+
+def get_cloud(name: str = "default") -> SimulatedCloud:
+    """Retrieve the simulated cloud with the provided name, creating it if it doesn't
+    exist yet.
+
+    Args:
+        name (str): The name of the cloud.
+
+    Returns:
+        The simulated cloud.
+    """
+    with _clouds_lock:
+        if name not in _clouds:
+            _clouds[name] = SimulatedCloud()
+        return _clouds[name]
+
+
+def is_ready(domain_name: str) -> bool:
+    """Check whether the server behind the provided domain name would answer an HTTP
+    request, i.e. whether an A record for that name exists and points to an active
+    instance which post-creation script has finished running. The record and the
+    instance can live in different clouds (e.g. if instances are sharded).
+
+    Args:
+        domain_name (str): The domain name to check.
+
+    Returns:
+        Whether the server is ready.
+    """
+    with _clouds_lock:
+        clouds = list(_clouds.values())
+
+    targets = set()
+    for cloud in clouds:
+        with cloud.lock:
+            targets.update(
+                record.target for record in cloud.records.values()
+                if "%s.%s" % (record.sub_domain, record.zone) == domain_name
+            )
+
+    now = time.monotonic()
+    for cloud in clouds:
+        with cloud.lock:
+            for instance in cloud.instances.values():
+                if (
+                    instance.ip_address in targets
+                    and instance.status(now) == "ACTIVE"
+                    and now >= instance.ready_at
+                ):
+                    return True
+
+    return False
+
+
+def reset_clouds():
+    """Forget about every simulated cloud, along with their instances and records."""
+    with _clouds_lock:
+        _clouds.clear()
+
+
+class SimulatedAPI:
+    def __init__(self, prefix: str, args: dict):
+        """Simulates the behaviour of a provider's API regarding latency, errors and
+        rate limiting.
+
+        Args:
+            prefix (str): The prefix to use when counting calls to the API (e.g.
+                "memory.instances").
+            args (dict): The arguments of the provider, from the configuration. The
+                supported arguments are:
+                    latency: How long each call takes, in seconds. Can also be a dict
+                        associating a method's name with its latency. Defaults to 0.
+                    error_rate: The probability (between 0 and 1) for a call to fail.
+                        Defaults to 0.
+                    rate_limit: The maximum number of calls per second. Calls beyond
+                        that rate are delayed. Defaults to 0 (no limit).
+                    seed: The seed to use for the random number generator, to make
+                        runs reproducible.
+        """
+        self.prefix = prefix
+        self.latency: Union[float, Dict[str, float]] = args.get("latency", 0)
+        self.error_rate = float(args.get("error_rate", 0))
+        self.rate_limit = float(args.get("rate_limit", 0))
+        self.random = random.Random(args.get("seed"))
+
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def call(self, method: str):
+        """Simulate a call to the provided method of the API: count it, wait for a slot
+        if the rate limit is reached, wait for the configured latency, and possibly
+        fail.
+
+        Args:
+            method (str): The name of the method being called.
+
+        Raises:
+            SimulatedProviderError: The call randomly failed.
+        """
+        metrics.count_call("%s.%s" % (self.prefix, method))
+
+        if self.rate_limit > 0:
+            with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + 1 / self.rate_limit
+            if slot > now:
+                time.sleep(slot - now)
+
+        if isinstance(self.latency, dict):
+            latency = float(self.latency.get(method, 0))
+        else:
+            latency = float(self.latency)
+        if latency > 0:
+            time.sleep(latency)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise SimulatedProviderError(
+                "Simulated failure of %s.%s" % (self.prefix, method)
+            )
+
+    def make_id(self) -> str:
+        """Returns: A new random identifier."""
+        return str(uuid.uuid4())
@@ -0,0 +1,256 @@
+import contextlib
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    import contextvars
+except ImportError:  # Python 3.6
+    contextvars = None
+
+from install_party import __version__
+
+logger = logging.getLogger(__name__)
+
+# Span kinds and status codes, as defined by OTLP.
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_ERROR = 2
+
+# The file traces are appended to, or None if tracing is disabled. Traces can be
+# written from several threads, hence the lock.
+_lock = threading.Lock()
+_file = None
+
+# IDs only need to be unique, not unpredictable, so don't pay for os.urandom.
+_random = random.Random()
+
+if hasattr(time, "time_ns"):
+    _now_ns = time.time_ns
+else:  # Python 3.6
+    def _now_ns() -> int:
+        return int(time.time() * 1e9)
+
+
+class _ThreadLocalVar:
+    """A minimal stand-in for contextvars.ContextVar on Python 3.6, which tracks the
+    current span per thread rather than per asyncio task."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def get(self):
+        return getattr(self.local, "value", None)
+
+    def set(self, value):
+        token = self.get()
+        self.local.value = value
+        return token
+
+    def reset(self, token):
+        self.local.value = token
+
+
+if contextvars is not None:
+    _current = contextvars.ContextVar("install_party_span", default=None)
+else:
+    _current = _ThreadLocalVar()
+
+
+class Span:
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent", "spans", "attributes", "start", "end",
+        "error",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Optional[dict]):
+        """A timed operation, part of a trace.
+
+        Args:
+            name (str): The name of the operation.
+            parent (Span): The span of the operation this one is part of, or None if
+                this span is the root of a new trace.
+            attributes (dict): Attributes describing the operation, if any.
+        """
+        self.name = name
+        self.parent = parent
+        if parent is None:
+            self.trace_id = "%032x" % _random.getrandbits(128)
+            # The finished spans of the trace, shared by every span in it.
+            self.spans: List[Span] = []
+        else:
+            self.trace_id = parent.trace_id
+            self.spans = parent.spans
+        self.span_id = "%016x" % _random.getrandbits(64)
+        self.attributes = dict(attributes) if attributes else {}
+        self.start = _now_ns()
+        self.end = 0
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value):
+        """Set an attribute describing the operation.
+
+        Args:
+            key (str): The name of the attribute.
+            value (str|int|float|bool): The value of the attribute.
+        """
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        """Returns: The span, in the format of OTLP's JSON encoding."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": _to_otlp_attributes(self.attributes),
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        if self.error is not None:
+            span["status"] = {"code": STATUS_CODE_ERROR, "message": self.error}
+        return span
+
+
+class _NoopSpan:
+    """The span handed out when tracing is disabled."""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def configure(config):
+    """Enable tracing if a file to write traces to is set in the configuration
+    ("trace_file" in the "general" section).
+
+    Args:
+        config (dict): The parsed configuration.
+    """
+    global _file
+
+    path = config["general"].get("trace_file")
+    if not path:
+        return
+
+    # Line-buffered, so every trace reaches the file as soon as it's finished.
+    _file = open(path, "a", buffering=1)
+    logger.debug("Writing traces to %s", path)
+
+
+@contextlib.contextmanager
+def span(name: str, attributes: Optional[dict] = None):
+    """Context manager tracing its body as a span, nested in the current span if there
+    is one, or as the root of a new trace otherwise. If the body raises an exception,
+    the span is marked as failed. The trace is written once its root span ends.
+
+    Args:
+        name (str): The name of the operation.
+        attributes (dict): Attributes describing the operation, if any.
+
+    Returns:
+        The span, so attributes can be added to it.
+    """
+    if _file is None:
+        yield _NOOP_SPAN
+        return
+
+    current = Span(name, _current.get(), attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = "%s: %s" % (type(e).__name__, e)
+        raise
+    finally:
+        _current.reset(token)
+        current.end = _now_ns()
+        current.spans.append(current)
+        if current.parent is None:
+            _write(current.spans)
+
+
+async def traced(name: str, awaitable: Awaitable, attributes: Optional[dict] = None):
+    """Await an awaitable in a span, see span.
+
+    Args:
+        name (str): The name of the operation.
+        awaitable (Awaitable): The awaitable to trace.
+        attributes (dict): Attributes describing the operation, if any.
+
+    Returns:
+        The result of the awaitable.
+    """
+    with span(name, attributes):
+        return await awaitable
+
+
+def propagate(func: Callable) -> Callable:
+    """Bind a function to the current span, so that spans started by the function when
+    it's called from another thread (e.g. in an executor) are nested in it.
+
+    Args:
+        func (Callable): The function to bind.
+
+    Returns:
+        The bound function.
+    """
+    if _file is None or contextvars is None:
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def _write(spans: List[Span]):
+    """Append a trace to the traces file, as a line of OTLP's JSON encoding (i.e. like
+    the OpenTelemetry collector's file exporter), which trace viewers can import.
+
+    Args:
+        spans (list): The spans of the trace.
+    """
+    line = json.dumps({
+        "resourceSpans": [{
+            "resource": {
+                "attributes": _to_otlp_attributes({
+                    "service.name": "install_party",
+                    "service.version": __version__,
+                }),
+            },
+            "scopeSpans": [{
+                "scope": {"name": "install_party"},
+                "spans": [s.to_otlp() for s in spans],
+            }],
+        }],
+    }, separators=(",", ":"))
+
+    with _lock:
+        _file.write(line + "\n")
+
+
+def _to_otlp_attributes(attributes: Dict[str, object]) -> List[dict]:
+    """Convert attributes to OTLP's JSON encoding.
+
+    Args:
+        attributes (dict): The attributes, associated with their name.
+
+    Returns:
+        The attributes, as a list of key/value objects.
+    """
+    converted = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        converted.append({"key": key, "value": encoded})
+    return converted
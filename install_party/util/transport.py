@@ -0,0 +1,121 @@
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# The status codes of responses which mean the request can be retried later.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# The settings used unless overridden in the "http" section of the general
+# configuration.
+DEFAULT_SETTINGS = {
+    # Number of seconds to wait for a connection to be established, or for the server
+    # to send data.
+    "timeout": 30,
+    # Number of times to retry an idempotent request that failed because of a
+    # connection error or a status code in RETRY_STATUSES.
+    "retries": 3,
+    # Factor of the exponential delay between two retries, in seconds.
+    "backoff_factor": 0.5,
+    # Maximum number of keep-alive connections to keep open to each host.
+    "pool_size": 10,
+}
+
+_lock = threading.Lock()
+_settings = dict(DEFAULT_SETTINGS)
+# The sessions that have been built, associated with whether they retry requests.
+_sessions: Dict[bool, "requests.Session"] = {}
+
+
+def configure(config):
+    """Set up the transport from the "http" section of the general configuration.
+    Must be called before any session is retrieved.
+
+    Args:
+        config (dict): The parsed configuration.
+    """
+    with _lock:
+        _settings.update(config["general"].get("http") or {})
+        _sessions.clear()
+
+
+def set_concurrency(concurrency: int):
+    """Make sure the sessions keep enough connections open for the provided number of
+    concurrent requests to each host, so that connections aren't thrown away and
+    re-established (along with their TLS handshake) when many requests are in flight.
+
+    Args:
+        concurrency (int): The number of requests that can be in flight at the same
+            time.
+    """
+    with _lock:
+        if concurrency <= _settings["pool_size"]:
+            return
+
+        _settings["pool_size"] = concurrency
+        for retry, session in _sessions.items():
+            _mount_adapters(session, retry)
+
+
+def get_timeout() -> float:
+    """Returns: The number of seconds to wait for a connection to be established, or for
+    the server to send data."""
+    return float(_settings["timeout"])
+
+
+def get_pool_size() -> int:
+    """Returns: The maximum number of keep-alive connections to keep open to each
+    host."""
+    return int(_settings["pool_size"])
+
+
+def get_session(retry: bool = True) -> "requests.Session":
+    """Retrieve the HTTP session shared by the connectivity check and the HTTP-based
+    providers, creating it if it doesn't exist yet. Its connections are kept alive and
+    reused across requests, and across threads.
+
+    Args:
+        retry (bool): Whether failed idempotent requests should be retried. Callers
+            already polling an endpoint (e.g. the connectivity check) don't need it.
+
+    Returns:
+        The session.
+    """
+    with _lock:
+        if retry not in _sessions:
+            # requests takes a while to import, so only import it when needed.
+            import requests
+
+            session = requests.Session()
+            _mount_adapters(session, retry)
+            _sessions[retry] = session
+
+        return _sessions[retry]
+
+
+def _mount_adapters(session: "requests.Session", retry: bool):
+    """Mount adapters configured according to the current settings on the session.
+    Must be called with the lock held.
+
+    Args:
+        session (requests.Session): The session to mount the adapters on.
+        retry (bool): Whether failed idempotent requests should be retried.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    max_retries = Retry(
+        total=int(_settings["retries"]) if retry else 0,
+        backoff_factor=float(_settings["backoff_factor"]),
+        status_forcelist=RETRY_STATUSES if retry else (),
+        raise_on_status=False,
+    )
+
+    adapter = HTTPAdapter(
+        pool_connections=int(_settings["pool_size"]),
+        pool_maxsize=int(_settings["pool_size"]),
+        max_retries=max_retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
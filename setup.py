@@ -36,6 +36,14 @@ setuptools.setup(
         "requests==2.31.0",
         "tabulate==0.8.5",
     ],
+    extras_require={
+        # Talk to OVH's API asynchronously when listing.
+        "async": ["aiohttp>=3.6", "yarl>=1.4"],
+        # Run scripts on the servers over SSH (exec mode).
+        "exec": ["paramiko>=2.4"],
+        # Talk to DNS servers using dynamic updates (rfc2136 DNS provider).
+        "rfc2136": ["dnspython>=2.0"],
+    },
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/babolivier/install-party",
@@ -0,0 +1,87 @@
+import math
+
+import pytest
+
+from install_party.dns import dns_provider
+from install_party.instances import instances_provider
+from install_party.util import simulation
+
+
+@pytest.fixture
+def config(request):
+    """A configuration using the in-memory providers, with a simulated cloud of its own
+    so tests don't see each other's servers.
+
+    Tests changing the configuration must do so before using the providers, since the
+    providers' clients are built from the configuration the first time they're needed,
+    and only forgotten once the test is done.
+    """
+    cloud = request.node.nodeid
+    yield {
+        "general": {
+            "namespace": "bench",
+            "riot_version": "v1.4.2",
+            "connectivity_check": "memory",
+            "connectivity_check_interval": 0.01,
+            "connectivity_check_timeout": 5,
+        },
+        "instances": {
+            "provider": "memory",
+            "user": "u",
+            "password": "p",
+            "args": {"cloud": cloud, "poll_interval": 0.01},
+        },
+        "dns": {
+            "zone": "example.com",
+            "provider": "memory",
+            "args": {"cloud": cloud},
+        },
+    }
+
+    instances_provider.clear_cache()
+    dns_provider.clear_cache()
+
+
+@pytest.fixture
+def cloud(config):
+    """The simulated cloud the providers of the configuration use."""
+    return simulation.get_cloud(config["instances"]["args"]["cloud"])
+
+
+@pytest.fixture
+def add_server(config, cloud):
+    """Create a server in the configured namespace directly through the providers.
+
+    Returns a function taking the name of the server, the status its instance must end
+    up in ("ACTIVE", "BUILD" or "ERROR", or None for no instance), whether to create its
+    DNS record, and the address the record must point to (defaults to the instance's),
+    and returning the instance and the record.
+    """
+    def add(name, status="ACTIVE", record=True, target=None):
+        instances_client = instances_provider.get_instances_provider_client(config)
+        dns_client = dns_provider.get_dns_provider_client(config)
+        namespace = config["general"]["namespace"]
+        zone = config["dns"]["zone"]
+
+        instance = None
+        if status is not None:
+            instance = instances_client.create_instance(
+                "%s-%s" % (namespace, name), "",
+            )
+            simulated = cloud.instances[instance.instance_id]
+            if status == "BUILD":
+                simulated.active_at = math.inf
+            elif status == "ERROR":
+                simulated.failed = True
+
+        dns_record = None
+        if record:
+            dns_record = dns_client.create_sub_domain(
+                "%s.%s" % (name, namespace),
+                target or (instance.ip_address if instance else "192.0.2.1"),
+                zone,
+            )
+
+        return instance, dns_record
+
+    return add
@@ -0,0 +1,94 @@
+import time
+
+from install_party.dns import dns_provider
+from install_party.eraser.delete import delete_entries, wait_for_teardown
+from install_party.instances import instances_provider
+from install_party.lister.list import get_list
+from install_party.util import errors
+
+
+def test_wait_for_teardown(config, add_server):
+    add_server("one")
+    add_server("two")
+
+    deleted_instances, deleted_records = delete_entries(get_list(config), config, False)
+    assert sorted(deleted_instances) == sorted(deleted_records) == ["one", "two"]
+
+    remaining_instances, remaining_records = wait_for_teardown(
+        deleted_instances, deleted_records, config, timeout=5, min_interval=0.01,
+    )
+
+    assert remaining_instances == {}
+    assert remaining_records == {}
+
+
+def test_wait_for_teardown_waits_for_slow_deletions(config, add_server):
+    config["instances"]["args"]["delete_time"] = 0.3
+    add_server("one")
+
+    deleted_instances, deleted_records = delete_entries(get_list(config), config, False)
+
+    start = time.monotonic()
+    remaining_instances, remaining_records = wait_for_teardown(
+        deleted_instances, deleted_records, config, timeout=5, min_interval=0.01,
+    )
+
+    assert time.monotonic() - start >= 0.3
+    assert remaining_instances == {}
+    assert remaining_records == {}
+
+
+def test_wait_for_teardown_reports_leftovers(config, add_server):
+    config["instances"]["args"]["delete_time"] = 60
+    add_server("one")
+
+    deleted_instances, deleted_records = delete_entries(get_list(config), config, False)
+
+    start = time.monotonic()
+    remaining_instances, remaining_records = wait_for_teardown(
+        deleted_instances,
+        deleted_records,
+        config,
+        timeout=0.2,
+        min_interval=0.01,
+        max_interval=0.05,
+    )
+
+    assert time.monotonic() - start < 2
+    assert list(remaining_instances) == ["one"]
+    # The latest version of the instance is reported.
+    assert remaining_instances["one"].status == "DELETING"
+    assert remaining_records == {}
+
+
+def test_wait_for_teardown_survives_listing_failures(config, add_server, monkeypatch):
+    config["instances"]["args"]["delete_time"] = 0.1
+    add_server("one")
+
+    deleted_instances, deleted_records = delete_entries(get_list(config), config, False)
+
+    # Make the first listing of each provider fail.
+    for client, method in (
+        (instances_provider.get_instances_provider_client(config), "get_instances"),
+        (dns_provider.get_dns_provider_client(config), "get_sub_domain_ids"),
+    ):
+        monkeypatch.setattr(client, method, fail_once(getattr(client, method)))
+
+    remaining_instances, remaining_records = wait_for_teardown(
+        deleted_instances, deleted_records, config, timeout=5, min_interval=0.01,
+    )
+
+    assert remaining_instances == {}
+    assert remaining_records == {}
+
+
+def fail_once(func):
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise errors.SimulatedProviderError("Simulated failure")
+        return func(*args, **kwargs)
+
+    return wrapper
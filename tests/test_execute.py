@@ -0,0 +1,287 @@
+import io
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+from install_party.runner.execute import (
+    ConnectionPool,
+    PrefixedWriter,
+    run_on_hosts,
+    run_script,
+)
+
+
+class StubChannel:
+    def __init__(self, chunks=(), exit_status=0, endless=False):
+        """A stand-in for a paramiko channel, replaying the output of a command.
+
+        Args:
+            chunks (iterable): The output of the command, as tuples of the stream
+                ("out" or "err") and the data.
+            exit_status (int): The exit status of the command.
+            endless (bool): Whether the command keeps writing to its standard output
+                forever once the chunks have been read.
+        """
+        self.chunks = list(chunks)
+        self.exit_status = exit_status
+        self.endless = endless
+        self.command = None
+        self.stdin = b""
+        self.closed = False
+        # A file descriptor that never becomes readable, for select.
+        self.read_fd, self.write_fd = os.pipe()
+
+    def exec_command(self, command):
+        self.command = command
+
+    def sendall(self, data):
+        self.stdin += data
+
+    def shutdown_write(self):
+        pass
+
+    def recv_ready(self):
+        return self.endless or bool(self.chunks) and self.chunks[0][0] == "out"
+
+    def recv(self, size):
+        if not self.chunks:
+            return b"line\n"
+        return self.chunks.pop(0)[1]
+
+    def recv_stderr_ready(self):
+        return bool(self.chunks) and self.chunks[0][0] == "err"
+
+    def recv_stderr(self, size):
+        return self.chunks.pop(0)[1]
+
+    def exit_status_ready(self):
+        return not self.chunks and self.exit_status is not None
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+    def fileno(self):
+        return self.read_fd
+
+    def close(self):
+        self.closed = True
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class StubClient:
+    def __init__(self, channel: StubChannel):
+        self.channel = channel
+
+    def get_transport(self):
+        return self
+
+    def open_session(self, timeout=None):
+        return self.channel
+
+
+def make_writers():
+    lock = threading.Lock()
+    out, err = io.StringIO(), io.StringIO()
+    return out, err, PrefixedWriter("srv", out, lock), PrefixedWriter("srv", err, lock)
+
+
+def test_run_script_streams_output():
+    channel = StubChannel(
+        [("out", b"hel"), ("out", b"lo\nwor"), ("err", b"oops\n"), ("out", b"ld")],
+        exit_status=3,
+    )
+    out, err, stdout, stderr = make_writers()
+
+    status = run_script(StubClient(channel), "echo hello", 5, False, stdout, stderr)
+
+    assert status == 3
+    assert channel.command == "bash -s"
+    assert channel.stdin == b"echo hello"
+    assert out.getvalue() == "[srv] hello\n[srv] world\n"
+    assert err.getvalue() == "[srv] oops\n"
+    assert channel.closed
+
+
+def test_run_script_sudo():
+    channel = StubChannel()
+    _, _, stdout, stderr = make_writers()
+
+    assert run_script(StubClient(channel), "true", 5, True, stdout, stderr) == 0
+    assert channel.command == "sudo -n bash -s"
+
+
+def test_run_script_times_out_when_idle():
+    channel = StubChannel(exit_status=None)
+    _, _, stdout, stderr = make_writers()
+
+    with pytest.raises(TimeoutError):
+        run_script(StubClient(channel), "sleep 60", 0.2, False, stdout, stderr)
+    assert channel.closed
+
+
+def test_run_script_times_out_while_writing_output():
+    channel = StubChannel(exit_status=None, endless=True)
+    out, _, stdout, stderr = make_writers()
+
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        run_script(StubClient(channel), "yes", 0.2, False, stdout, stderr)
+
+    assert time.monotonic() - start < 5
+    assert out.getvalue().startswith("[srv] line\n")
+    assert channel.closed
+
+
+@pytest.fixture(scope="module")
+def sshd():
+    """An SSH daemon running the commands it's given locally, accepting the user "u"
+    with the password "p". Yields its port and a list of the connections it accepted.
+    """
+    paramiko = pytest.importorskip("paramiko")
+
+    key = paramiko.RSAKey.generate(2048)
+    connections = []
+
+    def run(channel, command):
+        process = subprocess.Popen(
+            command.replace("sudo -n ", ""),
+            shell=True,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        def pump(source, send):
+            try:
+                for chunk in iter(lambda: source.read1(4096), b""):
+                    send(chunk)
+            except OSError:
+                # The client closed the channel, e.g. because the command timed out.
+                process.kill()
+
+        pumps = [
+            threading.Thread(target=pump, args=(process.stdout, channel.sendall)),
+            threading.Thread(target=pump, args=(process.stderr, channel.sendall_stderr)),
+        ]
+        for thread in pumps:
+            thread.start()
+
+        script = b""
+        for chunk in iter(lambda: channel.recv(4096), b""):
+            script += chunk
+        process.stdin.write(script)
+        process.stdin.close()
+
+        for thread in pumps:
+            thread.join()
+        try:
+            channel.send_exit_status(process.wait())
+            channel.close()
+        except OSError:
+            pass
+
+    class Server(paramiko.ServerInterface):
+        def get_allowed_auths(self, username):
+            return "password"
+
+        def check_auth_password(self, username, password):
+            if (username, password) == ("u", "p"):
+                return paramiko.AUTH_SUCCESSFUL
+            return paramiko.AUTH_FAILED
+
+        def check_channel_request(self, kind, chanid):
+            if kind == "session":
+                return paramiko.OPEN_SUCCEEDED
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+        def check_channel_exec_request(self, channel, command):
+            threading.Thread(
+                target=run, args=(channel, command.decode()), daemon=True,
+            ).start()
+            return True
+
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+
+    def serve():
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return
+            ssh_transport = paramiko.Transport(sock)
+            ssh_transport.add_server_key(key)
+            ssh_transport.start_server(server=Server())
+            connections.append(ssh_transport)
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    yield listener.getsockname()[1], connections
+
+    listener.close()
+    for ssh_transport in connections:
+        ssh_transport.close()
+
+
+def test_run_on_hosts_streams_output(sshd, capsys):
+    port, _ = sshd
+    pool = ConnectionPool("u", "p", port, timeout=5)
+    try:
+        outcomes = run_on_hosts(
+            {"one": "127.0.0.1"},
+            ["echo hello; sleep 0.1; echo oops >&2; printf partial", "exit 4"],
+            pool,
+            timeout=5,
+        )
+    finally:
+        pool.close()
+
+    assert outcomes == {"one": "exited with status 4"}
+    captured = capsys.readouterr()
+    assert captured.out == "[one] hello\n[one] partial\n"
+    assert captured.err == "[one] oops\n"
+
+
+def test_run_on_hosts_times_out(sshd):
+    port, _ = sshd
+    pool = ConnectionPool("u", "p", port, timeout=5)
+    outcomes = {}
+    start = time.monotonic()
+    try:
+        for name, script in (
+                ("idle", "sleep 30"),
+                ("chatty", "while true; do echo line; sleep 0.01; done"),
+        ):
+            outcomes.update(
+                run_on_hosts({name: "127.0.0.1"}, [script], pool, timeout=1),
+            )
+    finally:
+        pool.close()
+
+    assert time.monotonic() - start < 10
+    assert outcomes == {
+        "idle": "failed: Timed out after 1 seconds",
+        "chatty": "failed: Timed out after 1 seconds",
+    }
+
+
+def test_run_on_hosts_reuses_connections(sshd):
+    port, connections = sshd
+    pool = ConnectionPool("u", "p", port, timeout=5)
+    try:
+        before = len(connections)
+        hosts = {"one": "127.0.0.1", "two": "127.0.0.1"}
+
+        assert run_on_hosts(hosts, ["true", "true"], pool) == {"one": "ok", "two": "ok"}
+        assert run_on_hosts(hosts, ["true"], pool) == {"one": "ok", "two": "ok"}
+    finally:
+        pool.close()
+
+    # Both servers share an address, so a single connection was needed.
+    assert len(connections) - before == 1
@@ -0,0 +1,103 @@
+import copy
+
+import pytest
+
+from install_party.dns.dns_provider_client import DNSRecord
+from install_party.instances import instances_provider
+from install_party.instances.instances_provider_client import Instance
+from install_party.lister.list import NamespaceIndex, get_lists, partition_entries
+from install_party.util.errors import UnsupportedListingError
+
+
+def make_instance(name):
+    return Instance(name, name, "192.0.2.1", "ACTIVE")
+
+
+def make_record(sub_domain):
+    return DNSRecord(sub_domain, sub_domain, "192.0.2.1", "example.com")
+
+
+def test_namespace_index_picks_the_longest_namespace():
+    index = NamespaceIndex(["my", "my-event"])
+
+    assert index.split_instance_name("my-event-abcde") == ("my-event", "abcde")
+    assert index.split_instance_name("my-abcde") == ("my", "abcde")
+    assert index.split_instance_name("other-abcde") is None
+    assert index.split_instance_name("my") is None
+
+    assert index.split_sub_domain("abcde.my-event") == ("my-event", "abcde")
+    assert index.split_sub_domain("abcde.my") == ("my", "abcde")
+    assert index.split_sub_domain("abcde.other") is None
+    assert index.split_sub_domain("abcde") is None
+
+
+def test_partition_entries_with_namespaces():
+    lists = partition_entries(
+        [make_instance("bench-one"), make_instance("other-two")],
+        [make_record("one.bench"), make_record("three.bench")],
+        ["bench"],
+    )
+
+    assert list(lists) == ["bench"]
+    entries = lists["bench"]
+    assert sorted(entries) == ["one", "three"]
+    assert entries["one"].instance.name == "bench-one"
+    assert entries["one"].record.sub_domain == "one.bench"
+    assert entries["three"].instance is None
+
+
+def test_partition_entries_infers_namespaces():
+    lists = partition_entries(
+        [
+            make_instance("bench-one"),
+            make_instance("my-event-two"),
+            # Not named the way install_party names instances.
+            make_instance("web_frontend"),
+            make_instance("Build-Server-01"),
+            make_instance("database"),
+        ],
+        [
+            make_record("one.bench"),
+            make_record("three.workshop"),
+            # Not named the way install_party names records.
+            make_record("www"),
+            make_record("mail.internal.corp"),
+        ],
+    )
+
+    assert sorted(lists) == ["bench", "my-event", "workshop"]
+    assert sorted(lists["bench"]) == ["one"]
+    assert sorted(lists["my-event"]) == ["two"]
+    assert sorted(lists["workshop"]) == ["three"]
+
+
+def test_get_lists(config, add_server):
+    add_server("one")
+    add_server("two", record=False)
+    other_config = copy.deepcopy(config)
+    other_config["general"]["namespace"] = "my-event"
+    instances_provider.get_instances_provider_client(other_config).create_instance(
+        "my-event-three", "",
+    )
+
+    lists = get_lists(config)
+
+    assert sorted(lists) == ["bench", "my-event"]
+    assert sorted(lists["bench"]) == ["one", "two"]
+    assert lists["bench"]["two"].record is None
+    assert sorted(lists["my-event"]) == ["three"]
+
+    assert sorted(get_lists(config, ["my-event"])) == ["my-event"]
+
+
+def test_get_lists_without_listing_all(config, add_server):
+    add_server("one")
+    client = instances_provider.get_instances_provider_client(config)
+    client.supports_listing_all = False
+
+    with pytest.raises(UnsupportedListingError):
+        get_lists(config)
+
+    # Each namespace is listed on its own instead.
+    lists = get_lists(config, ["bench"])
+    assert sorted(lists["bench"]) == ["one"]
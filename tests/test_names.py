@@ -0,0 +1,124 @@
+import pytest
+
+from install_party.creator.names import NameAllocator, load_name_allocator
+from install_party.daemon.serve import EntryIndex
+from install_party.util import errors
+
+
+def test_allocate_skips_used_and_reserved_names():
+    allocator = NameAllocator(["one"], length=1)
+    allocator.reserve("two")
+
+    names = allocator.allocate(24)
+
+    assert len(set(names)) == 24
+    assert "one" not in names and "two" not in names
+
+    # Every one-letter name is taken now.
+    with pytest.raises(errors.NameCollisionError):
+        allocator.allocate(3)
+    # The names allocated before giving up aren't kept.
+    assert allocator.reserved == set(names) | {"two"}
+
+    allocator.release(names)
+    assert allocator.reserved == {"two"}
+
+
+def test_reserve_rejects_collisions():
+    allocator = NameAllocator(["one"])
+    allocator.reserve("two")
+
+    with pytest.raises(errors.NameCollisionError):
+        allocator.reserve("one")
+    with pytest.raises(errors.NameCollisionError):
+        allocator.reserve("two")
+
+    allocator.release(["two"])
+    assert allocator.reserve("two") == "two"
+
+
+@pytest.mark.parametrize("name", ["", "my-server", "Server", "a.b", "a" * 64])
+def test_reserve_rejects_invalid_names(name):
+    with pytest.raises(errors.InvalidNameError):
+        NameAllocator().reserve(name)
+
+
+def test_names_must_fit_in_a_domain_name():
+    # "<name>.<namespace>.<zone>" leaves room for 8 characters in the name.
+    allocator = NameAllocator(namespace="a" * 63, zone="%s.%s." % ("b" * 63, "c" * 116))
+
+    assert allocator.reserve("a" * 8)
+    with pytest.raises(errors.InvalidNameError):
+        allocator.reserve("a" * 9)
+
+    allocator = NameAllocator(namespace="a" * 63, zone="b" * 185, length=8)
+    with pytest.raises(errors.InvalidNameError):
+        allocator.allocate()
+
+
+def test_invalid_namespace():
+    with pytest.raises(errors.InvalidNameError):
+        NameAllocator(namespace="my_event")
+
+
+def test_reset_keeps_names_still_being_created():
+    allocator = NameAllocator(["one"])
+    allocator.reserve("two")
+    allocator.reserve("three")
+
+    # "two" has been created, "three" is still being created, and "one" is gone.
+    allocator.reset(["two"])
+
+    assert allocator.used == {"two"}
+    assert allocator.reserved == {"three"}
+    assert allocator.reserve("one") == "one"
+    with pytest.raises(errors.NameCollisionError):
+        allocator.reserve("three")
+
+
+def test_load_name_allocator(config, add_server):
+    add_server("one")
+    add_server("two", record=False)
+
+    allocator = load_name_allocator(config)
+
+    assert allocator.used == {"one", "two"}
+    with pytest.raises(errors.NameCollisionError):
+        allocator.reserve("two")
+
+
+def test_load_name_allocator_listing_errors(config, cloud, add_server):
+    add_server("one", record=False)
+    cloud.apis["memory.dns"].error_rate = 1
+
+    with pytest.raises(errors.SimulatedProviderError):
+        load_name_allocator(config)
+
+    allocator = load_name_allocator(config, ignore_listing_errors=True)
+    assert allocator.used == set()
+
+
+def test_load_name_allocator_checks_the_namespace_first(config, cloud):
+    config["general"]["namespace"] = "My_Event"
+    # Listing would fail, so this checks that the namespace is checked beforehand.
+    cloud.get_api("memory.dns", {}).error_rate = 1
+
+    with pytest.raises(errors.InvalidNameError, match="general.namespace"):
+        load_name_allocator(config, ignore_listing_errors=True)
+
+
+def test_entry_index_keeps_names_reserved_across_refreshes(config, add_server):
+    add_server("one")
+    index = EntryIndex(config)
+    index.refresh()
+
+    with pytest.raises(errors.NameCollisionError):
+        index.reserve_names("one")
+    names = index.reserve_names(number=2)
+
+    index.refresh()
+    with pytest.raises(errors.NameCollisionError):
+        index.reserve_names(names[0])
+
+    index.release_names(names)
+    assert index.reserve_names(names[0]) == [names[0]]
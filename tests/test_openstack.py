@@ -0,0 +1,91 @@
+import itertools
+import threading
+
+import pytest
+
+pytest.importorskip("keystoneauth1")
+pytest.importorskip("novaclient")
+
+from install_party.instances.providers.openstack import (  # noqa: E402
+    OpenStackInstancesProviderClient,
+)
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeNetwork:
+    def __init__(self, fail_after=None):
+        """Stands in for the keystoneauth adapter of the network (neutron) API, and
+        records the requests it's sent. Creating a floating IP fails once fail_after
+        of them have been created, if provided.
+        """
+        self.fail_after = fail_after
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.requests = []
+
+    def post(self, path, json):
+        with self.lock:
+            self.requests.append(("POST", path, json))
+            if self.fail_after is not None and self.fail_after <= 0:
+                raise RuntimeError("No more floating IPs")
+            if self.fail_after is not None:
+                self.fail_after -= 1
+            n = next(self.ids)
+        return FakeResponse({"floatingip": {
+            "id": "fip-%d" % n,
+            "floating_ip_address": "192.0.2.%d" % n,
+            "floating_network_id": json["floatingip"]["floating_network_id"],
+        }})
+
+    def delete(self, path):
+        with self.lock:
+            self.requests.append(("DELETE", path, None))
+
+
+@pytest.fixture
+def client():
+    return OpenStackInstancesProviderClient({
+        "auth_url": "https://identity.example.com/v3",
+        "username": "u",
+        "password": "p",
+        "tenant_id": "t",
+        "tenant_name": "t",
+        "api_version": "2",
+        "region_name": "R",
+        "image_id": "image",
+        "flavor_id": "flavor",
+        "floating_ip_network": "ext-net",
+        "floating_ip_concurrency": 2,
+    })
+
+
+def test_reserve_addresses_creates_floating_ips_one_at_a_time(client):
+    client.network = FakeNetwork()
+
+    addresses = client.reserve_addresses(3)
+
+    assert sorted(addresses) == ["192.0.2.1", "192.0.2.2", "192.0.2.3"]
+    assert client.network.requests == [
+        ("POST", "/v2.0/floatingips", {"floatingip": {"floating_network_id": "ext-net"}}),
+    ] * 3
+
+    assert client.reserve_addresses(0) == []
+    assert len(client.network.requests) == 3
+
+
+def test_reserve_addresses_releases_created_floating_ips_on_failure(client):
+    client.network = FakeNetwork(fail_after=2)
+
+    with pytest.raises(RuntimeError):
+        client.reserve_addresses(4)
+
+    # The two floating IPs created before the failure are deleted.
+    deleted = [path for method, path, _ in client.network.requests if method == "DELETE"]
+    assert sorted(deleted) == ["/v2.0/floatingips/fip-1", "/v2.0/floatingips/fip-2"]
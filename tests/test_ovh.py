@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("ovh")
+web = pytest.importorskip("aiohttp.web")
+
+from ovh.exceptions import APIError  # noqa: E402
+
+from install_party.dns.providers.ovh import AsyncOvhDNSProviderClient  # noqa: E402
+
+
+async def serve_ovh_api(responses):
+    """Serve a fake OVH API on a random local port, responding to requests with the
+    status and body associated with their path.
+
+    Returns:
+        The runner serving the API, and the API's endpoint.
+    """
+    async def handle(request):
+        if request.path == "/auth/time":
+            return web.Response(text=str(int(time.time())))
+        status, body = responses[request.path]
+        return web.Response(status=status, text=body)
+
+    app = web.Application()
+    app.router.add_route("*", "/{path:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, "http://127.0.0.1:%d" % port
+
+
+def call(responses, path):
+    """Send a GET request to the provided path of a fake OVH API with the async client,
+    and return the result."""
+    async def run():
+        runner, endpoint = await serve_ovh_api(responses)
+        client = AsyncOvhDNSProviderClient({
+            "endpoint": endpoint,
+            "application_key": "key",
+            "application_secret": "secret",
+            "consumer_key": "consumer",
+        })
+        try:
+            return await client.call("GET", path)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def test_call_parses_the_response():
+    assert call({"/records": (200, "[1, 2]")}, "/records") == [1, 2]
+    assert call({"/refresh": (200, "")}, "/refresh") is None
+
+
+@pytest.mark.parametrize("status, body, message", [
+    (404, '{"message": "This record does not exist"}', "This record does not exist"),
+    (502, "<html>Bad Gateway</html>", "<html>Bad Gateway</html>"),
+    (500, "", r"\(500\): $"),
+])
+def test_call_raises_api_errors(status, body, message):
+    with pytest.raises(APIError, match=message):
+        call({"/records": (status, body)}, "/records")
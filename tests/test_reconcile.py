@@ -0,0 +1,111 @@
+from install_party.dns import dns_provider
+from install_party.instances import instances_provider
+from install_party.lister.list import get_list
+from install_party.reconciler.reconcile import apply_plan, compute_plan
+from install_party.util import errors
+
+
+def test_healthy_servers_are_kept(config, add_server):
+    add_server("one")
+    add_server("two")
+
+    plan = compute_plan(get_list(config), 2)
+
+    assert plan.is_empty()
+    assert plan.to_keep == ["one", "two"]
+
+
+def test_broken_servers_are_replaced(config, add_server):
+    add_server("one")
+    add_server("broken", status="ERROR")
+
+    entries = get_list(config)
+    plan = compute_plan(entries, 2)
+
+    assert plan.to_delete == {"broken": "instance in ERROR status"}
+    assert plan.to_keep == ["one"]
+    assert len(plan.to_create) == 1
+    assert plan.to_create[0] not in entries
+
+
+def test_building_servers_count_as_healthy(config, add_server):
+    add_server("one", status="BUILD")
+    add_server("two", status="BUILD", record=False)
+
+    plan = compute_plan(get_list(config), 2)
+
+    assert plan.is_empty()
+    assert plan.to_keep == ["one", "two"]
+
+
+def test_wrong_records_are_repointed(config, add_server):
+    add_server("one", target="192.0.2.42")
+
+    plan = compute_plan(get_list(config), 1)
+
+    assert plan.to_repoint == ["one"]
+    assert not plan.to_delete
+    assert not plan.to_create
+
+
+def test_orphans(config, add_server):
+    add_server("instance", record=False)
+    add_server("record", status=None)
+
+    plan = compute_plan(get_list(config), 1)
+
+    assert plan.to_attach == ["instance"]
+    assert plan.to_delete == {"record": "orphaned DNS record"}
+    assert not plan.to_create
+
+
+def test_surplus_prefers_servers_needing_fixes(config, add_server):
+    add_server("healthy")
+    add_server("orphan", record=False)
+    add_server("wrong", target="192.0.2.42")
+
+    plan = compute_plan(get_list(config), 1)
+
+    assert plan.to_delete == {"orphan": "surplus", "wrong": "surplus"}
+    assert plan.to_keep == ["healthy"]
+    assert not plan.to_attach and not plan.to_repoint
+
+
+def test_missing_servers_are_created(config, add_server):
+    add_server("one")
+
+    entries = get_list(config)
+    plan = compute_plan(entries, 4)
+
+    assert len(plan.to_create) == 3
+    assert len(set(plan.to_create)) == 3
+    assert not set(plan.to_create) & set(entries)
+
+
+def test_apply_plan_survives_failed_commits(config, add_server, monkeypatch):
+    add_server("orphan", status=None)
+    add_server("wrong", target="192.0.2.42")
+
+    entries = get_list(config)
+    plan = compute_plan(entries, 1)
+    assert plan.to_delete == {"orphan": "orphaned DNS record"}
+    assert plan.to_repoint == ["wrong"]
+
+    commits = []
+
+    def failing_commit(*args):
+        commits.append("dns")
+        raise errors.SimulatedProviderError("Simulated failure")
+
+    instances_client = instances_provider.get_instances_provider_client(config)
+    dns_client = dns_provider.get_dns_provider_client(config)
+    monkeypatch.setattr(instances_client, "commit", lambda: commits.append("instances"))
+    monkeypatch.setattr(dns_client, "commit", failing_commit)
+
+    failures = apply_plan(plan, entries, "", 2, config)
+
+    # No instance was deleted, so only the DNS provider is committed. Since that
+    # failed, the record to re-point isn't attached again.
+    assert failures == 1
+    assert commits == ["dns"]
+    assert get_list(config)["wrong"].record is None
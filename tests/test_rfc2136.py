@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+dns = pytest.importorskip("dns")
+
+import dns.message  # noqa: E402
+import dns.query  # noqa: E402
+import dns.rcode  # noqa: E402
+import dns.rdataclass  # noqa: E402
+import dns.rrset  # noqa: E402
+
+from install_party.dns.dns_provider_client import DNSRecord  # noqa: E402
+from install_party.dns.providers.rfc2136 import (  # noqa: E402
+    RFC2136DNSProviderClient,
+)
+from install_party.util import errors  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return RFC2136DNSProviderClient({
+        "server": "192.0.2.53",
+        "key_name": "install-party",
+        "key_secret": "c2VjcmV0",
+    })
+
+
+@pytest.fixture
+def updates(monkeypatch):
+    """Stubs out sending UPDATE messages. Returns the list of the messages sent, and
+    responds to them with the rcode set in its rcode attribute.
+    """
+    class Updates(list):
+        rcode = dns.rcode.NOERROR
+
+    sent = Updates()
+
+    def tcp(update, server, port, timeout):
+        sent.append(update)
+        response = dns.message.make_response(update)
+        response.set_rcode(sent.rcode)
+        return response
+
+    monkeypatch.setattr(dns.query, "tcp", tcp)
+    return sent
+
+
+def test_send_batches_changes_in_one_update(client, updates):
+    client.create_sub_domain("one.bench", "192.0.2.1", "example.com")
+    client.delete_sub_domain(
+        DNSRecord("old.bench/192.0.2.3", "old.bench", "192.0.2.3", "example.com"),
+    )
+    client.create_sub_domain("two.bench", "192.0.2.2", "example.com")
+
+    client.commit("example.com")
+
+    assert len(updates) == 1
+    changes = [
+        (
+            rrset.name.to_text(),
+            # Deleting a single record is done in the NONE class.
+            "delete" if rrset.deleting == dns.rdataclass.NONE else "add",
+            [rdata.address for rdata in rrset],
+        )
+        for rrset in updates[0].update
+    ]
+    assert changes == [
+        ("one.bench", "add", ["192.0.2.1"]),
+        ("old.bench", "delete", ["192.0.2.3"]),
+        ("two.bench", "add", ["192.0.2.2"]),
+    ]
+
+    # Nothing is left to send.
+    client.commit("example.com")
+    assert len(updates) == 1
+
+
+def test_refused_update_fails_every_contributing_thread(client, updates):
+    updates.rcode = dns.rcode.REFUSED
+    queued = threading.Event()
+    committed = threading.Event()
+    thread_errors = []
+
+    def other_thread():
+        client.create_sub_domain("two.bench", "192.0.2.2", "example.com")
+        queued.set()
+        committed.wait()
+        try:
+            client.commit("example.com")
+        except Exception as e:
+            thread_errors.append(e)
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+
+    client.create_sub_domain("one.bench", "192.0.2.1", "example.com")
+    queued.wait()
+    # Sends the changes of both threads.
+    with pytest.raises(errors.DNSUpdateError, match="REFUSED"):
+        client.commit("example.com")
+    committed.set()
+    thread.join()
+
+    assert len(updates) == 1
+    assert len(updates[0].update) == 2
+    assert len(thread_errors) == 1
+    assert isinstance(thread_errors[0], errors.DNSUpdateError)
+
+
+def test_zone_transfer_skips_the_apex_and_other_types(client, monkeypatch):
+    def rrset(name, rdtype, *rdatas):
+        return dns.rrset.from_text(name, 300, "IN", rdtype, *rdatas)
+
+    first = dns.message.Message()
+    first.answer = [
+        rrset(
+            "example.com.", "SOA",
+            "ns.example.com. admin.example.com. 1 3600 600 86400 300",
+        ),
+        rrset("example.com.", "A", "192.0.2.100"),
+        rrset("one.bench.example.com.", "A", "192.0.2.1", "192.0.2.2"),
+    ]
+    second = dns.message.Message()
+    second.answer = [
+        rrset("one.bench.example.com.", "TXT", '"not an address"'),
+        rrset("www.example.com.", "A", "192.0.2.80"),
+        rrset("two.other.example.com.", "A", "192.0.2.3"),
+    ]
+    monkeypatch.setattr(dns.query, "xfr", lambda *args, **kwargs: iter([first, second]))
+
+    records = client.get_all_sub_domains("example.com")
+
+    assert [(r.record_id, r.sub_domain, r.target, r.zone) for r in records] == [
+        ("one.bench/192.0.2.1", "one.bench", "192.0.2.1", "example.com"),
+        ("one.bench/192.0.2.2", "one.bench", "192.0.2.2", "example.com"),
+        ("two.other/192.0.2.3", "two.other", "192.0.2.3", "example.com"),
+    ]
+    assert [r.sub_domain for r in client.get_sub_domains("bench", "example.com")] == [
+        "one.bench", "one.bench",
+    ]
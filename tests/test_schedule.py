@@ -0,0 +1,91 @@
+import itertools
+import threading
+import time
+
+from install_party.creator.names import NameAllocator
+from install_party.creator.schedule import (
+    DeadlineScheduler,
+    DurationEstimator,
+    plan_starts,
+)
+
+
+def test_plan_starts_in_waves():
+    assert plan_starts(4, 100, 10, 2) == [80, 80, 90, 90]
+    assert plan_starts(3, 100, 10, 5) == [90, 90, 90]
+    assert plan_starts(0, 100, 10, 2) == []
+
+
+def test_plan_starts_spaces_starts():
+    assert plan_starts(4, 100, 10, 2, start_interval=5) == [75, 80, 85, 90]
+    # Starts are spaced even within a wave.
+    assert plan_starts(3, 100, 10, 3, start_interval=4) == [82, 86, 90]
+
+
+def test_duration_estimator():
+    assert DurationEstimator().estimate() is None
+    assert DurationEstimator(30).estimate() == 30
+
+    estimator = DurationEstimator(30)
+    estimator.add(50)
+    # Until there are enough samples, plan for the longest known duration.
+    assert estimator.estimate() == 50
+
+    # Once there are enough samples, plan for their 95th percentile, regardless of
+    # past runs.
+    estimator = DurationEstimator(30)
+    for duration in (12, 10, 11):
+        estimator.add(duration)
+    assert estimator.estimate() == 12
+
+
+class StubScheduler(DeadlineScheduler):
+    def __init__(self, outcomes, **kwargs):
+        """A scheduler which creations don't create anything, but take the provided
+        number of seconds, or raise if it's None, in the order they're started.
+        """
+        super().__init__(
+            post_install_script="",
+            config={},
+            estimator=DurationEstimator(0.1),
+            allocator=NameAllocator(),
+            **kwargs,
+        )
+        self.outcomes = iter(outcomes)
+        self.outcomes_lock = threading.Lock()
+
+    def create(self, name):
+        with self.outcomes_lock:
+            duration = next(self.outcomes)
+        if duration is None:
+            raise RuntimeError("creation failed")
+        time.sleep(duration)
+        return "%s.bench.example.com" % name, duration
+
+
+def test_scheduler_replaces_failed_creations():
+    scheduler = StubScheduler(
+        [0.01, None, 0.01], count=2, deadline=time.time(), concurrency=2,
+    )
+
+    ready = scheduler.run()
+
+    assert len(ready) == 2
+    assert scheduler.failures == 1
+
+
+def test_scheduler_collects_stragglers_when_giving_up():
+    # The first creation is still running when the scheduler gives up because the
+    # others keep failing.
+    scheduler = StubScheduler(
+        itertools.chain([0.5], itertools.repeat(None)),
+        count=2,
+        deadline=time.time(),
+        concurrency=3,
+    )
+
+    ready = scheduler.run()
+
+    assert scheduler.gave_up
+    assert len(ready) == 1
+    assert not scheduler.in_flight
@@ -0,0 +1,120 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from install_party.daemon import serve
+from install_party.instances import instances_provider
+
+
+@pytest.fixture
+def daemon(config):
+    """A daemon serving the configured namespace on a random local port, in a thread.
+
+    Returns a function sending a request to it and returning the status code and the
+    parsed body of the response.
+    """
+    index = serve.EntryIndex(config)
+    index.refresh()
+
+    server = serve.ThreadingHTTPServer(("127.0.0.1", 0), serve.RequestHandler)
+    server.index = index
+    server.jobs = serve.JobRegistry()
+    server.token = None
+    server.concurrency = 2
+    server.quota_policy = "fail"
+    threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True,
+    ).start()
+
+    def request(method, path, body=None):
+        connection = http.client.HTTPConnection(*server.server_address)
+        try:
+            payload = json.dumps(body) if body is not None else None
+            connection.request(method, path, body=payload)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    yield request
+
+    server.shutdown()
+    server.server_close()
+
+
+def wait_for_job(daemon, job):
+    deadline = time.monotonic() + 10
+    while job["status"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+        _, job = daemon("GET", "/jobs/%s" % job["id"])
+    return job
+
+
+def test_create(daemon):
+    code, job = daemon("POST", "/create", {"number": 2})
+    assert code == 202
+    assert len(job["names"]) == 2
+
+    job = wait_for_job(daemon, job)
+    assert job["status"] == "done"
+    assert len(job["created"]) == 2
+
+    _, content = daemon("GET", "/list")
+    assert sorted(content["entries"]) == sorted(job["names"])
+
+
+@pytest.mark.parametrize("body", [
+    {"number": "two"},
+    {"number": 0},
+    {"number": -1},
+    {"number": 1.5},
+    {"number": True},
+    {"number": [2]},
+    {"concurrency": 0},
+])
+def test_create_rejects_invalid_numbers(daemon, body):
+    code, content = daemon("POST", "/create", body)
+
+    assert code == 400
+    assert "positive integer" in content["error"]
+
+
+def test_create_rejects_non_object_bodies(daemon):
+    code, _ = daemon("POST", "/create", [1, 2])
+
+    assert code == 400
+
+
+def test_create_uses_the_concurrency(daemon, monkeypatch):
+    concurrencies = []
+
+    def create_servers(names, post_install_script, config, concurrency=1):
+        concurrencies.append(concurrency)
+        return []
+
+    monkeypatch.setattr(serve, "create_servers", create_servers)
+
+    for body in ({"number": 3}, {"number": 3, "concurrency": 3}):
+        _, job = daemon("POST", "/create", body)
+        wait_for_job(daemon, job)
+
+    # The daemon's default, then the request's.
+    assert concurrencies == [2, 3]
+
+
+def test_create_checks_quotas(config, daemon):
+    client = instances_provider.get_instances_provider_client(config)
+    client.max_instances = 1
+
+    code, content = daemon("POST", "/create", {"number": 2})
+
+    assert code == 409
+    assert "instances" in content["error"]
+
+    # There's room for one.
+    code, job = daemon("POST", "/create", {"number": 1})
+    assert code == 202
+    assert wait_for_job(daemon, job)["status"] == "done"
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from install_party.instances import instances_provider
+from install_party.util import errors
+
+
+def make_sharded_client(config, *weights, **args):
+    """Configure one in-memory shard per provided weight, each with a simulated cloud
+    of its own and the provided arguments, and return the sharded client.
+    """
+    cloud = config["instances"]["args"]["cloud"]
+    config["instances"]["shards"] = [
+        {
+            "provider": "memory",
+            "name": "shard-%d" % i,
+            "weight": weight,
+            "args": dict(
+                args, cloud="%s/shard-%d" % (cloud, i), poll_interval=0.01,
+            ),
+        }
+        for i, weight in enumerate(weights)
+    ]
+    return instances_provider.get_instances_provider_client(config)
+
+
+@pytest.mark.parametrize("weight", [0, -1, "inf", "nan"])
+def test_weights_must_be_positive(config, weight):
+    with pytest.raises(ValueError, match="shard-1"):
+        make_sharded_client(config, 1, weight)
+
+
+def test_pick_shard_follows_the_weights(config):
+    client = make_sharded_client(config, 1, 3)
+
+    picked = [client.pick_shard().name for _ in range(8)]
+    assert picked.count("shard-0") == 2
+    assert picked.count("shard-1") == 6
+
+    # Full shards are avoided...
+    client.shards[1].capacity = 6
+    assert [client.pick_shard().name for _ in range(2)] == ["shard-0"] * 2
+
+    # ...unless they all are.
+    client.shards[0].capacity = 4
+    assert client.pick_shard().name == "shard-1"
+
+
+def test_instances_are_deleted_on_their_shard(config):
+    client = make_sharded_client(config, 1, 1)
+    for name in ("one", "two"):
+        client.create_instance("bench-%s" % name, "")
+
+    # A client which hasn't listed the instances doesn't know which shard they live on.
+    instances_provider.clear_cache()
+    client = instances_provider.get_instances_provider_client(config)
+    instance = client.shards[0].client.get_instances("bench")[0]
+    with pytest.raises(errors.UnknownInstanceError):
+        client.delete_instance(instance)
+
+    # Each shard got one of the instances.
+    assert [len(shard.client.get_instances("bench")) for shard in client.shards] == [1, 1]
+
+    instances = client.get_instances("bench")
+    assert len(instances) == 2
+    for instance in instances:
+        client.delete_instance(instance)
+
+    assert [shard.client.get_instances("bench") for shard in client.shards] == [[], []]
+
+
+def test_pages_of_every_shard_are_merged(config):
+    client = make_sharded_client(config, 1, 1, page_size=2)
+    for i in range(6):
+        client.create_instance("bench-%d" % i, "")
+
+    instances_provider.clear_cache()
+    client = instances_provider.get_instances_provider_client(config)
+    pages = list(client.iter_instance_pages("bench"))
+
+    # Each shard has 3 instances, so returns 2 pages.
+    assert len(pages) == 4
+    assert all(len(page) <= 2 for page in pages)
+    instances = [instance for page in pages for instance in page]
+    assert sorted(i.name for i in instances) == ["bench-%d" % i for i in range(6)]
+
+    # Listing tells which shard each instance lives on.
+    for instance in instances:
+        client.delete_instance(instance)
+    assert client.get_instances("bench") == []
+
+
+def test_paging_raises_the_errors_of_any_shard(config):
+    client = make_sharded_client(config, 1, 1, page_size=2)
+    for i in range(4):
+        client.create_instance("bench-%d" % i, "")
+    client.shards[1].client.api.error_rate = 1
+
+    with pytest.raises(errors.SimulatedProviderError):
+        list(client.iter_instance_pages("bench"))
+
+
+def test_paging_stops_when_pages_are_no_longer_wanted(config):
+    client = make_sharded_client(config, 1, 1, page_size=1)
+    for i in range(10):
+        client.create_instance("bench-%d" % i, "")
+    threads = threading.active_count()
+
+    pages = client.iter_instance_pages("bench")
+    next(pages)
+    pages.close()
+
+    # The threads paging through the shards give up rather than waiting for room in
+    # the queue forever.
+    deadline = time.monotonic() + 5
+    while threading.active_count() > threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert threading.active_count() == threads